@@ -3,11 +3,30 @@ import logging
 import os
 import time
 from pybit.unified_trading import HTTP
-from datetime import datetime
 from dotenv import load_dotenv
-import math
-import requests
-
+import aiohttp
+
+from utils.balances import BalanceCache
+from utils.calculator import IncrementalEvaluator
+from utils.execution import ExecutionEngine, opportunity_legs
+from utils.get_coins import Universe
+from utils.graph import GraphEvaluator, graph_symbols
+from utils.instruments import InstrumentCache
+from utils.journal import OpportunityJournal
+from utils.logs import RateLimitFilter, setup_logging
+from utils.market_data import drop_stale_books, fetch_all_tickers_info
+from utils.metrics import METRICS_FILE, METRICS_INTERVAL, Metrics
+from utils.notifier import TelegramNotifier
+from utils.orderbook import PUBLIC_SPOT_URL, OrderBookEngine
+from utils.polling import POLL_INTERVAL, PollScheduler, route_edges
+from utils.order_tracker import OrderTracker
+from utils.private_stream import PRIVATE_URL, PrivateStream
+from utils.rate_limit import RateLimiter
+from utils.recorder import BookRecorder
+from utils.sharding import ShardedDetector
+from utils.status import StatusBoard, StatusErrorHandler
+from utils.transport import ConnectionPool
+from utils import vector_calculator
 
 load_dotenv("settings/.env")
 
@@ -36,6 +55,39 @@ def get_chat_id():
 
 
 chat_id = get_chat_id()
+notifier = TelegramNotifier(os.getenv('TELEGRAM_BOT_TOKEN'), chat_id)
+
+# Источник стаканов: 'ws' - локальные стаканы из публичного стрима, 'rest' - опрос get_orderbook
+BOOK_SOURCE = os.getenv('BOOK_SOURCE', 'ws')
+
+# Адреса API биржи; для нагрузочных тестов их можно направить на локальную имитацию (python -m utils.mock_exchange)
+BYBIT_REST_URL = os.getenv('BYBIT_REST_URL', "https://api.bybit.com")
+BYBIT_PUBLIC_WS_URL = os.getenv('BYBIT_PUBLIC_WS_URL', PUBLIC_SPOT_URL)
+BYBIT_PRIVATE_WS_URL = os.getenv('BYBIT_PRIVATE_WS_URL', PRIVATE_URL)
+
+# Параметры опроса стаканов через REST
+FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', 20))
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', 2))
+MAX_BOOK_AGE = float(os.getenv('MAX_BOOK_AGE', 1))
+# Бюджет запросов стаканов в секунду для адаптивного опроса: пары, близкие к безубыточности и волатильные,
+# опрашиваются чаще, остальные реже. 0 - все стаканы раз в секунду. Только для CALC_ENGINE='python'
+POLL_BUDGET = float(os.getenv('POLL_BUDGET', 0))
+POLL_INTERVAL = float(os.getenv('POLL_INTERVAL', POLL_INTERVAL))
+
+# Движок расчета: 'python' - эталонный инкрементальный расчет, 'numpy' - пакетный расчет всех маршрутов,
+# 'graph' - поиск циклов из 3-4 ног по графу валют (кроссы к BTC, ETH и т.д.); в режиме воркеров - только 'python'
+CALC_ENGINE = os.getenv('CALC_ENGINE', 'python')
+
+# Число процессов-воркеров расчета; 0 - стаканы и расчет в процессе бота. В режиме воркеров стаканы держит
+# отдельный процесс стрима в общей памяти, а бот только исполняет найденные воркерами возможности
+SHARDS = int(os.getenv('SHARDS', 0))
+
+# Запись всех обновлений стаканов для воспроизведения (python -m utils.replay <файл>); пусто - не записывать
+RECORD_FILE = os.getenv('RECORD_FILE', '')
+
+# Ограничения на размер сделки в USDT: размер подбирается по глубине стаканов, но не больше MAX_TRADE_USDT и баланса
+MAX_TRADE_USDT = float(os.getenv('MAX_TRADE_USDT', 500))
+MIN_TRADE_USDT = float(os.getenv('MIN_TRADE_USDT', 5))
 
 
 # Настройка сессии pybit
@@ -44,24 +96,53 @@ session = HTTP(
     api_key=BYBIT_API_KEY,
     api_secret=BYBIT_API_SECRET,
 )
+session.endpoint = BYBIT_REST_URL
+
+# Правила торговли по символам (шаги цены и количества, минимальные ордера) и комиссии
+instruments = InstrumentCache(session)
+
+# Набор пар строится по одному запросу всех тикеров (пересечение USDT/USDC с фильтрами по цене, обороту и спреду),
+# хранится на диске и пересобирается в фоне раз в UNIVERSE_TTL секунд. Цена обеих пар должна быть в диапазоне
+# от UNIVERSE_MIN_PRICE до UNIVERSE_MAX_PRICE; по умолчанию верхней границы фактически нет, чтобы не отсечь BTC и ETH
+universe = Universe(
+    session,
+    ttl=float(os.getenv('UNIVERSE_TTL', 60 * 60)),
+    min_price=float(os.getenv('UNIVERSE_MIN_PRICE', 0.001)),
+    max_price=float(os.getenv('UNIVERSE_MAX_PRICE', 1000000)),
+    min_turnover=float(os.getenv('UNIVERSE_MIN_TURNOVER', 50000)),
+    max_spread=float(os.getenv('UNIVERSE_MAX_SPREAD', 0.005)),
+)
 
+# Приватный поток: исполнения ордеров и изменения кошелька без опроса REST
+private_stream = PrivateStream(BYBIT_API_KEY, BYBIT_API_SECRET, BYBIT_PRIVATE_WS_URL)
+balances = BalanceCache(session, private_stream)
 
-# Настройка логирования
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-file_handler = logging.FileHandler('logs/arbitrage_bot.log')
-file_handler.setLevel(logging.INFO)
-file_format = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(file_format)
-logger.addHandler(file_handler)
+# Гистограммы задержек по этапам и счетчики; снимок в формате Prometheus пишется в METRICS_FILE,
+# при заданном METRICS_PORT он же отдается по HTTP на /metrics
+METRICS_FILE = os.getenv('METRICS_FILE', METRICS_FILE)
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+metrics = Metrics()
+
+# Все REST-запросы (pybit и опрос стаканов) проходят через общий планировщик лимитов Bybit: бюджет по эндпоинтам
+# уточняется по заголовкам X-Bapi-Limit-*, а опрос стаканов не может занять долю лимита по IP, оставленную ордерам
+rate_limiter = RateLimiter(metrics=metrics)
+# Пул keep-alive соединений сессии pybit открывается при старте и обновляется до закрытия биржей по простою;
+# чтения после обрыва соединения повторяются, ордера повторяются с тем же orderLinkId
+connection_pool = ConnectionPool(session, rate_limiter, metrics=metrics)
+
+
+# Настройка логирования: запись в файл и консоль идет из отдельного потока, цикл событий не ждет диск
+LOG_QUEUE = os.getenv('LOG_QUEUE', '1') == '1'
+# полный снимок стаканов пишется в лог не чаще одного раза за MARKET_LOG_INTERVAL секунд
+MARKET_LOG_INTERVAL = float(os.getenv('MARKET_LOG_INTERVAL', 60))
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.ERROR)
-console_format = logging.Formatter('%(asctime)s - %(message)s')
-console_handler.setFormatter(console_format)
-logger.addHandler(console_handler)
+log_listener = setup_logging(queued=LOG_QUEUE)
+logger = logging.getLogger()
+market_logger = logging.getLogger('market')
+market_logger.addFilter(RateLimitFilter(MARKET_LOG_INTERVAL))
 
 
+# Запасной набор пар, если набор по тикерам построить не удалось (API недоступно и нет файла кэша)
 PAIRS = [
     ('ADAUSDT', 'ADAUSDC'), ('APEUSDT', 'APEUSDC'), ('APEXUSDT', 'APEXUSDC'),
     ('APTUSDT', 'APTUSDC'), ('ARBUSDT', 'ARBUSDC'), ('CHZUSDT', 'CHZUSDC'),
@@ -77,397 +158,268 @@ PAIRS = [
 ]
 
 
-def rounding(item: float, degree: int = 100) -> float:
-    """
-    Функция для округления чисел в меньшую сторону. По дефолту округляет до сотых.
-    Нужна для корректного расчета баланса полученых монет (их не может быть больше как при арифметическом округлении)
-    :param item (float): число для округления
-    :param degree (int): степень округления
-    :return:
-    float - возвращает результат
-    """
-    return math.floor(item * degree) / degree
-
-
-def rounding_price(price, decimals=4):
-    return round(price, decimals)
-
-
 def send_telegram_message(message: str):
-    if chat_id:
-        telegram_token = os.getenv('TELEGRAM_BOT_TOKEN')
-        url = f"https://api.telegram.org/bot{telegram_token}/sendMessage"
-        data = {
-            'chat_id': chat_id,
-            'text': message
-        }
-        requests.post(url, data=data)
-    else:
-        logging.error("chat_id is not set. Cannot send message.")  # Логирование ошибки, если chat_id не установлен
+    # сообщение только ставится в очередь, отправкой занимается фоновая задача notifier.run()
+    notifier.send(message)
 
 
-async def fetch_ticker_info(session, pair, limit=3):
-    try:
-        data = session.get_orderbook(symbol=pair, category="spot", limit=limit)
-        if 'result' in data and len(data['result']) > 0:
-            bids = [(float(level[0]), float(level[1])) for level in data['result']['b']]
-            asks = [(float(level[0]), float(level[1])) for level in data['result']['a']]
-            return {
-                'symbol': pair,
-                'bids': bids,
-                'asks': asks
-            }
-        else:
-            logger.error(f"Error: No data in response for pair {pair}")
-            return None
-    except Exception as e:
-        logger.error(f"Error fetching price data for pair {pair}: {str(e)}")
-        return None
+def book_staleness(prices):
+    """
+    Age in seconds of the oldest book taking part in calculation.
+    """
+    if not prices:
+        return 0.0
+    return time.time() - min(book['ts'] for book in prices.values())
 
 
-async def fetch_all_tickers_info(pairs, session):
-    tasks = [fetch_ticker_info(session, pair) for pair in pairs]
-    results = await asyncio.gather(*tasks)
-    return {result['symbol']: result for result in results if result is not None}
-
-
-def calculate_arbitrage_opportunities(prices, fee=0.001):
-    start_time = time.time()
-    logger.info("started to calc opportunities")
-    opportunities = []
-
-    if 'USDCUSDT' in prices:
-        usdc_to_usdt_bids = prices['USDCUSDT']['bids']
-        usdt_to_usdc_asks = prices['USDCUSDT']['asks']
-
-        for pair1, pair2 in PAIRS:
-            if pair1 in prices and pair2 in prices:
-                usdt_asks = prices[pair1]['asks']
-                usdc_bids = prices[pair2]['bids']
-
-                # Расчет для направления USDT -> USDC
-                if usdt_asks and usdc_bids and usdc_to_usdt_bids:
-                    qty_usdt = 100
-                    coins_buyed = 0
-                    qty_usdc = 0
-                    buy_orders_usdt = []
-
-                    # ШАГ1. Покупка монет за USDT
-                    for ask_price, ask_volume in usdt_asks:
-                        if rounding(qty_usdt) <= 0:
-                            break
-                        trade_volume = min(qty_usdt / ask_price, ask_volume)
-                        qty_usdt -= trade_volume * ask_price
-                        coins_buyed += rounding(rounding(trade_volume) * (1 - fee))
-                        if rounding(trade_volume) > 0:
-                            buy_orders_usdt.append((rounding_price(ask_price), rounding(trade_volume)))
-
-                    # Шаг 2 - продажа монет за USDC
-                    sell_orders_usdc = []
-
-                    for bid_price, bid_volume in usdc_bids:
-                        if rounding(coins_buyed) <= 0:
-                            break
-                        trade_volume = min(coins_buyed, bid_volume)
-                        if rounding(trade_volume) > 0:
-                            coins_buyed -= rounding(trade_volume)
-                            qty_usdc += trade_volume * bid_price
-                            sell_orders_usdc.append((rounding_price(bid_price), rounding(trade_volume)))
-
-                    # Шаг 3 - продажа USDC за USDT
-                    sell_orders_usdc_to_usdt = []
-                    final_usdt = 0
-
-                    for bid_price, bid_volume in usdc_to_usdt_bids:
-                        if rounding(qty_usdc) <= 0:
-                            break
-                        trade_volume = min(qty_usdc, bid_volume)
-                        if rounding(trade_volume) > 0:
-                            final_usdt += trade_volume * bid_price
-                            qty_usdc -= trade_volume
-                            sell_orders_usdc_to_usdt.append((rounding_price(bid_price), rounding(trade_volume)))
-
-                    if final_usdt > 100:
-                        final_usdt = rounding(final_usdt, degree=1000)
-                        profit = rounding(final_usdt - 100, degree=1000)
-                        opportunities.append({
-                            'date': str(datetime.now()),
-                            'pair1': pair1,
-                            'pair2': pair2,
-                            'direction': 'USDT -> USDC',
-                            'buy_orders_usdt': buy_orders_usdt,
-                            'sell_orders_usdc': sell_orders_usdc,
-                            'sell_orders_usdc_to_usdt': sell_orders_usdc_to_usdt,
-                            'final_usdt': final_usdt,
-                            'profit': profit
-                        })
-
-                # Расчет для направления USDC -> USDT
-                usdc_asks = prices[pair2]['asks']
-                usdt_bids = prices[pair1]['bids']
-
-                if usdc_asks and usdt_bids and usdt_to_usdc_asks:
-                    qty_usdt = 100
-                    qty_usdc = 0
-                    coins_buyed = 0
-                    buy_orders_usdt_to_usdc = []
-
-                    # Шаг 1: Покупка USDC за USDT
-                    for ask_price, ask_volume in usdt_to_usdc_asks:
-                        if rounding(qty_usdt) <= 0:
-                            break
-                        trade_volume = min(qty_usdt / ask_price, ask_volume)
-                        qty_usdt -= trade_volume * ask_price
-                        qty_usdc += rounding(trade_volume)
-                        if rounding(trade_volume) > 0:
-                            buy_orders_usdt_to_usdc.append((rounding_price(ask_price), rounding(trade_volume)))
-
-                    # Шаг 2: Покупка монеты за USDC
-                    buy_orders_usdc = []
-                    for ask_price, ask_volume in usdc_asks:
-                        if rounding(qty_usdc) <= 0:
-                            break
-                        trade_volume = min(qty_usdc / ask_price, ask_volume)
-                        qty_usdc -= trade_volume * ask_price
-                        coins_buyed += rounding(trade_volume)
-                        if rounding(trade_volume) > 0:
-                            buy_orders_usdc.append((rounding_price(ask_price), rounding(trade_volume)))
-
-                    # Шаг 3: Продажа монеты за USDT
-                    sell_orders_usdt = []
-                    final_usdt = 0
-                    for bid_price, bid_volume in usdt_bids:
-                        if rounding(coins_buyed) <= 0:
-                            break
-                        trade_volume = min(coins_buyed, bid_volume)
-                        final_usdt += trade_volume * bid_price * (1 - fee)
-                        final_usdt = rounding(final_usdt)
-                        coins_buyed -= trade_volume
-                        if rounding(trade_volume) > 0:
-                            sell_orders_usdt.append((rounding_price(bid_price), rounding(trade_volume)))
-
-                    if final_usdt > 100:
-                        final_usdt = rounding(final_usdt, degree=1000)
-                        profit = rounding(final_usdt - 100, degree=1000)
-                        opportunities.append({
-                            'date': str(datetime.now()),
-                            'pair1': pair2,
-                            'pair2': pair1,
-                            'direction': 'USDC -> USDT',
-                            'buy_orders_usdt_to_usdc': buy_orders_usdt_to_usdc,
-                            'buy_orders_usdc': buy_orders_usdc,
-                            'sell_orders_usdt': sell_orders_usdt,
-                            'final_usdt': final_usdt,
-                            'profit': profit
-                        })
-
-    end_time = time.time()
-    logger.info(f"Time taken for calculating: {end_time - start_time} seconds")
-    return opportunities
-
-
-def write_opportunities_to_file(opportunities, filename="arbitrage_opportunities.txt"):
-    with open(filename, 'a') as f:
-        for opp in opportunities:
-            f.write(f"Arbitrage opportunity found! {opp}\n")
+def get_balance(coin):
+    """
+    Returns the free balance of the given coin from the wallet cache (no API call once the cache is loaded).
+    """
+    return balances.get(coin)
 
 
-def get_balance(coin):
+def symbols_to_fetch(pairs) -> list:
     """
-    Connects via API to Bybit, gets balance for the given coin, and returns a float value.
+    Symbols the bot needs books for: both pairs of every coin and USDCUSDT for the conversion leg, and with
+    the graph engine also the crosses between the coins and the quote currencies.
     """
-    balance = session.get_wallet_balance(
-        accountType="UNIFIED",
-        coin=coin
-    )['result']['list'][0]['coin'][0]['equity']
+    symbols = [pair for pair1, pair2 in pairs for pair in [pair1, pair2]]
+    symbols.append('USDCUSDT')  # добавляем пару для конвертации USDC в USDT
+    if CALC_ENGINE == 'graph' and not SHARDS:
+        symbols = sorted(set(symbols) | set(graph_symbols(instruments.instruments, pairs)))
+    return symbols
 
-    return float(balance)
 
+def new_evaluator(pairs, symbols, max_notional):
+    if CALC_ENGINE == 'graph' and not SHARDS:
+        return GraphEvaluator(symbols, max_notional=max_notional, min_notional=MIN_TRADE_USDT,
+                              instruments=instruments)
+    return IncrementalEvaluator(pairs, max_notional=max_notional, min_notional=MIN_TRADE_USDT,
+                                instruments=instruments)
 
-def place_order(symbol, side, qty, price, order_type, time_in_force="GTC"):
-    """
-    Places an order via Bybit API.
 
-    Args:
-    - symbol (str): The trading pair symbol (e.g., 'XRPUSDT').
-    - side (str): The order side, either 'Buy' or 'Sell'.
-    - qty (float): The quantity to buy or sell.
-    - price (float): The limit price for the order.
-    - time_in_force (str): Time in force policy (default is "GTC").
+executor = ExecutionEngine(session, instruments, send_telegram_message, metrics=metrics)
 
-    Returns:
-    - str: The order ID of the placed order.
-    """
-    order = session.place_order(
-        category="spot",
-        symbol=symbol,
-        side=side,
-        # order_type="Limit",
-        order_type=order_type,
-        qty=qty,
-        price=price,
-        time_in_force=time_in_force
-    )
-    order_id = order['result']['orderId']
-    message = f"{side} Order placed: {order_id} for {symbol} at {price}"
-    send_telegram_message(message)
-    logger.info(message)
-
-    return order_id
-
-
-def wait_for_order(symbol, order_id):
-    """
-    Waits for an order to be filled via Bybit API.
 
-    Args:
-    - symbol (str): The trading pair symbol (e.g., 'XRPUSDT').
-    - order_id (str): The ID of the order to wait for.
-    """
-    while True:
-        order_status = session.get_open_orders(
-            category="spot",
-            symbol=symbol,
-            orderId=order_id
-        )['result']['list']
-
-        if order_status and order_status[0]['orderStatus'] == 'Filled':
-            message = f"Order filled: {order_id}"
-            send_telegram_message(message)
-            logger.info(message)
-            break
-        else:
-            print(f"Waiting for order {order_id} to be filled...")
-            time.sleep(0.1)  # Ждем 0.1 секунд перед повторной проверкой
-
-
-def execute_arbitrage(opportunity):
+async def execute_arbitrage(opportunity):
     """
     Executes the arbitrage opportunity.
 
     Args:
     - opportunity (dict): The arbitrage opportunity details.
+
+    Returns:
+    - list: LegState of every executed leg, or an empty list if nothing was placed.
     """
-    # Проверяем баланс USDT перед началом арбитража
-    usdt_balance = get_balance('USDT')
-    if usdt_balance < 100:
-        message = "USDT balance is below 100. Stopping the bot."
+    # Проверяем баланс USDT перед началом арбитража и резервируем его на время сделки
+    qty_usdt = opportunity['qty_usdt']
+    if not balances.reserve('USDT', qty_usdt):
+        message = f"USDT balance is below {qty_usdt}. Stopping the bot."
         send_telegram_message(message)
         logger.error(message)
-        return
-
-    pair1 = opportunity['pair1']
-    pair2 = opportunity['pair2']
-    direction = opportunity['direction']
-    fee = 0.001
-
-    if direction == 'USDT -> USDC':
-        buy_orders_usdt = opportunity['buy_orders_usdt']
-        sell_orders_usdc = opportunity['sell_orders_usdc']
-        sell_orders_usdc_to_usdt = opportunity['sell_orders_usdc_to_usdt']
-
-        # Шаг 1: Покупка монеты за USDT
-        buy_order_ids = []
-        for price, volume in buy_orders_usdt:
-            buy_order_id = place_order(pair1, 'Buy', volume, price, "Limit")
-            buy_order_ids.append(buy_order_id)
-
-        # Ожидание выполнения всех ордеров
-        for buy_order_id in buy_order_ids:
-            wait_for_order(pair1, buy_order_id)
-
-        # Шаг 2: Продажа монеты за USDC
-        sell_order_ids = []
-        for price, volume in sell_orders_usdc:
-            sell_order_id = place_order(pair2, 'Sell', volume, price, "Limit")
-            sell_order_ids.append(sell_order_id)
-
-        # Ожидание выполнения всех ордеров
-        for sell_order_id in sell_order_ids:
-            wait_for_order(pair2, sell_order_id)
-
-        # Шаг 3: Продажа USDC за USDT
-        sell_usdc_order_ids = []
-        for price, volume in sell_orders_usdc_to_usdt:
-            sell_usdc_order_id = place_order('USDCUSDT', 'Sell', volume, price, "Limit")
-            sell_usdc_order_ids.append(sell_usdc_order_id)
-
-        # Ожидание выполнения всех ордеров
-        for sell_usdc_order_id in sell_usdc_order_ids:
-            wait_for_order('USDCUSDT', sell_usdc_order_id)
-
-    elif direction == 'USDC -> USDT':
-        buy_orders_usdt_to_usdc = opportunity['buy_orders_usdt_to_usdc']
-        buy_orders_usdc = opportunity['buy_orders_usdc']
-        sell_orders_usdt = opportunity['sell_orders_usdt']
-
-        # Шаг 1: Покупка USDC за USDT
-        buy_usdc_order_ids = []
-        for price, volume in buy_orders_usdt_to_usdc:
-            buy_usdc_order_id = place_order('USDCUSDT', 'Buy', volume, price, "Limit")
-            buy_usdc_order_ids.append(buy_usdc_order_id)
-
-        # Ожидание выполнения всех ордеров
-        for buy_usdc_order_id in buy_usdc_order_ids:
-            wait_for_order('USDCUSDT', buy_usdc_order_id)
-
-        # Проверяем баланс USDC после покупки
-        usdc_balance = get_balance('USDC')
-
-        # Шаг 2: Покупка монеты за USDC
-        buy_order_ids = []
-        for price, volume in buy_orders_usdc:
-            if usdc_balance <= 0:
-                break
-            trade_volume = min(usdc_balance / price, volume)
-            buy_order_id = place_order(pair1, 'Buy', trade_volume, price, "Limit")
-            buy_order_ids.append(buy_order_id)
-            usdc_balance -= trade_volume * price
-
-        # Ожидание выполнения всех ордеров
-        for buy_order_id in buy_order_ids:
-            wait_for_order(pair1, buy_order_id)
-
-        # Проверяем баланс монеты после покупки
-        coin_balance = get_balance(pair1[:-4])
-
-        # Шаг 3: Продажа монеты за USDT
-        sell_order_ids = []
-        for price, volume in sell_orders_usdt:
-            if coin_balance <= 0:
-                break
-            trade_volume = min(coin_balance, volume)
-            sell_order_id = place_order(pair2, 'Sell', trade_volume, price, "Limit")
-            sell_order_ids.append(sell_order_id)
-            coin_balance -= trade_volume
-
-        # Ожидание выполнения всех ордеров
-        for sell_order_id in sell_order_ids:
-            wait_for_order(pair2, sell_order_id)
+        return []
+
+    legs = opportunity_legs(opportunity)
+    if legs is None:
+        balances.release('USDT', qty_usdt)
+        return []
+
+    # объемы следующих шагов ограничиваются фактическим исполнением предыдущих, а не запросом баланса
+    try:
+        return await executor.execute(legs)
+    finally:
+        balances.release('USDT', qty_usdt)
+
+
+def new_poller(pairs):
+    """
+    Scheduler of REST book polls for the pairs; stops the bot if POLL_BUDGET cannot pay for them.
+    """
+    try:
+        return PollScheduler(pairs, POLL_BUDGET, POLL_INTERVAL)
+    except ValueError as e:
+        logger.error(f"{e}, raise POLL_BUDGET or trade fewer pairs")
+        raise
 
 
 async def main():
     logger.info("Starting to calculate arbitrage opportunities")
+    notifications = asyncio.ensure_future(notifier.run())
+    # статус для telegram_bot: heartbeat цикла событий, последняя итерация, открытые ордера и последняя ошибка
+    status = StatusBoard()
+    status_handler = StatusErrorHandler(status)
+    logger.addHandler(status_handler)
+    heartbeat = asyncio.ensure_future(status.run())
+    metrics_writer = asyncio.ensure_future(metrics.run(METRICS_FILE, METRICS_INTERVAL))
+    metrics_server = await metrics.serve(port=METRICS_PORT) if METRICS_PORT else None
+    # соединения с REST API открываются заранее, первая сделка не ждет handshake
+    await asyncio.get_event_loop().run_in_executor(None, connection_pool.warm)
+    keepalive = asyncio.ensure_future(connection_pool.run())
+    universe.load()
+    pairs = universe.pairs or PAIRS
+    universe_version = universe.version
+    instruments.load()
+    pairs_to_fetch = symbols_to_fetch(pairs)
+    logger.info(f"Trading {len(pairs)} pairs")
+    poller = None
+    if POLL_BUDGET and CALC_ENGINE == 'python' and BOOK_SOURCE != 'ws' and not SHARDS:
+        # бюджет опроса проверяется до запуска потоков и сделок: если его не хватает, бот не стартует
+        poller = new_poller(pairs)
+    universe_refresh = asyncio.ensure_future(universe.run())
+
+    await balances.reconcile()
+    journal = OpportunityJournal()
+    evaluator = new_evaluator(pairs, pairs_to_fetch, min(MAX_TRADE_USDT, get_balance('USDT')))
+    engine = None
+    http = None
+    detector = None
+    books = {}
+    recorder = BookRecorder(RECORD_FILE, pairs_to_fetch) if RECORD_FILE and not SHARDS else None
+    if SHARDS:
+        detector = ShardedDetector(pairs, SHARDS, BYBIT_PUBLIC_WS_URL, max_notional=evaluator.max_notional,
+                                   min_notional=MIN_TRADE_USDT, metrics=metrics)
+        detector.start()
+    elif BOOK_SOURCE == 'ws':
+        engine = OrderBookEngine(pairs_to_fetch, BYBIT_PUBLIC_WS_URL)
+        if recorder:
+            engine.listeners.append(lambda book: recorder.write(book.view()))
+        feed = asyncio.ensure_future(engine.run())
+    else:
+        # один пул соединений на всё время работы, чтобы не платить за handshake в каждом цикле
+        http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=FETCH_CONCURRENCY))
+    # исполнения ордеров приходят из приватного потока, без него ExecutionEngine опрашивает REST
+    executor.tracker = OrderTracker(private_stream)
+    private_feed = asyncio.ensure_future(private_stream.run())
+
     try:
         while True:
-            pairs_to_fetch = [pair for pair1, pair2 in PAIRS for pair in [pair1, pair2]]
-            pairs_to_fetch.append('USDCUSDT')  # добавляем пару для конвертации USDC в USDT
-            prices = await fetch_all_tickers_info(pairs_to_fetch, session)
-            logger.info(f"Fetched prices: {prices}")
-            opportunities = calculate_arbitrage_opportunities(prices)
+            if instruments.is_stale():
+                await asyncio.get_event_loop().run_in_executor(None, instruments.refresh)
+                evaluator.invalidate()
+
+            if universe.version != universe_version and universe.pairs and detector:
+                # таблица символов общей памяти фиксирована при запуске воркеров
+                universe_version = universe.version
+                logger.info("Trading universe changed, restart the bot to reshard the workers")
+            elif universe.version != universe_version and universe.pairs:
+                # набор пар пересобран в фоне: меняем подписки и пересчитываем все маршруты без перезапуска
+                universe_version = universe.version
+                try:
+                    refreshed = poller.rebuild(universe.pairs) if poller else None
+                except ValueError as e:
+                    # набор меняется только целиком: опрашиваются и считаются всегда одни и те же пары
+                    logger.error(f"{e}, the universe change is skipped, still trading the previous {len(pairs)} pairs")
+                else:
+                    pairs = universe.pairs
+                    pairs_to_fetch = symbols_to_fetch(pairs)
+                    evaluator = new_evaluator(pairs, pairs_to_fetch, evaluator.max_notional)
+                    if engine:
+                        engine.set_symbols(pairs_to_fetch)
+                    poller = refreshed
+                    logger.info(f"Trading {len(pairs)} pairs")
+
+            if detector:
+                # стаканы и расчет в дочерних процессах, сюда приходят только кандидаты и статистика воркеров
+                opportunities = await detector.next(timeout=5)
+                if opportunities is None:
+                    continue
+                # время до последней ноги считается от получения кандидата координатором
+                cycle_start = decision_start = time.perf_counter()
+            elif engine:
+                # пересчитываем только когда пришло обновление хотя бы одного стакана
+                if not await engine.wait_for_update(timeout=5):
+                    continue
+                cycle_start = time.perf_counter()
+                changed = engine.pop_dirty()
+                prices = engine.snapshot()
+                # время от отправки обновления биржей до начала расчета (включает расхождение часов)
+                received = [prices[symbol]['ts'] for symbol in changed if symbol in prices]
+                if received:
+                    metrics.observe('book', max(0.0, time.time() - max(received)))
+            else:
+                cycle_start = time.perf_counter()
+                changed = None
+                # при адаптивном опросе в расчет идут только стаканы этого цикла: пара и USDCUSDT получены вместе
+                symbols = poller.due() if poller else pairs_to_fetch
+                prices = drop_stale_books(await fetch_all_tickers_info(
+                    symbols, http, books, FETCH_CONCURRENCY, url=BYBIT_REST_URL, timeout=FETCH_TIMEOUT,
+                    limiter=rate_limiter),
+                    MAX_BOOK_AGE)
+                metrics.observe('book', time.perf_counter() - cycle_start)
+                if recorder:
+                    for book in prices.values():
+                        recorder.write(book)
+            if not detector:
+                market_logger.info("Fetched prices: %s", prices)
+                calc_start = time.perf_counter()
+                if CALC_ENGINE == 'numpy':
+                    opportunities = vector_calculator.calculate_arbitrage_opportunities(
+                        prices, pairs, max_notional=evaluator.max_notional, min_notional=MIN_TRADE_USDT,
+                        instruments=instruments)
+                else:
+                    opportunities = evaluator.update(prices, changed)
+                    if poller:
+                        poller.update(prices, route_edges(evaluator.routes))
+                decision_start = time.perf_counter()
+                metrics.observe('calc', decision_start - calc_start)
+                metrics.increment('cycles')
             if opportunities:
-                logger.error(f"Arbitrage opportunities found: {opportunities}")
+                metrics.increment('opportunities', len(opportunities))
+                logger.error("Arbitrage opportunities found: %s", opportunities)
                 send_telegram_message(f"Arbitrage opportunities found: {opportunities}")
-                write_opportunities_to_file(opportunities)
+                journal.append(opportunities)
                 for opportunity in opportunities:
-                    execute_arbitrage(opportunity)
-
-            await asyncio.sleep(1)
+                    legs = await execute_arbitrage(opportunity)
+                    if legs and legs[0].sent is not None:
+                        metrics.observe('decision', legs[0].sent - decision_start)
+                    if legs and legs[-1].filled is not None:
+                        metrics.observe('final_leg', legs[-1].filled - cycle_start)
+                    # следующая возможность ждала, пока исполнялась эта
+                    decision_start = time.perf_counter()
+                # после сделок баланс изменился, а вместе с ним и максимальный размер сделки
+                evaluator.set_max_notional(min(MAX_TRADE_USDT, get_balance('USDT')))
+                if detector:
+                    detector.set_max_notional(evaluator.max_notional)
+            staleness = detector.staleness() if detector else book_staleness(prices)
+            status.cycle(time.perf_counter() - cycle_start, staleness, executor.open_orders)
+
+            if not engine and not detector:
+                await asyncio.sleep(POLL_INTERVAL if poller else 1)
     except Exception as e:
         send_telegram_message(f"Bot crashed with error: {e}")
         logger.error(f"Bot crashed with error: {e}")
+    finally:
+        if engine:
+            await engine.stop()
+            feed.cancel()
+        if http:
+            await http.close()
+        if detector:
+            detector.stop()
+        await private_stream.stop()
+        private_feed.cancel()
+        # даем отправить оставшиеся уведомления, в том числе о падении
+        notifier.stop()
+        await notifications
+        journal.close()
+        if recorder:
+            recorder.close()
+        heartbeat.cancel()
+        universe_refresh.cancel()
+        keepalive.cancel()
+        connection_pool.close()
+        metrics_writer.cancel()
+        if metrics_server:
+            await metrics_server.cleanup()
+        logger.removeHandler(status_handler)
+        status.close()
 
 
 if __name__ == '__main__':
     logger.info("Bot has been started")
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        if log_listener:
+            log_listener.stop()
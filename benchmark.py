@@ -0,0 +1,278 @@
+"""
+Benchmarks of the detector, book parsing, the REST fetch cycle and order execution on synthetic books.
+
+    python benchmark.py --pairs 30 300 --depth 3 50 --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+
+Results are JSON; with --compare the run exits with code 1 if throughput dropped or p99 latency grew
+by more than --threshold against a previous run.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from utils import calculator, vector_calculator
+from utils.calculator import IncrementalEvaluator, simulate_usdt_to_usdc
+from utils.execution import ExecutionEngine, opportunity_legs
+from utils.market_data import fetch_all_tickers_info
+from utils.order_tracker import OrderTracker
+from utils.records import ArrayBook
+from utils.synthetic import SyntheticMarket, orderbook_payload, synthetic_pairs
+
+MAX_NOTIONAL = 500
+MIN_NOTIONAL = 5
+
+
+def summarize(name: str, params: dict, timings) -> dict:
+    """
+    Throughput and latency percentiles of a list of timings in seconds.
+    """
+    timings = np.sort(np.asarray(timings))
+    total = float(timings.sum())
+    return {
+        'name': name,
+        'params': params,
+        'iterations': len(timings),
+        'ops_per_second': len(timings) / total if total else 0.0,
+        'mean_us': float(timings.mean() * 1e6),
+        'p50_us': float(np.percentile(timings, 50) * 1e6),
+        'p99_us': float(np.percentile(timings, 99) * 1e6),
+        'max_us': float(timings[-1] * 1e6),
+    }
+
+
+def bench_calculator(pairs_count: int, depth: int, iterations: int, seed: int = 0) -> list:
+    """
+    One tick = one random book changes and the detector runs. Every engine sees the same sequence of books.
+    """
+    pairs = synthetic_pairs(pairs_count)
+    results = []
+    for engine in ('reference', 'incremental', 'numpy'):
+        market = SyntheticMarket(pairs, depth, seed)
+        prices = market.prices()
+        evaluator = IncrementalEvaluator(pairs, max_notional=MAX_NOTIONAL, min_notional=MIN_NOTIONAL)
+        evaluator.update(prices, None)
+        timings = []
+        for _ in range(iterations):
+            changed = {market.tick().symbol}
+            start = time.perf_counter()
+            if engine == 'reference':
+                calculator.calculate_arbitrage_opportunities(prices, pairs, max_notional=MAX_NOTIONAL,
+                                                             min_notional=MIN_NOTIONAL)
+            elif engine == 'incremental':
+                evaluator.update(prices, changed)
+            else:
+                vector_calculator.calculate_arbitrage_opportunities(prices, pairs, max_notional=MAX_NOTIONAL,
+                                                                    min_notional=MIN_NOTIONAL)
+            timings.append(time.perf_counter() - start)
+        results.append(summarize(f"calculator.{engine}", {'pairs': pairs_count, 'depth': depth}, timings))
+    return results
+
+
+def bench_parsing(pairs_count: int, depth: int, iterations: int, seed: int = 0) -> list:
+    """
+    What fetch_ticker_info does with a response body: decode JSON and load the levels into an ArrayBook.
+    """
+    market = SyntheticMarket(synthetic_pairs(pairs_count), depth, seed)
+    bodies = [json.dumps(orderbook_payload(book)) for book in market.books.values()]
+    book = ArrayBook('PARSE', depth)
+    timings = []
+    for body in itertools.islice(itertools.cycle(bodies), iterations):
+        start = time.perf_counter()
+        data = json.loads(body)
+        book.update(data['result']['b'], data['result']['a'], time.time())
+        timings.append(time.perf_counter() - start)
+    return [summarize("parsing.orderbook", {'pairs': pairs_count, 'depth': depth}, timings)]
+
+
+async def bench_fetch(pairs_count: int, depth: int, iterations: int, seed: int = 0) -> list:
+    """
+    Full REST fetch cycle of every book against a local server that answers like /v5/market/orderbook.
+    """
+    market = SyntheticMarket(synthetic_pairs(pairs_count), depth, seed)
+
+    async def orderbook(request):
+        market.tick()
+        return web.json_response(orderbook_payload(market.books[request.query['symbol']]))
+
+    app = web.Application()
+    app.router.add_get('/v5/market/orderbook', orderbook)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    timings = []
+    books = {}
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=20)) as http:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                await fetch_all_tickers_info(market.symbols, http, books, limit=depth, url=url)
+                timings.append(time.perf_counter() - start)
+    finally:
+        await runner.cleanup()
+    return [summarize("fetch.cycle", {'pairs': pairs_count, 'depth': depth}, timings)]
+
+
+class InstantStream:
+    """
+    Stand-in for PrivateStream that is always connected; the mock exchange pushes order updates itself.
+    """
+
+    connected = True
+
+    def __init__(self):
+        self.handlers = {}
+
+    def subscribe(self, topic, handler):
+        self.handlers.setdefault(topic, []).append(handler)
+
+
+class InstantExchange:
+    """
+    Mock pybit session that fills every order immediately and in full at its limit price.
+    """
+
+    def __init__(self, loop=None, tracker=None):
+        self.loop = loop
+        self.tracker = tracker
+        self.orders = {}
+        self.ids = itertools.count(1)
+
+    def place_batch_order(self, category, request):
+        results = []
+        for item in request:
+            order_id = str(next(self.ids))
+            qty = float(item['qty'])
+            order = {
+                'orderId': order_id, 'symbol': item['symbol'], 'side': item['side'], 'orderStatus': 'Filled',
+                'cumExecQty': str(qty), 'cumExecValue': str(qty * float(item['price'])), 'cumExecFee': '0',
+            }
+            self.orders[order_id] = order
+            if self.tracker is not None:
+                # pybit вызывается из пула потоков, а трекер живет в цикле событий
+                self.loop.call_soon_threadsafe(self.tracker.handle_order, [dict(order)])
+            results.append({'orderId': order_id})
+        return {'result': {'list': results}, 'retExtInfo': {'list': [{'code': 0, 'msg': 'OK'}] * len(results)}}
+
+    def get_open_orders(self, category, symbol, orderId):
+        return {'result': {'list': []}}
+
+    def get_order_history(self, category, orderId):
+        return {'result': {'list': [self.orders[orderId]]}}
+
+    def cancel_order(self, category, symbol, orderId):
+        return {'result': {}}
+
+
+async def bench_execution(iterations: int, depth: int = 3, seed: int = 0) -> list:
+    """
+    Executes the legs of a three-leg route against a mock exchange that fills instantly, with fills read over REST
+    and with fills pushed through the order tracker.
+    """
+    pairs = synthetic_pairs(1)
+    market = SyntheticMarket(pairs, depth, seed)
+    pair1, pair2 = pairs[0]
+    opportunity = simulate_usdt_to_usdc(pair1, pair2, market.prices(), qty_usdt=MAX_NOTIONAL)
+    legs = opportunity_legs(opportunity)
+
+    results = []
+    for mode in ('rest', 'stream'):
+        tracker = OrderTracker(InstantStream()) if mode == 'stream' else None
+        session = InstantExchange(asyncio.get_event_loop(), tracker)
+        engine = ExecutionEngine(session, tracker=tracker)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await engine.execute(legs)
+            timings.append(time.perf_counter() - start)
+        results.append(summarize(f"execution.{mode}", {'depth': depth}, timings))
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, text=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """
+    Returns:
+    - list: Text lines describing regressions against the baseline run.
+    """
+    previous = {(item['name'], json.dumps(item['params'], sort_keys=True)): item for item in baseline['results']}
+    regressions = []
+    for item in results:
+        old = previous.get((item['name'], json.dumps(item['params'], sort_keys=True)))
+        if old is None:
+            continue
+        throughput = item['ops_per_second'] / old['ops_per_second'] - 1 if old['ops_per_second'] else 0.0
+        p99 = item['p99_us'] / old['p99_us'] - 1 if old['p99_us'] else 0.0
+        if throughput < -threshold or p99 > threshold:
+            regressions.append(f"{item['name']} {item['params']}: ops/s {throughput:+.1%}, p99 {p99:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pairs', type=int, nargs='+', default=[30])
+    parser.add_argument('--depth', type=int, nargs='+', default=[3])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--only', nargs='+', choices=('calculator', 'parsing', 'fetch', 'execution'),
+                        default=['calculator', 'parsing', 'fetch', 'execution'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results to this file instead of stdout")
+    parser.add_argument('--compare', help="results of a previous run to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = []
+    for pairs_count, depth in itertools.product(args.pairs, args.depth):
+        if 'calculator' in args.only:
+            results += bench_calculator(pairs_count, depth, args.iterations, args.seed)
+        if 'parsing' in args.only:
+            results += bench_parsing(pairs_count, depth, args.iterations, args.seed)
+        if 'fetch' in args.only:
+            results += asyncio.run(bench_fetch(pairs_count, depth, max(1, args.iterations // 10), args.seed))
+    if 'execution' in args.only:
+        # REST-режим ждет POLL_INTERVAL на каждой ноге, поэтому итераций меньше
+        results += asyncio.run(bench_execution(max(1, args.iterations // 20), seed=args.seed))
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for line in regressions:
+            print(f"Regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import os
+import time
 
 from aiogram import Bot, Dispatcher, F
 from aiogram.filters import CommandStart, Command
@@ -22,6 +23,9 @@ bot = Bot(token=TELEGRAM_BOT_TOKEN)
 
 dp = Dispatcher()
 
+# Состояния из файла статуса arbitrage_bot
+STATES = {'running': 'Запущен', 'wedged': 'Завис', 'stopped': 'Остановлен'}
+
 # Inline клавиатура
 kb = InlineKeyboardMarkup(inline_keyboard=[
     [InlineKeyboardButton(text="Статус", callback_data="check")],
@@ -46,10 +50,27 @@ async def cmd_set(message: Message):
     await message.answer("Список возможностей бота", reply_markup=kb)
 
 
+def ago(ts: float, now: float, digits: int = 1) -> str:
+    # 0 в файле статуса - события еще не было: первый цикл не завершился или ошибок не было
+    if not ts:
+        return "ещё не было"
+    return f"{now - ts:.{digits}f} с назад"
+
+
 @dp.callback_query(F.data == "check")
 async def handle_status(callback: CallbackQuery):
-    status = check_status()
-    await callback.message.answer(f"Статус бота: {'Запущен' if status else 'Остановлен'}")
+    status = get_status()
+    text = f"Статус бота: {STATES[status['state']]}"
+    if status['state'] != 'stopped':
+        now = time.time()
+        text += f"\nПоследний цикл: {ago(status['last_cycle_at'], now)}"
+        if status['last_cycle_at']:
+            text += f" ({status['cycle_latency'] * 1000:.1f} мс, всего {status['cycles']})"
+        text += (f"\nВозраст стаканов: {status['book_staleness']:.1f} с"
+                 f"\nОткрытые ордера: {status['open_orders']}")
+        if status['last_error']:
+            text += f"\nПоследняя ошибка ({ago(status['error_at'], now, 0)}): {status['last_error']}"
+    await callback.message.answer(text)
     await callback.answer()
 
 
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+from utils.balances import BalanceCache
+
+
+class WalletSession:
+    def __init__(self, usdt: float):
+        self.usdt = usdt
+        self.threads = []
+
+    def get_wallet_balance(self, accountType):
+        self.threads.append(threading.current_thread())
+        return {'result': {'list': wallet(self.usdt)}}
+
+
+def wallet(usdt: float) -> list:
+    return [{'accountType': 'UNIFIED', 'coin': [{'coin': 'USDT', 'equity': str(usdt)}]}]
+
+
+def test_snapshot_is_fetched_in_a_thread_and_applied_on_the_loop():
+    session = WalletSession(100)
+    balances = BalanceCache(session)
+
+    async def run():
+        # до первого снимка торговать не на что, запрос уходит в фоне
+        assert balances.get('USDT') == 0.0
+        await asyncio.sleep(0.1)
+        return balances.get('USDT')
+
+    assert asyncio.run(run()) == 100.0
+    assert balances.ready
+    assert session.threads and threading.main_thread() not in session.threads
+
+
+def test_stream_update_newer_than_the_snapshot_wins():
+    session = WalletSession(100)
+    balances = BalanceCache(session)
+
+    async def run():
+        reconcile = asyncio.ensure_future(balances.reconcile())
+        await asyncio.sleep(0)
+        # обновление потока приходит, пока снимок еще в пути
+        balances.handle_wallet(wallet(40))
+        await reconcile
+
+    asyncio.run(run())
+    assert balances.get('USDT') == 40.0
+
+
+def test_reservations_are_released_after_a_failed_trade():
+    balances = BalanceCache(None)
+    balances.handle_wallet(wallet(100))
+    balances.ready = True
+
+    assert balances.reserve('USDT', 60)
+    assert balances.get('USDT') == 40.0
+    # вторая сделка не может рассчитывать на те же деньги
+    assert not balances.reserve('USDT', 50)
+    assert balances.reserved == {'USDT': 60}
+
+    try:
+        assert balances.reserve('USDT', 30)
+        raise ConnectionError("leg failed")
+    except ConnectionError:
+        pass
+    finally:
+        balances.release('USDT', 30)
+    balances.release('USDT', 60)
+    assert balances.get('USDT') == 100.0 and balances.reserved == {}
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from pybit.unified_trading import HTTP
+
+from utils import execution
+from utils.execution import ExecutionEngine
+from utils.instruments import Instrument
+from utils.mock_exchange import ExchangeError, MockExchange, ORDER_NOT_FOUND_CODE
+
+PAIRS = [('XRPUSDT', 'XRPUSDC')]
+
+
+class FailingCancels(MockExchange):
+    """
+    Mock exchange that refuses the first failures cancel requests.
+    """
+
+    def __init__(self, failures: int, **kwargs):
+        self.failures = failures
+        super().__init__(**kwargs)
+
+    def cancel_order(self, params):
+        if self.failures:
+            self.failures -= 1
+            raise ExchangeError(ORDER_NOT_FOUND_CODE, "Order does not exist.")
+        return super().cancel_order(params)
+
+
+async def execute(legs, exchange: MockExchange, timeout: float = 0.3, give_up: float = 5):
+    # книги не двигаются: исполняется только то, что выставлено вручную
+    exchange.market.books['XRPUSDT'].update([(0.49, 1000)], [(0.5, 100)], time.time())
+    exchange.market.books['XRPUSDC'].update([(0.49, 1000)], [(0.51, 1000)], time.time())
+    url = await exchange.start()
+    session = HTTP(api_key='key', api_secret='secret')
+    session.endpoint = url
+    messages = []
+    # шаги как у имитации: остаток после частичного исполнения округляется так же, как в боте
+    instruments = {symbol: Instrument(symbol, '0.0001', '0.0000001', '0.0001', '1') for symbol in PAIRS[0]}
+    engine = ExecutionEngine(session, instruments, messages.append, timeout=timeout, give_up=give_up)
+    try:
+        return await asyncio.wait_for(engine.execute(legs), 20), messages
+    finally:
+        await exchange.stop()
+
+
+def new_exchange(cls=MockExchange, **kwargs):
+    return cls(pairs=PAIRS, depth=3, tick_interval=3600, balances={'USDT': 1000.0, 'USDC': 1000.0}, **kwargs)
+
+
+def test_next_leg_overlaps_and_takes_the_partial_fill():
+    exchange = new_exchange()
+    # на 0.5 продается только 100 XRP: второй ордер первой ноги висит до таймаута и отменяется
+    legs = [('XRPUSDT', 'Buy', [(0.5, 100), (0.5, 100)]),
+            ('XRPUSDC', 'Sell', [(0.49, 50), (0.49, 60)])]
+    (buy, sell), _ = asyncio.run(execute(legs, exchange))
+
+    assert sorted(order['orderStatus'] for order in buy.orders.values()) == ['Cancelled', 'Filled']
+    assert abs(buy.output() - 99.9) < 1e-9
+    orders = [order for order in exchange.orders.values() if order['symbol'] == 'XRPUSDC']
+    # первый ордер покрыт исполнением сразу, второй урезан до остатка после отмены
+    assert [float(order['qty']) for order in orders] == [50, 49.9]
+    cancelled = next(order for order in exchange.orders.values() if order['orderStatus'] == 'Cancelled')
+    assert int(orders[0]['createdTime']) < int(cancelled['updatedTime']) - 200
+    assert abs(sell.consumed - buy.output()) < 1e-9
+    assert sell.done and not sell.abandoned
+
+
+def test_failed_cancel_is_retried(monkeypatch):
+    monkeypatch.setattr(execution, 'CANCEL_RETRY_INTERVAL', 0.1)
+    exchange = new_exchange(FailingCancels, failures=2)
+    (leg,), messages = asyncio.run(execute([('XRPUSDC', 'Buy', [(0.5, 10)])], exchange))
+
+    assert exchange.failures == 0
+    assert [order['orderStatus'] for order in leg.orders.values()] == ['Cancelled']
+    assert not leg.abandoned
+    assert messages[-1] == "Leg Buy XRPUSDC finished, output: 0.0"
+
+
+def test_leg_is_given_up_when_cancels_keep_failing(monkeypatch):
+    monkeypatch.setattr(execution, 'CANCEL_RETRY_INTERVAL', 0.1)
+    exchange = new_exchange(FailingCancels, failures=1000)
+    start = time.monotonic()
+    (leg,), messages = asyncio.run(execute([('XRPUSDC', 'Buy', [(0.5, 10)])], exchange, give_up=0.5))
+
+    assert time.monotonic() - start < 3
+    assert leg.abandoned and leg.done and leg.filled is None
+    order_id, = leg.orders
+    assert exchange.orders[order_id]['orderStatus'] == 'New'
+    assert any(f"left open: {order_id}" in message for message in messages)
@@ -0,0 +1,84 @@
+import json
+
+from utils.get_coins import Universe, select_pairs
+
+
+def ticker(symbol: str, price: float, turnover: float = 1e6, spread: float = 0.001) -> dict:
+    return {'symbol': symbol, 'lastPrice': str(price), 'turnover24h': str(turnover),
+            'bid1Price': str(price * (1 - spread / 2)), 'ask1Price': str(price * (1 + spread / 2))}
+
+
+def both(coin: str, price: float, **usdc) -> list:
+    # фильтры из usdc портят только USDC-пару монеты
+    return [ticker(f"{coin}USDT", price), ticker(f"{coin}USDC", price, **usdc)]
+
+
+TICKERS = (both('ADA', 0.4) + both('BTC', 60000) + both('ETH', 3000) + both('DUST', 0.0001)
+           + both('THIN', 1, turnover=100) + both('WIDE', 1, spread=0.02) + [ticker('SOLOUSDT', 5)]
+           + [ticker('USDCUSDT', 1), ticker('USDCEUR', 0.9)])
+
+
+def test_select_pairs_keeps_coins_whose_two_pairs_pass_every_filter():
+    assert select_pairs(TICKERS) == [('ADAUSDT', 'ADAUSDC'), ('BTCUSDT', 'BTCUSDC'), ('ETHUSDT', 'ETHUSDC')]
+    assert select_pairs(TICKERS, max_price=1000) == [('ADAUSDT', 'ADAUSDC')]
+    assert ('DUSTUSDT', 'DUSTUSDC') in select_pairs(TICKERS, min_price=0)
+    assert ('THINUSDT', 'THINUSDC') in select_pairs(TICKERS, min_turnover=0)
+    assert ('WIDEUSDT', 'WIDEUSDC') in select_pairs(TICKERS, max_spread=0.05)
+
+
+class TickerSession:
+    def __init__(self, tickers):
+        self.tickers = tickers
+        self.calls = 0
+
+    def get_tickers(self, category):
+        self.calls += 1
+        if self.tickers is None:
+            raise ConnectionError("API is down")
+        return {'result': {'list': self.tickers}}
+
+
+def test_universe_is_cached_on_disk_until_the_ttl(tmp_path):
+    path = str(tmp_path / 'universe.json')
+    session = TickerSession(TICKERS)
+    universe = Universe(session, path)
+    universe.load()
+    assert session.calls == 1 and universe.version == 1 and len(universe.pairs) == 3
+
+    # свежий файл читается без запроса
+    restarted = Universe(session, path)
+    restarted.load()
+    assert session.calls == 1 and restarted.pairs == universe.pairs and not restarted.is_stale()
+
+    # с другими фильтрами файл не подходит
+    Universe(session, path, max_price=1000).load()
+    assert session.calls == 2
+
+    with open(path) as file:
+        data = json.load(file)
+    data['updated_at'] -= 2 * 60 * 60
+    with open(path, 'w') as file:
+        json.dump(data, file)
+    stale = Universe(session, path)
+    stale.load()
+    assert session.calls == 3 and not stale.is_stale()
+
+
+def test_failed_refresh_keeps_the_previous_universe(tmp_path):
+    session = TickerSession(TICKERS)
+    universe = Universe(session, str(tmp_path / 'universe.json'), ttl=0)
+    universe.refresh()
+    pairs, updated_at, version = universe.pairs, universe.updated_at, universe.version
+
+    session.tickers = None
+    universe.refresh()
+    assert (universe.pairs, universe.updated_at, universe.version) == (pairs, updated_at, version)
+    assert universe.is_stale()
+
+    # тот же набор пар не меняет версию, другой - меняет
+    session.tickers = TICKERS
+    universe.refresh()
+    assert universe.version == version
+    session.tickers = both('ADA', 0.4)
+    universe.refresh()
+    assert universe.pairs == [('ADAUSDT', 'ADAUSDC')] and universe.version == version + 1
@@ -0,0 +1,71 @@
+import numpy as np
+
+from utils.graph import CurrencyGraph, GraphEvaluator, cycle_direction, simulate_cycle
+
+SYMBOLS = ['BTCUSDT', 'ETHBTC', 'ETHUSDT', 'XRPETH', 'XRPUSDT']
+
+
+def book(symbol: str, mid: float, spread: float = 0.0001, size: float = 1000.0) -> dict:
+    return {'symbol': symbol, 'ts': 0.0,
+            'bids': [(mid * (1 - spread * k), size) for k in range(1, 4)],
+            'asks': [(mid * (1 + spread * k), size) for k in range(1, 4)]}
+
+
+def market(**mids) -> dict:
+    # справедливые цены: BTC 100, ETH 10, XRP 0.5 USDT
+    mids = dict({'BTCUSDT': 100.0, 'ETHBTC': 0.1, 'ETHUSDT': 10.0, 'XRPETH': 0.05, 'XRPUSDT': 0.5}, **mids)
+    return {symbol: book(symbol, mid) for symbol, mid in mids.items()}
+
+
+def test_cycles_go_through_the_anchor():
+    graph = CurrencyGraph(SYMBOLS)
+    assert sorted(cycle_direction(cycle) for cycle in graph.cycles) == [
+        'USDT -> BTC -> ETH -> USDT',
+        'USDT -> BTC -> ETH -> XRP -> USDT',
+        'USDT -> ETH -> BTC -> USDT',
+        'USDT -> ETH -> XRP -> USDT',
+        'USDT -> XRP -> ETH -> BTC -> USDT',
+        'USDT -> XRP -> ETH -> USDT',
+    ]
+    for cycle in graph.cycles:
+        assert cycle[0][2] == 'USDT' and cycle[-1][3] == 'USDT'
+        assert all(leg[3] == following[2] for leg, following in zip(cycle, cycle[1:]))
+
+
+def test_only_changed_books_are_recomputed():
+    graph = CurrencyGraph(SYMBOLS)
+    prices = market()
+    graph.update(prices)
+    weights = graph.weights.copy()
+
+    # BTCUSDT изменился, но не передан в changed: его ребра и циклы не трогаются
+    prices = market(XRPUSDT=0.6, BTCUSDT=50.0)
+    _, affected = graph.update(prices, {'XRPUSDT'})
+    assert set(affected.tolist()) == {i for i, cycle in enumerate(graph.cycles)
+                                      if any(leg[0] == 'XRPUSDT' for leg in cycle)}
+    changed = set(np.flatnonzero(graph.weights != weights).tolist())
+    assert changed == set(graph.symbol_edges['XRPUSDT'])
+
+
+def test_profitable_three_and_four_leg_cycles_match_simulate_cycle():
+    # ETH дешевле в BTC на 2%: выгодно USDT -> BTC -> ETH и обратно в USDT напрямую или через XRP
+    prices = market(ETHBTC=0.098)
+    evaluator = GraphEvaluator(SYMBOLS)
+    opportunities = evaluator.update(prices)
+    assert sorted(opportunity.direction for opportunity in opportunities) == [
+        'USDT -> BTC -> ETH -> USDT', 'USDT -> BTC -> ETH -> XRP -> USDT']
+
+    cycles = {cycle_direction(cycle): cycle for cycle in evaluator.graph.cycles}
+    for opportunity in opportunities:
+        expected = simulate_cycle(cycles[opportunity.direction], prices, qty_usdt=100)
+        assert opportunity.simulated_usdt == expected.simulated_usdt > 100
+        assert [leg.orders for leg in opportunity.legs] == [leg.orders for leg in expected.legs]
+        assert [leg.symbol for leg in opportunity.legs] == [leg.symbol for leg in expected.legs]
+
+
+def test_fair_market_reports_nothing():
+    prices = market()
+    evaluator = GraphEvaluator(SYMBOLS)
+    assert evaluator.update(prices) == []
+    negative, _ = evaluator.graph.update(prices)
+    assert len(negative) == 0
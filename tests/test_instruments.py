@@ -0,0 +1,27 @@
+import random
+from decimal import ROUND_DOWN, Decimal
+
+from utils.calculator import rounding
+from utils.instruments import Instrument
+
+
+def test_rounding_is_exact_on_decimal_steps():
+    assert rounding(1.16) == 1.16
+    assert rounding(0.29) == 0.29
+    assert rounding(1.005, 1000) == 1.005
+    assert rounding(2.999, 100) == 2.99
+
+    rng = random.Random(0)
+    for _ in range(10000):
+        degree = 10 ** rng.randint(0, 6)
+        item = round(rng.uniform(0, 1000), rng.randint(0, 8))
+        expected = float(Decimal(repr(item)).quantize(Decimal(1) / degree, ROUND_DOWN))
+        assert rounding(item, degree) == expected
+
+
+def test_quantize_price_never_worse_than_the_simulated_price():
+    instrument = Instrument('XRPUSDT', '0.01', '0.0001', '1', '5')
+    assert instrument.quantize_price(0.51237, 'Buy') == Decimal('0.5123')
+    assert instrument.quantize_price(0.51231, 'Sell') == Decimal('0.5124')
+    assert instrument.quantize_price(0.5123, 'Sell') == Decimal('0.5123')
+    assert instrument.quantize_qty(1.169) == Decimal('1.16')
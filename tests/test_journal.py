@@ -0,0 +1,43 @@
+import os
+import threading
+
+from utils.journal import COMPACT_EVERY, OpportunityJournal
+from utils.records import Leg, Opportunity
+
+
+def opportunity(date: float) -> Opportunity:
+    leg = Leg('buy_orders_usdt', 'XRPUSDT', 'Buy')
+    leg.orders.extend([(0.5 + i / 1000, 10.0) for i in range(20)])
+    record = Opportunity('usdt_to_usdc', [leg])
+    record.date, record.pair1, record.pair2, record.profit = date, 'XRPUSDT', 'XRPUSDC', 0.1
+    return record
+
+
+def test_compaction_keeps_the_data_under_max_bytes(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    journal = OpportunityJournal(path, max_bytes=256 * 1024)
+    try:
+        for batch in range(20):
+            journal.append([opportunity(batch * COMPACT_EVERY + i) for i in range(COMPACT_EVERY)])
+            journal.flush()
+            assert journal.used_bytes() <= 256 * 1024
+        # новые записи занимают освобожденные страницы, файл не растет вместе с журналом
+        assert os.path.getsize(path) < 2 * 256 * 1024 + COMPACT_EVERY * 1024
+        # удаляются самые старые записи, последняя пачка на месте
+        kept = len(journal.range())
+        assert kept and len(journal.range(start=20 * COMPACT_EVERY - kept)) == kept
+    finally:
+        journal.close()
+
+
+def test_append_leaves_writes_and_compaction_to_the_journal_thread(tmp_path):
+    journal = OpportunityJournal(str(tmp_path / 'journal.db'))
+    threads = []
+    journal.compact = lambda: threads.append(threading.current_thread())
+    try:
+        journal.append([opportunity(i) for i in range(COMPACT_EVERY)])
+        journal.flush()
+        assert len(threads) == 1 and threads[0] is not threading.current_thread()
+        assert len(journal.last(COMPACT_EVERY)) == COMPACT_EVERY
+    finally:
+        journal.close()
@@ -0,0 +1,27 @@
+import pytest
+
+from utils.log_reader import read_last_records
+
+LINES = [
+    '2024-06-01 12:00:00,000 - INFO - started',
+    '2024-06-01 12:00:01,000 - WARNING - slow cycle',
+    '2024-06-01 12:00:02,000 - ERROR - order rejected',
+    'Traceback (most recent call last):',
+    '2024-06-01 12:00:03,000 - INFO - recalculated',
+]
+
+
+def test_level_filter_ignores_case(tmp_path):
+    path = tmp_path / 'bot.log'
+    path.write_text('\n'.join(LINES) + '\n')
+    for level in ('warning', 'WARNING', 'Warning'):
+        records = read_last_records(10, str(path), level=level)
+        assert [record[1] for record in records] == ['WARNING', 'ERROR']
+    assert records[1][2].endswith('Traceback (most recent call last):')
+
+
+def test_unknown_level_is_rejected(tmp_path):
+    path = tmp_path / 'bot.log'
+    path.write_text('\n'.join(LINES) + '\n')
+    with pytest.raises(ValueError):
+        read_last_records(10, str(path), level='loud')
@@ -0,0 +1,40 @@
+import pytest
+
+from utils.metrics import Histogram, Metrics
+
+
+def test_values_fall_into_logarithmic_buckets():
+    histogram = Histogram(lowest=1e-6, highest=1.0, growth=2.0)
+    # корзина i покрывает (1e-6 * 2 ** (i - 1), 1e-6 * 2 ** i]
+    for value, index in ((0.0, 0), (1e-6, 0), (1.5e-6, 1), (3e-6, 2), (5e-6, 3), (0.9, 20), (50.0, 20)):
+        before = list(histogram.counts)
+        histogram.record(value)
+        assert [i for i, (a, b) in enumerate(zip(before, histogram.counts)) if a != b] == [index]
+    # все, что выше highest, попадает в последнюю корзину
+    assert len(histogram.counts) == 21 and histogram.count == 7
+    assert histogram.max == 50.0
+
+
+def test_percentiles_are_within_one_bucket_of_the_true_value():
+    histogram = Histogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    assert 0.050 <= histogram.percentile(0.5) <= 0.050 * 1.02
+    assert 0.099 <= histogram.percentile(0.99) <= 0.099 * 1.02
+    # верхняя граница корзины не выходит за наибольшее значение
+    assert histogram.percentile(1.0) == 0.1
+    assert histogram.percentile(0.0) == pytest.approx(0.001, rel=0.02)
+    summary = histogram.summary()
+    assert summary['count'] == 100 and summary['mean'] == pytest.approx(0.0505)
+    assert Histogram().percentile(0.99) == 0.0
+
+
+def test_prometheus_export_lists_stages_and_counters():
+    metrics = Metrics()
+    metrics.observe('calc', 0.002)
+    metrics.observe('custom', 0.5)
+    metrics.increment('retries', 3)
+    text = metrics.prometheus()
+    assert 'arbitrage_stage_seconds{stage="calc",quantile="0.5"} 0.002' in text
+    assert 'arbitrage_stage_seconds_count{stage="custom"} 1' in text
+    assert 'arbitrage_retries_total 3' in text
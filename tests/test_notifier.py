@@ -0,0 +1,69 @@
+import asyncio
+
+from utils.notifier import MAX_MESSAGE_LENGTH, TelegramNotifier
+
+
+def notifier(**kwargs) -> tuple:
+    notifier = TelegramNotifier('token', 'chat', min_interval=0.2, **kwargs)
+    posts = []
+
+    async def post(http, text: str):
+        posts.append(text)
+
+    notifier.post = post
+    return notifier, posts
+
+
+def test_messages_queued_within_the_interval_go_out_as_one_digest():
+    notifier_, posts = notifier()
+
+    async def run():
+        task = asyncio.ensure_future(notifier_.run())
+        notifier_.send("first")
+        await asyncio.sleep(0.05)
+        # первое сообщение ушло сразу, следующие ждут интервала и уходят одним дайджестом
+        for text in ("second", "third"):
+            notifier_.send(text)
+        await asyncio.sleep(0.3)
+        notifier_.stop()
+        await task
+
+    asyncio.run(run())
+    assert posts == ["first", "second\nthird"]
+
+
+def test_full_queue_drops_the_oldest_messages():
+    notifier_, posts = notifier(maxsize=3)
+    for i in range(5):
+        notifier_.send(f"message {i}")
+    assert list(notifier_.queue) == ["message 2", "message 3", "message 4"] and notifier_.dropped == 2
+
+    notifier_.stop()
+    asyncio.run(notifier_.run())
+    assert posts == ["(2 notifications dropped)\nmessage 2\nmessage 3\nmessage 4"]
+    assert notifier_.dropped == 0
+
+
+def test_stop_flushes_what_is_queued():
+    notifier_, posts = notifier()
+    long = "x" * (MAX_MESSAGE_LENGTH - 100)
+
+    async def run():
+        task = asyncio.ensure_future(notifier_.run())
+        await asyncio.sleep(0)
+        notifier_.send(long)
+        notifier_.send(long)
+        notifier_.send("last")
+        notifier_.stop()
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(run())
+    # два длинных сообщения не помещаются в одно сообщение Telegram
+    assert posts == [long, f"{long}\nlast"]
+    assert not notifier_.queue and notifier_.sent == 2
+
+
+def test_without_chat_id_nothing_is_queued():
+    notifier_ = TelegramNotifier('token', None)
+    notifier_.send("lost")
+    assert not notifier_.queue
@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from utils.orderbook import OrderBookEngine
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message: str):
+        self.sent.append(json.loads(message))
+
+
+def message(kind: str, update_id: int, bids=(), asks=()) -> dict:
+    return {'topic': 'orderbook.50.XRPUSDT', 'type': kind, 'ts': 1700000000000,
+            'data': {'s': 'XRPUSDT', 'u': update_id, 'b': [list(level) for level in bids],
+                     'a': [list(level) for level in asks]}}
+
+
+async def gap_and_resync():
+    engine = OrderBookEngine(['XRPUSDT'])
+    engine._ws = socket = RecordingSocket()
+    resets = []
+    engine.reset_listeners.append(lambda book: resets.append(len(book.view().bids)))
+    engine.handle_message(message('snapshot', 10, [('0.5', '100')], [('0.51', '100')]))
+    engine.handle_message(message('delta', 11, [('0.5', '90')]))
+    assert engine.snapshot()['XRPUSDT'].bids[0][1] == 90
+
+    # дельта 12 потеряна, следом приходят еще несколько, отправленных до переподписки
+    for update_id in range(13, 19):
+        engine.handle_message(message('delta', update_id, [('0.49', '5')]))
+    await asyncio.sleep(0)
+    assert engine.resyncs == 1 and resets == [0]
+    assert [item['op'] for item in socket.sent] == ['unsubscribe', 'subscribe']
+    assert 'XRPUSDT' not in engine.snapshot()
+
+    engine.handle_message(message('snapshot', 100, [('0.52', '7')], [('0.53', '8')]))
+    engine.handle_message(message('delta', 101, [('0.52', '6')]))
+    book = engine.snapshot()['XRPUSDT']
+    assert book.bids[0][0] == 0.52 and book.bids[0][1] == 6
+    assert not engine.resyncing and engine.resyncs == 1
+
+
+def test_gap_triggers_one_resync_and_drops_deltas_until_snapshot():
+    asyncio.run(gap_and_resync())
+
+
+def test_first_delta_without_snapshot_is_a_gap():
+    async def run():
+        engine = OrderBookEngine(['XRPUSDT'])
+        engine.handle_message(message('delta', 5, [('0.5', '1')]))
+        engine.handle_message(message('delta', 6, [('0.5', '1')]))
+        await asyncio.sleep(0)
+        # без соединения переподписываться некуда, флаг снимается сразу
+        assert engine.resyncs == 1 and not engine.resyncing
+
+    asyncio.run(run())
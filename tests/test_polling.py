@@ -0,0 +1,66 @@
+import pytest
+
+from utils.polling import PollScheduler
+
+
+def pairs(count):
+    return [(f"C{i}USDT", f"C{i}USDC") for i in range(count)]
+
+
+def run(scheduler, seconds, warmup=0.0):
+    """
+    Requests and polls per pair over seconds of cycles, after the warmup seconds are skipped.
+    """
+    polls = dict.fromkeys(scheduler.pairs, 0)
+    requests = 0
+    now = 0.0
+    while now < warmup + seconds:
+        symbols = scheduler.due(now)
+        if now >= warmup:
+            requests += len(symbols)
+            for pair in scheduler.polled:
+                polls[pair] += 1
+        now += scheduler.interval
+    return requests, polls
+
+
+def test_requests_stay_within_the_budget():
+    scheduler = PollScheduler(pairs(50), budget=12, interval=0.25, min_period=30)
+    # первый цикл опрашивает все пары сразу, чтобы быстрее получить первую оценку
+    requests, polls = run(scheduler, 120, warmup=30)
+    assert requests / 120 <= 12 * 1.05
+    # бюджет не простаивает
+    assert requests / 120 >= 12 * 0.9
+    # каждая пара опрашивается не реже минимальной частоты
+    assert min(polls.values()) >= 120 / 30 - 1
+
+
+def test_pairs_close_to_break_even_are_polled_more_often():
+    scheduler = PollScheduler(pairs(20), budget=12, interval=0.25, min_period=30)
+    hot, cold = scheduler.pairs[0], scheduler.pairs[1]
+    for pair in scheduler.pairs:
+        scheduler.gaps[pair] = 0.01
+    scheduler.gaps[hot] = 0.0
+    _, polls = run(scheduler, 60)
+    assert polls[hot] > 5 * polls[cold]
+    # не чаще одного раза за цикл
+    assert polls[hot] <= 60 / 0.25
+
+
+def test_budget_too_small_for_the_pairs_is_rejected():
+    with pytest.raises(ValueError):
+        PollScheduler(pairs(200), budget=12, interval=0.25, min_period=30)
+
+
+def test_rebuild_keeps_the_scheduler_when_the_budget_rejects_new_pairs():
+    scheduler = PollScheduler(pairs(20), budget=12, interval=0.25, min_period=30)
+    scheduler.gaps[scheduler.pairs[5]] = 0.01
+    with pytest.raises(ValueError):
+        scheduler.rebuild(pairs(200))
+    assert scheduler.pairs == pairs(20)
+
+    # общие пары переносят оценки, новые начинают горячими
+    rebuilt = scheduler.rebuild(pairs(30)[5:])
+    assert rebuilt.pairs == pairs(30)[5:] and rebuilt.budget == 12
+    assert rebuilt.gaps[pairs(20)[5]] == 0.01 and pairs(20)[0] not in rebuilt.gaps
+    assert all(rebuilt.gaps[pair] == 0.0 for pair in pairs(30)[20:])
@@ -0,0 +1,38 @@
+import asyncio
+
+from utils import private_stream
+from utils.mock_exchange import MockExchange
+from utils.private_stream import PrivateStream
+
+
+async def connect(wait: float) -> tuple:
+    exchange = MockExchange()
+    url = await exchange.start()
+    stream = PrivateStream('key', 'secret', url.replace('http', 'ws', 1) + '/v5/private')
+    stream.subscribe('order', lambda data: None)
+    connects = []
+    stream.on_connect.append(lambda: connects.append(stream.connected))
+    task = asyncio.ensure_future(stream.run(reconnect_delay=0.05))
+    try:
+        await asyncio.sleep(wait)
+        return stream.connected, connects, dict(exchange.private_subscribers)
+    finally:
+        await stream.stop()
+        task.cancel()
+        await exchange.stop()
+
+
+def test_refused_auth_never_counts_as_connected(monkeypatch):
+    # срок действия подписи в прошлом: имитация отвечает на auth ошибкой
+    monkeypatch.setattr(private_stream, 'AUTH_EXPIRES', -10)
+    connected, connects, subscribers = asyncio.run(connect(0.5))
+    assert not connected
+    assert connects == []
+    assert not subscribers
+
+
+def test_accepted_auth_subscribes_and_connects():
+    connected, connects, subscribers = asyncio.run(connect(0.3))
+    assert connected
+    assert connects == [True]
+    assert [topics for topics in subscribers.values()] == [{'order'}]
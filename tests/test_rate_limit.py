@@ -0,0 +1,87 @@
+import pytest
+
+from utils import rate_limit
+from utils.metrics import Metrics
+from utils.rate_limit import BACKOFF, MAX_BACKOFF, RateLimiter
+
+ORDERBOOK = '/v5/market/orderbook'
+CREATE = '/v5/order/create'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        # часы биржи в заголовках - это Unix time, здесь он идет вместе с monotonic
+        return 1700000000.0 + self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+
+def test_polling_leaves_the_reserved_budget_to_orders(clock):
+    limiter = RateLimiter(limits={ORDERBOOK: 100}, ip_rate=10, ip_capacity=20)
+    # стаканы не трогают последние 25% бюджета по IP
+    granted = 0
+    while limiter.try_acquire(ORDERBOOK) == 0:
+        granted += 1
+    assert granted == 15
+    assert limiter.try_acquire(ORDERBOOK) == pytest.approx(0.1)
+    assert limiter.try_acquire(CREATE) == 0
+
+    # ордера доедают бюджет до нуля, дальше ждут пополнения, как и все
+    for _ in range(4):
+        assert limiter.try_acquire(CREATE) == 0
+    assert limiter.try_acquire(CREATE) == pytest.approx(0.1)
+    clock.advance(0.1)
+    assert limiter.try_acquire(CREATE) == 0
+    # стакан ждет, пока ордера не вернут себе резерв
+    assert limiter.try_acquire(ORDERBOOK) == pytest.approx(0.6)
+
+
+def test_bucket_follows_the_limit_headers(clock):
+    limiter = RateLimiter(ip_rate=1000, ip_capacity=1000)
+    assert limiter.bucket(CREATE).capacity == 20
+    # другой процесс с тем же ключом уже потратил почти весь лимит
+    limiter.update(CREATE, {'X-Bapi-Limit': '5', 'X-Bapi-Limit-Status': '1'})
+    assert limiter.bucket(CREATE).capacity == 5
+    assert limiter.try_acquire(CREATE) == 0
+    assert limiter.try_acquire(CREATE) == pytest.approx(0.2)
+
+    # лимит исчерпан на бирже: ждем до времени сброса из заголовка
+    reset = int((clock.time() + 2) * 1000)
+    limiter.update(CREATE, {'X-Bapi-Limit': '5', 'X-Bapi-Limit-Status': '0',
+                            'X-Bapi-Limit-Reset-Timestamp': str(reset)})
+    assert limiter.try_acquire(CREATE) == pytest.approx(2)
+    # другие эндпоинты не затронуты
+    assert limiter.try_acquire('/v5/order/cancel') == 0
+    clock.advance(2)
+    assert limiter.try_acquire(CREATE) == 0
+
+
+@pytest.mark.parametrize('status', [403, 429])
+def test_ip_limit_response_pauses_every_request(clock, status):
+    metrics = Metrics()
+    limiter = RateLimiter(metrics=metrics)
+    limiter.update(ORDERBOOK, {}, status)
+    assert metrics.counters['rate_limited'] == 1
+    assert limiter.try_acquire(ORDERBOOK) == pytest.approx(BACKOFF)
+    assert limiter.try_acquire(CREATE) == pytest.approx(BACKOFF)
+    clock.advance(BACKOFF)
+    assert limiter.try_acquire(CREATE) == 0
+
+    # время сброса дальше MAX_BACKOFF не ждем, даже если часы разошлись
+    reset = int((clock.time() + 60) * 1000)
+    limiter.update(ORDERBOOK, {'X-Bapi-Limit-Reset-Timestamp': str(reset)}, status)
+    assert limiter.try_acquire(CREATE) == pytest.approx(MAX_BACKOFF)
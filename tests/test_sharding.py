@@ -0,0 +1,24 @@
+from utils.records import ArrayBook
+from utils.sharding import SharedBooks
+
+
+def test_reset_book_is_published_as_not_ready():
+    books = SharedBooks(['XRPUSDT', 'USDCUSDT'], depth=3)
+    reader = SharedBooks(name=books.name)
+    try:
+        view = ArrayBook('XRPUSDT', 3)
+        assert reader.read('XRPUSDT', view) == (0, False)
+
+        books.write({'symbol': 'XRPUSDT', 'ts': 1700000000.0, 'bids': [(0.5, 100.0)], 'asks': [(0.51, 90.0)]})
+        seq, ready = reader.read('XRPUSDT', view)
+        assert seq and ready
+        assert list(view.bids) == [(0.5, 100.0)] and list(view.asks) == [(0.51, 90.0)]
+
+        # после разрыва стакан публикуется без уровней, но с временем последнего обновления
+        books.write({'symbol': 'XRPUSDT', 'ts': 1700000001.0, 'bids': [(0.5, 100.0)], 'asks': []}, ready=False)
+        assert reader.read('XRPUSDT', view) == (seq + 2, False)
+        assert not len(view.bids) and not len(view.asks) and view.ts == 1700000001.0
+        assert reader.timestamps() == {'XRPUSDT': 1700000001.0}
+    finally:
+        reader.close()
+        books.close()
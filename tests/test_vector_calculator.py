@@ -0,0 +1,106 @@
+import random
+
+import numpy as np
+import pytest
+
+from utils import calculator, vector_calculator
+from utils.instruments import Instrument
+from utils.records import ArrayBook
+from utils.sizing import solve_trade_size, usdt_to_usdc_legs
+
+
+def random_levels(rng, start, count, direction, decimals):
+    levels = []
+    price = start
+    for _ in range(count):
+        price *= 1 + direction * rng.uniform(0.00001, 0.002)
+        # тонкие уровни с дробными объемами, на которых округление до шага решает исход
+        volume = rng.choice([rng.uniform(0.001, 0.05), rng.uniform(0.01, 3), rng.uniform(1, 500)])
+        levels.append((round(price, decimals), round(volume, rng.randint(0, 4))))
+    return levels
+
+
+def random_book(rng, symbol, mid, depth, decimals):
+    if rng.random() < 0.5:
+        # пересекающиеся стаканы двух пар дают прибыльные маршруты
+        bids = random_levels(rng, mid * 1.005, rng.randint(0, depth), -1, decimals)
+        asks = random_levels(rng, mid * 0.995, rng.randint(0, depth), 1, decimals)
+    else:
+        bids = random_levels(rng, mid * (1 - rng.uniform(0, 0.003)), rng.randint(0, depth), -1, decimals)
+        asks = random_levels(rng, mid * (1 + rng.uniform(0, 0.003)), rng.randint(0, depth), 1, decimals)
+    if rng.random() < 0.5:
+        return {'symbol': symbol, 'bids': bids, 'asks': asks, 'ts': 0.0}
+    book = ArrayBook(symbol, depth)
+    book.update(bids, asks, 0.0)
+    return book
+
+
+def random_market(seed):
+    rng = random.Random(seed)
+    depth = rng.randint(1, 10)
+    pairs = [(f"C{i}USDT", f"C{i}USDC") for i in range(rng.randint(1, 20))]
+    prices = {}
+    instruments = {}
+    for pair in pairs:
+        mid = rng.choice([rng.uniform(0.01, 1), rng.uniform(1, 100), rng.uniform(100, 30000)])
+        decimals = rng.randint(2, 6)
+        for symbol in pair:
+            prices[symbol] = random_book(rng, symbol, mid * (1 + rng.uniform(-0.004, 0.004)), depth, decimals)
+            instruments[symbol] = Instrument(symbol, rng.choice(['1', '0.1', '0.01', '0.001', '0.000001']),
+                                             f"{10 ** -decimals:.{decimals}f}", rng.choice(['0', '0.01']),
+                                             rng.choice(['0', '1', '5']), rng.choice([None, '0.001', '0.0018']))
+    prices['USDCUSDT'] = random_book(rng, 'USDCUSDT', 1.0, depth, 4)
+    instruments['USDCUSDT'] = Instrument('USDCUSDT', '0.01', '0.0001', '1', '1', '0')
+    return pairs, prices, instruments
+
+
+def summary(opportunities):
+    return [(item.pair1, item.pair2, item.qty_usdt, item.simulated_usdt, item.final_usdt, item.profit,
+             [(leg.symbol, leg.side, list(leg.orders)) for leg in item.legs]) for item in opportunities]
+
+
+@pytest.mark.parametrize('max_notional', [None, 1000, 50])
+@pytest.mark.parametrize('with_instruments', [False, True])
+def test_numpy_engine_matches_reference(max_notional, with_instruments):
+    found = 0
+    for seed in range(300):
+        pairs, prices, instruments = random_market(seed)
+        instruments = instruments if with_instruments else None
+        expected = calculator.calculate_arbitrage_opportunities(prices, pairs, max_notional=max_notional,
+                                                                min_notional=5, instruments=instruments)
+        actual = vector_calculator.calculate_arbitrage_opportunities(prices, pairs, max_notional=max_notional,
+                                                                     min_notional=5, instruments=instruments)
+        assert summary(actual) == summary(expected), f"seed {seed}"
+        found += len(expected)
+    # без прибыльных маршрутов сравнение ничего бы не проверяло
+    assert found > 50
+
+
+def test_sells_level_by_level_until_the_coins_run_out():
+    prices = {
+        'XUSDT': {'symbol': 'XUSDT', 'bids': [(79.9, 5.0)], 'asks': [(80.0, 1.25)], 'ts': 0.0},
+        'XUSDC': {'symbol': 'XUSDC', 'bids': [(81.0, 1.0), (80.9, 0.25), (80.8, 0.004), (80.7, 5.0)],
+                  'asks': [(81.1, 5.0)], 'ts': 0.0},
+        'USDCUSDT': {'symbol': 'USDCUSDT', 'bids': [(1.0, 100000.0)], 'asks': [(1.0001, 100000.0)], 'ts': 0.0},
+    }
+    pairs = [('XUSDT', 'XUSDC')]
+    expected = calculator.calculate_arbitrage_opportunities(prices, pairs, fee=0.0)
+    actual = vector_calculator.calculate_arbitrage_opportunities(prices, pairs, fee=0.0)
+    assert summary(actual) == summary(expected)
+    assert actual[0].legs[1].orders == [(81.0, 1.0), (80.9, 0.25)]
+
+
+def test_trade_sizes_match_solve_trade_size():
+    for seed in range(200):
+        pairs, prices, _ = random_market(seed)
+        for pair1, pair2 in pairs:
+            legs = usdt_to_usdc_legs(prices[pair1]['asks'], prices[pair2]['bids'], prices['USDCUSDT']['bids'])
+            notional, _ = solve_trade_size(legs, 300)
+            # одна пара; пустая нога дополняется уровнем нулевой емкости
+            arrays = [(np.array([[rate for rate, _ in leg] or [1.0]]),
+                       np.array([[capacity for _, capacity in leg] or [0.0]])) for leg in legs]
+            counts = [np.array([len(leg)]) for leg in legs]
+            assert vector_calculator.solve_trade_sizes(arrays, counts, 300)[0] == notional
+            expected = calculator.trade_size(calculator.USDT_TO_USDC, pair1, pair2, prices, max_notional=300,
+                                             min_notional=5)
+            assert vector_calculator.trade_sizes(arrays, counts, 300, 5)[0] == expected
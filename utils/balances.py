@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+
+
+class BalanceCache:
+    """
+    Wallet balances kept in memory: loaded with a REST snapshot, then updated by the private 'wallet' topic,
+    so balance checks on the trading path do not need a get_wallet_balance round trip.
+
+    Amounts can be reserved while a trade is in flight, so two trades cannot count on the same funds
+    before the wallet update for the first one arrives.
+
+    Args:
+    - session: pybit HTTP session used for snapshots.
+    - stream (PrivateStream): Stream to subscribe to; every (re)connect triggers a new snapshot.
+    - account_type (str): Bybit account type.
+    """
+
+    def __init__(self, session, stream=None, account_type: str = "UNIFIED"):
+        self.session = session
+        self.account_type = account_type
+        self.balances = {}
+        self.reserved = {}
+        self.updated_at = {}
+        self.ready = False
+        self._reconciling = None
+        if stream is not None:
+            stream.subscribe('wallet', self.handle_wallet)
+            stream.on_connect.append(self.schedule_reconcile)
+
+    def _apply(self, accounts, requested_at: float = None):
+        now = time.monotonic()
+        for account in accounts:
+            if account.get('accountType', self.account_type) != self.account_type:
+                continue
+            for coin in account['coin']:
+                name = coin['coin']
+                # снимок, запрошенный раньше последнего сообщения потока, уже устарел для этой монеты
+                if requested_at is not None and self.updated_at.get(name, 0) > requested_at:
+                    continue
+                self.balances[name] = float(coin['equity'] or 0)
+                self.updated_at[name] = now
+
+    def handle_wallet(self, data):
+        self._apply(data)
+
+    def fetch(self):
+        """
+        Requests a REST snapshot of every coin of the account; safe to run in a worker thread, as it does not
+        touch the cache.
+
+        Returns:
+        - list: Accounts of the wallet balance response, or None if the API failed.
+        """
+        try:
+            return self.session.get_wallet_balance(accountType=self.account_type)['result']['list']
+        except Exception as e:
+            logging.error(f"Failed to load wallet balance: {e}")
+            return None
+
+    async def reconcile(self):
+        """
+        Loads a REST snapshot in a worker thread and applies it on the event loop, where the stream updates and
+        reservations change the cache too. If the API fails, the cached values are kept.
+        """
+        requested_at = time.monotonic()
+        accounts = await asyncio.get_event_loop().run_in_executor(None, self.fetch)
+        if accounts is None:
+            return
+        self._apply(accounts, requested_at)
+        self.ready = True
+
+    def schedule_reconcile(self):
+        # пока поток был отключен, обновления кошелька могли потеряться
+        if self._reconciling is None or self._reconciling.done():
+            self._reconciling = asyncio.ensure_future(self.reconcile())
+
+    def get(self, coin: str) -> float:
+        """
+        Never calls the API: until the first snapshot is loaded the balance is 0, so nothing is traded on it,
+        and a snapshot is requested in the background.
+
+        Returns:
+        - float: Balance of the coin that is not reserved by trades in flight.
+        """
+        if not self.ready:
+            self.schedule_reconcile()
+        return self.balances.get(coin, 0.0) - self.reserved.get(coin, 0.0)
+
+    def reserve(self, coin: str, amount: float) -> bool:
+        """
+        Reserves an amount of the coin for a trade.
+
+        Returns:
+        - bool: False if the free balance is not enough; nothing is reserved then.
+        """
+        if self.get(coin) < amount:
+            return False
+        self.reserved[coin] = self.reserved.get(coin, 0.0) + amount
+        return True
+
+    def release(self, coin: str, amount: float):
+        left = self.reserved.get(coin, 0.0) - amount
+        if left > 1e-12:
+            self.reserved[coin] = left
+        else:
+            self.reserved.pop(coin, None)
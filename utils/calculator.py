@@ -0,0 +1,350 @@
+import logging
+import math
+import time
+
+from utils.instruments import meets_minimums, steps, taker_fee
+from utils.records import Leg, Opportunity
+from utils.sizing import solve_trade_size, usdc_to_usdt_legs, usdt_to_usdc_legs
+
+USDT_TO_USDC = 'USDT -> USDC'
+USDC_TO_USDT = 'USDC -> USDT'
+
+# ключи ордеров каждого шага маршрута в том виде, в каком их ждет execute_arbitrage
+LEGS = {
+    USDT_TO_USDC: (('buy_orders_usdt', 'Buy'), ('sell_orders_usdc', 'Sell'), ('sell_orders_usdc_to_usdt', 'Sell')),
+    USDC_TO_USDT: (('buy_orders_usdt_to_usdc', 'Buy'), ('buy_orders_usdc', 'Buy'), ('sell_orders_usdt', 'Sell')),
+}
+
+
+def rounding(item: float, degree: int = 100) -> float:
+    """
+    Функция для округления чисел в меньшую сторону. По дефолту округляет до сотых.
+    Нужна для корректного расчета баланса полученых монет (их не может быть больше как при арифметическом округлении)
+    Округление идет по целому числу шагов: произведение item * degree во float неточно (1.16 * 100 = 115.99...),
+    поэтому результат - наибольшее число шагов n, для которого n / degree не больше item
+    :param item (float): число для округления
+    :param degree (int): степень округления
+    :return:
+    float - возвращает результат
+    """
+    steps = math.floor(item * degree)
+    if (steps + 1) / degree <= item:
+        steps += 1
+    elif steps / degree > item:
+        steps -= 1
+    return steps / degree
+
+
+def rounding_price(price, decimals=4):
+    return round(price, decimals)
+
+
+def new_route(direction: str) -> Opportunity:
+    return Opportunity(direction, [Leg(key, None, side) for key, side in LEGS[direction]])
+
+
+def simulate_usdt_to_usdc(pair1, pair2, prices, fee=0.001, route=None, qty_usdt=100, instruments=None):
+    """
+    Simulates USDT -> coin (pair1) -> USDC (pair2) -> USDT for qty_usdt USDT.
+
+    Args:
+    - route (Opportunity): Record to overwrite; a new one is created if not given.
+    - qty_usdt (float): Trade size in USDT.
+    - instruments (InstrumentCache): Per-symbol steps and fees; without it quantities are rounded to 0.01
+      and prices to 4 decimals.
+
+    Returns:
+    - Opportunity: The simulated route with the unrounded simulated_usdt, or None if one of the books is missing or empty.
+    """
+    if pair1 not in prices or pair2 not in prices or 'USDCUSDT' not in prices:
+        return None
+
+    usdt_asks = prices[pair1]['asks']
+    usdc_bids = prices[pair2]['bids']
+    usdc_to_usdt_bids = prices['USDCUSDT']['bids']
+    if not (usdt_asks and usdc_bids and usdc_to_usdt_bids):
+        return None
+
+    if route is None:
+        route = new_route(USDT_TO_USDC)
+    buy, sell, convert = route.legs
+    buy.reset(pair1)
+    sell.reset(pair2)
+    convert.reset('USDCUSDT')
+    route.qty_usdt = qty_usdt
+    fee = taker_fee(instruments, pair1, fee)
+    qty1, price1 = steps(instruments, pair1)
+    qty2, price2 = steps(instruments, pair2)
+    qtyc, pricec = steps(instruments, 'USDCUSDT')
+
+    coins_buyed = 0
+    qty_usdc = 0
+    buy_orders_usdt = buy.orders
+
+    # ШАГ1. Покупка монет за USDT
+    for ask_price, ask_volume in usdt_asks:
+        if rounding(qty_usdt) <= 0:
+            break
+        trade_volume = min(qty_usdt / ask_price, ask_volume)
+        qty_usdt -= trade_volume * ask_price
+        coins_buyed += rounding(rounding(trade_volume, qty1) * (1 - fee), qty1)
+        if rounding(trade_volume, qty1) > 0:
+            buy_orders_usdt.append((rounding_price(ask_price, price1), rounding(trade_volume, qty1)))
+
+    # Шаг 2 - продажа монет за USDC
+    sell_orders_usdc = sell.orders
+
+    for bid_price, bid_volume in usdc_bids:
+        if rounding(coins_buyed, qty2) <= 0:
+            break
+        trade_volume = min(coins_buyed, bid_volume)
+        if rounding(trade_volume, qty2) > 0:
+            coins_buyed -= rounding(trade_volume, qty2)
+            qty_usdc += trade_volume * bid_price
+            sell_orders_usdc.append((rounding_price(bid_price, price2), rounding(trade_volume, qty2)))
+
+    # Шаг 3 - продажа USDC за USDT
+    sell_orders_usdc_to_usdt = convert.orders
+    final_usdt = 0
+
+    for bid_price, bid_volume in usdc_to_usdt_bids:
+        if rounding(qty_usdc, qtyc) <= 0:
+            break
+        trade_volume = min(qty_usdc, bid_volume)
+        if rounding(trade_volume, qtyc) > 0:
+            final_usdt += trade_volume * bid_price
+            qty_usdc -= trade_volume
+            sell_orders_usdc_to_usdt.append((rounding_price(bid_price, pricec), rounding(trade_volume, qtyc)))
+
+    route.pair1 = pair1
+    route.pair2 = pair2
+    route.simulated_usdt = final_usdt
+    return route
+
+
+def simulate_usdc_to_usdt(pair1, pair2, prices, fee=0.001, route=None, qty_usdt=100, instruments=None):
+    """
+    Simulates USDT -> USDC -> coin (pair2) -> USDT (pair1) for qty_usdt USDT.
+    In the returned route pair1 is the USDC pair and pair2 is the USDT pair, as execute_arbitrage expects.
+
+    Args:
+    - route (Opportunity): Record to overwrite; a new one is created if not given.
+    - qty_usdt (float): Trade size in USDT.
+    - instruments (InstrumentCache): Per-symbol steps and fees.
+
+    Returns:
+    - Opportunity: The simulated route with the unrounded simulated_usdt, or None if one of the books is missing or empty.
+    """
+    if pair1 not in prices or pair2 not in prices or 'USDCUSDT' not in prices:
+        return None
+
+    usdc_asks = prices[pair2]['asks']
+    usdt_bids = prices[pair1]['bids']
+    usdt_to_usdc_asks = prices['USDCUSDT']['asks']
+    if not (usdc_asks and usdt_bids and usdt_to_usdc_asks):
+        return None
+
+    if route is None:
+        route = new_route(USDC_TO_USDT)
+    convert, buy, sell = route.legs
+    convert.reset('USDCUSDT')
+    buy.reset(pair2)
+    sell.reset(pair1)
+    route.qty_usdt = qty_usdt
+    fee = taker_fee(instruments, pair1, fee)
+    qty1, price1 = steps(instruments, pair1)
+    qty2, price2 = steps(instruments, pair2)
+    qtyc, pricec = steps(instruments, 'USDCUSDT')
+
+    qty_usdc = 0
+    coins_buyed = 0
+    buy_orders_usdt_to_usdc = convert.orders
+
+    # Шаг 1: Покупка USDC за USDT
+    for ask_price, ask_volume in usdt_to_usdc_asks:
+        if rounding(qty_usdt) <= 0:
+            break
+        trade_volume = min(qty_usdt / ask_price, ask_volume)
+        qty_usdt -= trade_volume * ask_price
+        qty_usdc += rounding(trade_volume, qtyc)
+        if rounding(trade_volume, qtyc) > 0:
+            buy_orders_usdt_to_usdc.append((rounding_price(ask_price, pricec), rounding(trade_volume, qtyc)))
+
+    # Шаг 2: Покупка монеты за USDC
+    buy_orders_usdc = buy.orders
+    for ask_price, ask_volume in usdc_asks:
+        if rounding(qty_usdc, qtyc) <= 0:
+            break
+        trade_volume = min(qty_usdc / ask_price, ask_volume)
+        qty_usdc -= trade_volume * ask_price
+        coins_buyed += rounding(trade_volume, qty2)
+        if rounding(trade_volume, qty2) > 0:
+            buy_orders_usdc.append((rounding_price(ask_price, price2), rounding(trade_volume, qty2)))
+
+    # Шаг 3: Продажа монеты за USDT
+    sell_orders_usdt = sell.orders
+    final_usdt = 0
+    for bid_price, bid_volume in usdt_bids:
+        if rounding(coins_buyed, qty1) <= 0:
+            break
+        trade_volume = min(coins_buyed, bid_volume)
+        final_usdt += trade_volume * bid_price * (1 - fee)
+        final_usdt = rounding(final_usdt)
+        coins_buyed -= trade_volume
+        if rounding(trade_volume, qty1) > 0:
+            sell_orders_usdt.append((rounding_price(bid_price, price1), rounding(trade_volume, qty1)))
+
+    route.pair1 = pair2
+    route.pair2 = pair1
+    route.simulated_usdt = final_usdt
+    return route
+
+
+def is_profitable(route, instruments=None) -> bool:
+    """
+    A route is profitable if it returns more USDT than it spends and every order passes the exchange minimums.
+    """
+    return route is not None and route.simulated_usdt > route.qty_usdt and meets_minimums(route, instruments)
+
+
+def make_opportunity(route) -> Opportunity:
+    """
+    Fills in the date, rounded final_usdt and profit of a profitable simulated route.
+    """
+    route.date = time.time()
+    route.final_usdt = rounding(route.simulated_usdt, degree=1000)
+    route.profit = rounding(route.final_usdt - route.qty_usdt, degree=1000)
+    return route
+
+
+def trade_size(direction, pair1, pair2, prices, fee=0.001, max_notional=None, min_notional=0, instruments=None):
+    """
+    Solves the profit-maximising trade size of a route from the current books.
+
+    Args:
+    - max_notional (float): Cap for the size (max trade size, wallet balance). None keeps the fixed 100 USDT.
+    - min_notional (float): Smallest size worth trading; smaller solutions are raised to it,
+      so the route is simulated at a size that can actually be placed.
+
+    Returns:
+    - float: Trade size in USDT.
+    """
+    if max_notional is None:
+        return 100
+    if pair1 not in prices or pair2 not in prices or 'USDCUSDT' not in prices:
+        return min_notional
+
+    fee = taker_fee(instruments, pair1, fee)
+    if direction == USDT_TO_USDC:
+        legs = usdt_to_usdc_legs(prices[pair1]['asks'], prices[pair2]['bids'], prices['USDCUSDT']['bids'], fee)
+    else:
+        legs = usdc_to_usdt_legs(prices['USDCUSDT']['asks'], prices[pair2]['asks'], prices[pair1]['bids'], fee)
+    notional, _ = solve_trade_size(legs, max_notional)
+    return max(rounding(notional), min_notional)
+
+
+ROUTES = (
+    (USDT_TO_USDC, simulate_usdt_to_usdc),
+    (USDC_TO_USDT, simulate_usdc_to_usdt),
+)
+
+
+def calculate_arbitrage_opportunities(prices, pairs, fee=0.001, max_notional=None, min_notional=0, instruments=None):
+    start_time = time.time()
+    logging.debug("started to calc opportunities")
+    opportunities = []
+
+    for pair1, pair2 in pairs:
+        for direction, simulate in ROUTES:
+            qty_usdt = trade_size(direction, pair1, pair2, prices, fee, max_notional, min_notional, instruments)
+            route = simulate(pair1, pair2, prices, fee, qty_usdt=qty_usdt, instruments=instruments)
+            if is_profitable(route, instruments):
+                opportunities.append(make_opportunity(route))
+
+    end_time = time.time()
+    logging.info("Time taken for calculating: %s seconds", end_time - start_time)
+    return opportunities
+
+
+class IncrementalEvaluator:
+    """
+    Keeps the last simulated route per (pair, direction) and re-simulates only the pairs whose books changed.
+
+    Args:
+    - pairs (list): (USDT pair, USDC pair) tuples, as in PAIRS.
+    - fee (float): Trading fee.
+    - max_notional (float): Cap for the solved trade size; None keeps the fixed 100 USDT.
+    - min_notional (float): Smallest trade size worth placing.
+    - instruments (InstrumentCache): Per-symbol steps, minimums and fees.
+    """
+
+    def __init__(self, pairs, fee=0.001, max_notional=None, min_notional=0, instruments=None):
+        self.pairs = list(pairs)
+        self.fee = fee
+        self.max_notional = max_notional
+        self.min_notional = min_notional
+        self.instruments = instruments
+        self._invalidated = False
+        self.routes = {}
+        self.records = {}
+        self.profitable = set()
+        self.pairs_by_symbol = {}
+        for pair1, pair2 in self.pairs:
+            self.pairs_by_symbol.setdefault(pair1, []).append((pair1, pair2))
+            self.pairs_by_symbol.setdefault(pair2, []).append((pair1, pair2))
+
+    def invalidate(self):
+        """
+        Makes the next update re-simulate every route, e.g. after instrument rules were refreshed.
+        """
+        self._invalidated = True
+
+    def set_max_notional(self, max_notional):
+        """
+        Changes the size cap (e.g. after the wallet balance changed); every route is re-solved on the next update.
+        """
+        if max_notional != self.max_notional:
+            self.max_notional = max_notional
+            self.invalidate()
+
+    def affected_pairs(self, changed):
+        # USDCUSDT участвует в каждом маршруте, поэтому его изменение инвалидирует всё
+        if changed is None or 'USDCUSDT' in changed or self._invalidated:
+            self._invalidated = False
+            return self.pairs
+        affected = set()
+        for symbol in changed:
+            affected.update(self.pairs_by_symbol.get(symbol, ()))
+        return affected
+
+    def update(self, prices, changed=None):
+        """
+        Re-simulates the routes affected by the changed books.
+
+        Args:
+        - prices (dict): Current books by symbol.
+        - changed (set): Symbols whose books changed since the previous call; None re-simulates everything.
+
+        Returns:
+        - list: Opportunities for every route that is currently profitable.
+        """
+        start_time = time.time()
+        affected = self.affected_pairs(changed)
+        for pair1, pair2 in affected:
+            for direction, simulate in ROUTES:
+                key = (pair1, pair2, direction)
+                if key not in self.records:
+                    self.records[key] = new_route(direction)
+                qty_usdt = trade_size(direction, pair1, pair2, prices, self.fee, self.max_notional,
+                                      self.min_notional, self.instruments)
+                # запись маршрута переиспользуется между тиками, а не создается заново
+                route = simulate(pair1, pair2, prices, self.fee, self.records[key], qty_usdt, self.instruments)
+                self.routes[key] = route
+                if is_profitable(route, self.instruments):
+                    self.profitable.add(key)
+                else:
+                    self.profitable.discard(key)
+
+        opportunities = [make_opportunity(self.routes[key]) for key in self.profitable]
+        logging.info("Recalculated %d pairs in %s seconds", len(affected), time.time() - start_time)
+        return opportunities
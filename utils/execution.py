@@ -0,0 +1,423 @@
+import asyncio
+import logging
+import time
+
+from utils.calculator import USDC_TO_USDT, USDT_TO_USDC
+from utils.metrics import Metrics
+from utils.order_tracker import TERMINAL_STATUSES
+from utils.transport import TRANSIENT_ERRORS, backoff, new_order_link_id
+
+# Bybit принимает не больше 10 ордеров spot в одном batch-запросе
+BATCH_SIZE = 10
+POLL_INTERVAL = 0.1
+# если приватный поток молчит дольше, состояние ордеров сверяется через REST
+RECONCILE_INTERVAL = 1.0
+LEG_TIMEOUT = 30
+# неудавшаяся отмена повторяется не чаще, чем раз в CANCEL_RETRY_INTERVAL секунд
+CANCEL_RETRY_INTERVAL = 1.0
+# столько секунд после таймаута нога ждет отмены ордеров, потом сверяется через REST и бросается
+GIVE_UP_TIMEOUT = 30
+# повторы ордеров после обрыва соединения; повтор с тем же orderLinkId биржа отклоняет как дубликат
+ORDER_RETRIES = 3
+DUPLICATE_ORDER_LINK_ID = 110072
+
+
+class LegState:
+    """
+    Orders of one leg and their fills.
+
+    Args:
+    - symbol (str): The trading pair symbol (e.g., 'XRPUSDT').
+    - side (str): 'Buy' or 'Sell'.
+    - timeout (float): Seconds after which the orders still open are cancelled.
+    """
+
+    def __init__(self, symbol: str, side: str, timeout: float = LEG_TIMEOUT):
+        self.symbol = symbol
+        self.side = side
+        self.orders = {}
+        self.consumed = 0.0
+        self.deadline = time.monotonic() + timeout
+        self.cancelled = False
+        # время следующей попытки отмены, если предыдущая не удалась
+        self.cancel_at = None
+        # ордера не удалось ни отменить, ни увидеть исполненными: нога больше не ждет их
+        self.abandoned = False
+        self.seen = None
+        # моменты (perf_counter) первой отправки ордеров, первого ответа биржи и полного исполнения ноги
+        self.sent = None
+        self.acked = None
+        self.filled = None
+
+    @property
+    def done(self) -> bool:
+        if self.abandoned:
+            return True
+        return all(order['orderStatus'] in TERMINAL_STATUSES for order in self.orders.values())
+
+    def output(self) -> float:
+        """
+        How much of the next leg's input currency this leg has produced so far, net of fees.
+        Bybit takes the spot fee in the received currency: base for buys, quote for sells.
+        """
+        total = 0.0
+        for order in self.orders.values():
+            fee = float(order.get('cumExecFee') or 0)
+            if self.side == 'Buy':
+                total += float(order.get('cumExecQty') or 0) - fee
+            else:
+                total += float(order.get('cumExecValue') or 0) - fee
+        return total
+
+
+def order_input(side: str, price: float, qty: float) -> float:
+    """
+    How much of the leg input currency an order spends: quote for buys, base for sells.
+    """
+    return qty * price if side == 'Buy' else qty
+
+
+def opportunity_legs(opportunity):
+    """
+    Orders of an opportunity as execution legs.
+
+    Returns:
+    - list: (symbol, side, [(price, qty), ...]) for every leg in execution order, or None for an unknown direction.
+    """
+    if opportunity['direction'] not in (USDT_TO_USDC, USDC_TO_USDT):
+        # маршруты графа валют (utils.graph) хранят ноги в порядке исполнения
+        legs = getattr(opportunity, 'legs', None)
+        if legs is None:
+            return None
+        return [(leg.symbol, leg.side, list(leg.orders)) for leg in legs]
+
+    pair1 = opportunity['pair1']
+    pair2 = opportunity['pair2']
+    direction = opportunity['direction']
+
+    if direction == USDT_TO_USDC:
+        return [
+            (pair1, 'Buy', opportunity['buy_orders_usdt']),  # Шаг 1: Покупка монеты за USDT
+            (pair2, 'Sell', opportunity['sell_orders_usdc']),  # Шаг 2: Продажа монеты за USDC
+            ('USDCUSDT', 'Sell', opportunity['sell_orders_usdc_to_usdt']),  # Шаг 3: Продажа USDC за USDT
+        ]
+    if direction == USDC_TO_USDT:
+        return [
+            ('USDCUSDT', 'Buy', opportunity['buy_orders_usdt_to_usdc']),  # Шаг 1: Покупка USDC за USDT
+            (pair1, 'Buy', opportunity['buy_orders_usdc']),  # Шаг 2: Покупка монеты за USDC
+            (pair2, 'Sell', opportunity['sell_orders_usdt']),  # Шаг 3: Продажа монеты за USDT
+        ]
+    return None
+
+
+def find_order_id(session, order_link_id: str):
+    """
+    Looks an order up by its orderLinkId, e.g. after a retry was rejected as a duplicate.
+
+    Returns:
+    - str: The orderId, or None if the exchange does not know the order.
+    """
+    for method in (session.get_open_orders, session.get_order_history):
+        orders = method(category="spot", orderLinkId=order_link_id)['result']['list']
+        if orders:
+            return orders[0]['orderId']
+    return None
+
+
+class ExecutionEngine:
+    """
+    Runs the legs of an opportunity: every leg is sent with batch order requests, and the next leg starts
+    placing orders as soon as the previous one has filled enough to pay for them.
+
+    Args:
+    - session: pybit HTTP session.
+    - instruments (InstrumentCache): Used to quantise and pre-validate orders.
+    - notify (callable): Sends a text notification (e.g. to Telegram).
+    - tracker (OrderTracker): Fill updates pushed by the private stream. Without it, or while the stream
+      is down, fills are polled over REST.
+    - timeout (float): Seconds a leg may stay open before its remaining orders are cancelled.
+    - give_up (float): Seconds after the timeout during which failed cancels are retried; then the leg is
+      reconciled over REST once more and its open orders are left behind.
+    - metrics (Metrics): Receives place_ack and fill latencies and rejection and retry counts.
+    """
+
+    def __init__(self, session, instruments=None, notify=None, tracker=None, timeout: float = LEG_TIMEOUT,
+                 give_up: float = GIVE_UP_TIMEOUT, metrics=None):
+        self.session = session
+        self.instruments = instruments
+        self.notify = notify or (lambda message: None)
+        self.tracker = tracker
+        self.timeout = timeout
+        self.give_up = give_up
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.current = []
+
+    @property
+    def open_orders(self) -> int:
+        """
+        Number of orders of the trade in progress that are not filled, cancelled or rejected yet.
+        """
+        return sum(1 for leg in self.current for order in leg.orders.values()
+                   if order['orderStatus'] not in TERMINAL_STATUSES)
+
+    async def _call(self, method, **kwargs):
+        # pybit синхронный, поэтому запросы уходят в пул потоков и не блокируют цикл событий
+        return await asyncio.get_event_loop().run_in_executor(None, lambda: method(**kwargs))
+
+    def prepare(self, symbol, side, qty, price):
+        """
+        Builds a batch request item with qty and price quantised to the symbol's steps.
+
+        Returns:
+        - dict: The request item, or None if the order would not pass the symbol's minimums.
+        """
+        if self.instruments is not None and symbol in self.instruments:
+            instrument = self.instruments[symbol]
+            qty = instrument.quantize_qty(qty)
+            price = instrument.quantize_price(price, side)
+            rejection = instrument.check_order(qty, price)
+            if rejection:
+                self.metrics.increment('rejections')
+                logging.error(f"{side} order for {symbol} skipped: {rejection}")
+                return None
+        return {
+            'symbol': symbol,
+            'side': side,
+            'orderType': 'Limit',
+            'qty': str(qty),
+            'price': str(price),
+            'timeInForce': 'GTC',
+            'orderLinkId': new_order_link_id(),
+        }
+
+    async def submit(self, leg: LegState, orders):
+        """
+        Places the orders of a leg with as few requests as possible; chunks are sent concurrently.
+        """
+        requests = [item for item in (self.prepare(leg.symbol, leg.side, qty, price) for price, qty in orders) if item]
+        chunks = [requests[i:i + BATCH_SIZE] for i in range(0, len(requests), BATCH_SIZE)]
+        sent = time.perf_counter()
+        if leg.sent is None:
+            leg.sent = sent
+        responses = await asyncio.gather(*[self.place_batch(chunk) for chunk in chunks])
+        if chunks:
+            acked = time.perf_counter()
+            self.metrics.observe('place_ack', acked - sent)
+            if leg.acked is None:
+                leg.acked = acked
+
+        placed = []
+        for chunk, response in zip(chunks, responses):
+            results = response['result']['list']
+            errors = response.get('retExtInfo', {}).get('list', [{}] * len(results))
+            for item, result, error in zip(chunk, results, errors):
+                order_id = result.get('orderId')
+                if not order_id and error.get('code') == DUPLICATE_ORDER_LINK_ID:
+                    # ордер был принят до обрыва соединения, в повторе пришел отказ: берем id исходного
+                    order_id = await self.find_order_id(item['orderLinkId'])
+                if order_id:
+                    leg.orders[order_id] = {'orderStatus': 'New'}
+                    leg.consumed += order_input(leg.side, float(item['price']), float(item['qty']))
+                    placed.append(f"{item['qty']}@{item['price']}")
+                else:
+                    self.metrics.increment('rejections')
+                    logging.error(f"{leg.side} order for {leg.symbol} rejected: {error.get('msg')}")
+
+        if placed:
+            message = f"{leg.side} orders placed for {leg.symbol}: {', '.join(placed)}"
+            self.notify(message)
+            logging.info(message)
+
+    async def place_batch(self, chunk):
+        """
+        Sends one batch request, repeating it with the same orderLinkIds if the connection breaks before
+        the response arrives.
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self._call(self.session.place_batch_order, category="spot", request=chunk)
+            except TRANSIENT_ERRORS as e:
+                if attempt >= ORDER_RETRIES:
+                    raise
+                delay = backoff(attempt)
+                attempt += 1
+                self.metrics.increment('retries')
+                logging.warning(f"Batch order request for {chunk[0]['symbol']} failed: {e}, retry {attempt}")
+                await asyncio.sleep(delay)
+
+    async def find_order_id(self, order_link_id: str):
+        return await self._call(find_order_id, session=self.session, order_link_id=order_link_id)
+
+    async def refresh(self, leg: LegState, reconcile: bool = False):
+        """
+        Updates the fill state of every order of the leg that is not finished yet.
+        Reads the order tracker when the private stream is live, otherwise (or when reconcile is set) asks REST.
+        """
+        pending = [order_id for order_id, order in leg.orders.items() if order['orderStatus'] not in TERMINAL_STATUSES]
+        if self.tracker is not None and self.tracker.live and not reconcile:
+            leg.seen = self.tracker.version
+            for order_id in pending:
+                order = self.tracker.get(order_id)
+                if order is not None:
+                    leg.orders[order_id] = order
+            self._check_filled(leg)
+            return
+
+        if self.tracker is not None and self.tracker.live:
+            # поток подключен, но молчит: состояние ордеров перепроверяется через REST
+            self.metrics.increment('retries')
+        responses = await asyncio.gather(*[
+            self._call(self.session.get_open_orders, category="spot", symbol=leg.symbol, orderId=order_id)
+            for order_id in pending
+        ])
+        for order_id, response in zip(pending, responses):
+            orders = response['result']['list']
+            if not orders:
+                # исполненный или отмененный ордер мог уже пропасть из открытых
+                response = await self._call(self.session.get_order_history, category="spot", orderId=order_id)
+                orders = response['result']['list']
+            if orders:
+                leg.orders[order_id] = orders[0]
+        self._check_filled(leg)
+
+    def _check_filled(self, leg: LegState):
+        if leg.filled is None and leg.orders and leg.done and not leg.abandoned:
+            leg.filled = time.perf_counter()
+            if leg.acked is not None:
+                self.metrics.observe('fill', leg.filled - leg.acked)
+
+    async def wait_update(self, leg: LegState) -> bool:
+        """
+        Waits for the next chance to see new fills of the leg.
+
+        Returns:
+        - bool: True if the private stream pushed an update, False if the caller should poll REST.
+        """
+        if self.tracker is None or not self.tracker.live:
+            await asyncio.sleep(POLL_INTERVAL)
+            return False
+        if leg.seen is None:
+            # трекер еще ни разу не читали для этой ноги: исполнения могли прийти, пока отправлялись ордера
+            return True
+        return await self.tracker.wait_for_update(RECONCILE_INTERVAL, leg.seen)
+
+    async def cancel(self, leg: LegState):
+        """
+        Cancels the orders of the leg that are still open; their partial fills are kept. If a cancel fails,
+        the next one is allowed after CANCEL_RETRY_INTERVAL seconds.
+        """
+        retry = leg.cancelled
+        leg.cancelled = True
+        pending = [order_id for order_id, order in leg.orders.items() if order['orderStatus'] not in TERMINAL_STATUSES]
+        results = await asyncio.gather(*[
+            self._call(self.session.cancel_order, category="spot", symbol=leg.symbol, orderId=order_id)
+            for order_id in pending
+        ], return_exceptions=True)
+        failed = 0
+        for order_id, result in zip(pending, results):
+            if isinstance(result, Exception):
+                # ордер мог исполниться, пока уходил запрос на отмену; тогда следующий refresh это покажет
+                failed += 1
+                logging.error(f"Failed to cancel order {order_id} for {leg.symbol}: {result}")
+        leg.cancel_at = time.monotonic() + CANCEL_RETRY_INTERVAL
+        if pending and not retry:
+            message = (f"Leg {leg.side} {leg.symbol} timed out, cancelled {len(pending) - failed} of {len(pending)} "
+                       f"open orders")
+            self.notify(message)
+            logging.info(message)
+
+    async def abandon(self, leg: LegState):
+        """
+        Gives the leg up after its cancels kept failing: the orders are read over REST one last time, and those
+        still open are left on the exchange, so the trade can finish with what has been filled.
+        """
+        try:
+            await self.refresh(leg, reconcile=True)
+        except Exception as e:
+            logging.error(f"Failed to reconcile orders of {leg.side} {leg.symbol}: {e}")
+        if leg.done:
+            return
+        left = [order_id for order_id, order in leg.orders.items() if order['orderStatus'] not in TERMINAL_STATUSES]
+        leg.abandoned = True
+        message = f"Leg {leg.side} {leg.symbol} could not cancel {len(left)} orders, left open: {', '.join(left)}"
+        self.notify(message)
+        logging.error(message)
+
+    async def expire(self, leg: LegState):
+        """
+        Cancels the open orders of a leg past its deadline, retries failed cancels on later calls and gives
+        the leg up give_up seconds after the deadline.
+        """
+        now = time.monotonic()
+        if leg.done or now <= leg.deadline:
+            return
+        if now > leg.deadline + self.give_up:
+            await self.abandon(leg)
+        elif leg.cancel_at is None or now >= leg.cancel_at:
+            await self.cancel(leg)
+
+    async def wait_done(self, leg: LegState):
+        await self.refresh(leg)
+        while not leg.done:
+            await self.expire(leg)
+            updated = await self.wait_update(leg)
+            await self.refresh(leg, reconcile=not updated)
+
+    async def execute(self, legs):
+        """
+        Executes the legs one after another, overlapping each leg with the fills of the previous one.
+
+        Args:
+        - legs (list): (symbol, side, [(price, qty), ...]) for every leg in execution order.
+
+        Returns:
+        - list: LegState of every leg.
+        """
+        states = []
+        self.current = states
+        upstream = None
+        for symbol, side, orders in legs:
+            leg = LegState(symbol, side, self.timeout)
+            states.append(leg)
+            pending = list(orders)
+            while pending:
+                if upstream is None:
+                    batch, pending = pending, []
+                else:
+                    # берем столько ордеров, сколько уже покрыто исполнением предыдущей ноги
+                    available = upstream.output() - leg.consumed
+                    batch = []
+                    while pending and order_input(side, *pending[0]) <= available:
+                        available -= order_input(side, *pending[0])
+                        batch.append(pending.pop(0))
+                    if not batch and upstream.done:
+                        # предыдущая нога исполнилась не полностью: раскладываем остаток по оставшимся ордерам
+                        for price, qty in pending:
+                            if available <= 0:
+                                break
+                            qty = min(qty, available / price if side == 'Buy' else available)
+                            batch.append((price, qty))
+                            available -= order_input(side, price, qty)
+                        pending = []
+
+                if batch:
+                    await self.submit(leg, batch)
+                elif pending:
+                    await self.expire(upstream)
+                    updated = await self.wait_update(upstream)
+                    await self.refresh(upstream, reconcile=not updated)
+
+            if upstream is not None:
+                await self.wait_done(upstream)
+            upstream = leg
+
+        if upstream is not None:
+            await self.wait_done(upstream)
+        for leg in states:
+            message = f"Leg {leg.side} {leg.symbol} finished, output: {leg.output()}"
+            self.notify(message)
+            logging.info(message)
+            if self.tracker is not None:
+                self.tracker.forget(leg.orders)
+        return states
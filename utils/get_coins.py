@@ -1,8 +1,24 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
 import requests
 
 # Bybit API endpoint
 base_url = "https://api.bybit.com"
 
+UNIVERSE_FILE = "settings/universe.json"
+UNIVERSE_TTL = 60 * 60
+# фильтры по умолчанию: диапазон цены, оборот за 24 часа в котируемой валюте и относительный спред;
+# верхняя граница цены не отсекает BTC и ETH, которые есть в запасном наборе пар бота
+MIN_PRICE = 0.001
+MAX_PRICE = 1000000
+MIN_TURNOVER = 50000
+MAX_SPREAD = 0.005
+
+
 # Получение списка всех доступных торговых пар
 def get_all_symbols():
     url = f"{base_url}/v5/market/tickers?category=spot"
@@ -18,44 +34,156 @@ def filter_usdt_usdc_pairs(symbols):
     for symbol_data in symbols:
         symbol = symbol_data['symbol']
         if symbol.endswith("USDT"):
-            usdt_pairs.add(symbol.replace("USDT", ""))
+            usdt_pairs.add(symbol[:-4])
         elif symbol.endswith("USDC"):
-            usdc_pairs.add(symbol.replace("USDC", ""))
+            usdc_pairs.add(symbol[:-4])
 
     # Пересечение двух множеств, чтобы оставить только те монеты, которые имеют обе пары
     common_pairs = usdt_pairs.intersection(usdc_pairs)
+    # USDCUSDT - это пара конвертации, а не монета для арбитража
+    common_pairs.discard("USDC")
     return common_pairs
 
 
-# Получение текущих цен для пары
-def get_current_price(symbol):
-    url = f"{base_url}/v5/market/tickers?category=spot&symbol={symbol}"
-    response = requests.get(url)
-    data = response.json()
-    if 'result' in data and 'list' in data['result'] and len(data['result']['list']) > 0:
-        return float(data['result']['list'][0]['lastPrice'])
-    return None
+def ticker_spread(ticker: dict) -> float:
+    """
+    Relative spread of a ticker, (ask - bid) / mid; infinite if a side of the book is empty.
+    """
+    bid = float(ticker.get('bid1Price') or 0)
+    ask = float(ticker.get('ask1Price') or 0)
+    if bid <= 0 or ask <= 0:
+        return float('inf')
+    return (ask - bid) / ((ask + bid) / 2)
 
 
-# Главная функция
-def main():
-    symbols_data = get_all_symbols()
-    if 'result' in symbols_data and 'list' in symbols_data['result']:
-        symbols = symbols_data['result']['list']
-        common_pairs = filter_usdt_usdc_pairs(symbols)
+def select_pairs(tickers, min_price: float = MIN_PRICE, max_price: float = MAX_PRICE,
+                 min_turnover: float = MIN_TURNOVER, max_spread: float = MAX_SPREAD) -> list:
+    """
+    Picks the coins traded against both USDT and USDC whose two tickers pass every filter.
+
+    Args:
+    - tickers (list): The 'list' of a single bulk get_tickers(category="spot") response.
+    - min_price (float), max_price (float): Band for the last price of both pairs.
+    - min_turnover (float): Minimum 24h turnover of each pair, in its quote currency.
+    - max_spread (float): Maximum relative spread of each pair.
+
+    Returns:
+    - list: (USDT pair, USDC pair) tuples sorted by symbol, like PAIRS in arbitrage_bot.py.
+    """
+    by_symbol = {ticker['symbol']: ticker for ticker in tickers}
+
+    def passes(ticker):
+        price = float(ticker.get('lastPrice') or 0)
+        return (min_price <= price <= max_price
+                and float(ticker.get('turnover24h') or 0) >= min_turnover
+                and ticker_spread(ticker) <= max_spread)
+
+    pairs = []
+    for coin in sorted(filter_usdt_usdc_pairs(tickers)):
+        usdt_pair, usdc_pair = f"{coin}USDT", f"{coin}USDC"
+        if passes(by_symbol[usdt_pair]) and passes(by_symbol[usdc_pair]):
+            pairs.append((usdt_pair, usdc_pair))
+    return pairs
 
-        filtered_pairs = []
-        for pair in common_pairs:
-            usdt_pair = f"{pair}USDT"
-            usdc_pair = f"{pair}USDC"
 
-            usdt_price = get_current_price(usdt_pair)
-            usdc_price = get_current_price(usdc_pair)
+class Universe:
+    """
+    Trading universe of the bot built from one bulk tickers request, persisted on disk and rebuilt after a TTL.
 
-            if usdt_price and usdc_price and 0.001 <= usdt_price <= 200 and 0.001 <= usdc_price <= 200:
-                filtered_pairs.append(pair)
+    Args:
+    - session: pybit HTTP session.
+    - path (str): File the universe is persisted to.
+    - ttl (float): Seconds after which the universe is rebuilt.
+    - filters: min_price, max_price, min_turnover and max_spread of select_pairs.
+    """
 
-        print(f"Активы с парами вида {{монета}}USDT и {{монета}}USDC, цена которых находится в диапазоне от 0.001 до 200$: {sorted(filtered_pairs)}")
+    def __init__(self, session, path: str = UNIVERSE_FILE, ttl: float = UNIVERSE_TTL, min_price: float = MIN_PRICE,
+                 max_price: float = MAX_PRICE, min_turnover: float = MIN_TURNOVER, max_spread: float = MAX_SPREAD):
+        self.session = session
+        self.path = path
+        self.ttl = ttl
+        self.filters = {'min_price': min_price, 'max_price': max_price, 'min_turnover': min_turnover,
+                        'max_spread': max_spread}
+        self.pairs = []
+        self.updated_at = 0.0
+        # увеличивается при каждом изменении состава пар, чтобы бот мог заметить смену без сравнения списков
+        self.version = 0
+
+    def is_stale(self) -> bool:
+        return time.time() - self.updated_at > self.ttl
+
+    def _set_pairs(self, pairs):
+        if pairs != self.pairs:
+            self.pairs = pairs
+            self.version += 1
+
+    def load(self):
+        """
+        Loads the universe from disk if it was built with the same filters and is fresh enough, otherwise from the API.
+        """
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            if data['filters'] == self.filters:
+                self._set_pairs([tuple(pair) for pair in data['pairs']])
+                self.updated_at = data['updated_at']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Failed to read universe cache: {e}")
+
+        if self.is_stale():
+            self.refresh()
+
+    def refresh(self):
+        """
+        Rebuilds the universe from the bulk tickers response and persists it.
+        If the API fails, the previous (possibly stale) universe is kept.
+        """
+        try:
+            tickers = self.session.get_tickers(category="spot")['result']['list']
+        except Exception as e:
+            logging.error(f"Failed to load tickers: {e}")
+            return
+        pairs = select_pairs(tickers, **self.filters)
+        if self.pairs and pairs != self.pairs:
+            added = sorted(set(pairs) - set(self.pairs))
+            removed = sorted(set(self.pairs) - set(pairs))
+            logging.info(f"Trading universe changed: added {added}, removed {removed}")
+        self._set_pairs(pairs)
+        self.updated_at = time.time()
+        self.save()
+
+    def save(self):
+        data = {'updated_at': self.updated_at, 'filters': self.filters, 'pairs': self.pairs}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.error(f"Failed to save universe cache: {e}")
+
+    async def run(self, interval: float = 60):
+        """
+        Rebuilds the universe in a worker thread whenever it goes stale, without blocking the event loop.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(interval)
+            if self.is_stale():
+                await loop.run_in_executor(None, self.refresh)
+
+
+# Главная функция
+def main():
+    symbols_data = get_all_symbols()
+    if 'result' in symbols_data and 'list' in symbols_data['result']:
+        # все цены, обороты и спреды уже есть в одном ответе, отдельные запросы по каждой паре не нужны
+        pairs = select_pairs(symbols_data['result']['list'])
+        coins = [usdt_pair[:-4] for usdt_pair, _ in pairs]
+        print(f"Активы с парами вида {{монета}}USDT и {{монета}}USDC, цена которых находится в диапазоне "
+              f"от {MIN_PRICE} до {MAX_PRICE}$, оборот от {MIN_TURNOVER}$, спред до {MAX_SPREAD:.2%}: {coins}")
     else:
         print("Не удалось получить список торговых пар.")
 
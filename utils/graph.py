@@ -0,0 +1,305 @@
+import logging
+import math
+import time
+
+import numpy as np
+
+from utils.calculator import make_opportunity, rounding, rounding_price
+from utils.instruments import meets_minimums, steps, taker_fee
+from utils.records import Leg, Opportunity
+
+# циклы начинаются и заканчиваются в валюте баланса бота
+ANCHOR = 'USDT'
+# валюты котирования; символ делится на базу и котировку по первому подходящему суффиксу
+QUOTE_COINS = ('USDT', 'USDC', 'BTC', 'ETH', 'EUR', 'DAI')
+MAX_CYCLE_LENGTH = 4
+
+
+def split_symbol(symbol: str, quotes=QUOTE_COINS):
+    """
+    Returns:
+    - tuple: (base, quote) of a spot symbol, e.g. ('ETH', 'BTC') for 'ETHBTC', or None for an unknown quote.
+    """
+    for quote in quotes:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return None
+
+
+def graph_symbols(symbols, pairs, quotes=QUOTE_COINS) -> list:
+    """
+    Symbols that connect the coins of the pairs and the quote coins with each other, e.g. every instrument
+    known to InstrumentCache filtered down to ADAUSDT, ADAUSDC, ADABTC, BTCUSDT, ETHBTC, USDCUSDT...
+    """
+    coins = {pair1[:-4] for pair1, _ in pairs} | set(quotes)
+    result = []
+    for symbol in symbols:
+        split = split_symbol(symbol, quotes)
+        if split and split[0] in coins:
+            result.append(symbol)
+    return sorted(result)
+
+
+def cycle_direction(cycle) -> str:
+    """
+    Readable route of a cycle of (symbol, side, from, to) legs, e.g. 'USDT -> BTC -> ETH -> USDT'.
+    """
+    return ' -> '.join([cycle[0][2]] + [leg[3] for leg in cycle])
+
+
+class CurrencyGraph:
+    """
+    Directed currency graph over spot symbols. Every symbol gives a buy edge quote -> base and a sell edge
+    base -> quote weighted by -log of the rate at the best level net of the taker fee, so the product of rates
+    along a cycle becomes a sum and a cycle whose weights add up below zero returns more than it spends.
+
+    Cycles of 3 to max_length legs through the anchor are enumerated once; on every tick only the edges of the
+    changed books are updated and only the cycles that use them are summed again.
+
+    Args:
+    - symbols (list): Spot symbols to build the graph from.
+    - anchor (str): Currency every cycle starts and ends in.
+    - max_length (int): Longest cycle, in legs.
+    - fee (float): Taker fee used for symbols without instrument data.
+    - instruments (InstrumentCache): Per-symbol fee rates.
+    - quotes (tuple): Quote coins used to split symbols into base and quote.
+    """
+
+    def __init__(self, symbols, anchor: str = ANCHOR, max_length: int = MAX_CYCLE_LENGTH, fee: float = 0.001,
+                 instruments=None, quotes=QUOTE_COINS):
+        self.anchor = anchor
+        self.edges = []
+        self.edge_index = {}
+        self.symbol_edges = {}
+        adjacency = {}
+        for symbol in symbols:
+            split = split_symbol(symbol, quotes)
+            if split is None:
+                continue
+            base, quote = split
+            for side, source, target in (('Buy', quote, base), ('Sell', base, quote)):
+                self.edge_index[(source, target)] = len(self.edges)
+                self.edges.append((symbol, side, source, target))
+                adjacency.setdefault(source, []).append(target)
+            self.symbol_edges[symbol] = (len(self.edges) - 2, len(self.edges) - 1)
+        self.log_fees = np.array([math.log(1 - taker_fee(instruments, symbol, fee)) for symbol, *_ in self.edges])
+
+        paths = []
+        self._find_cycles(adjacency, [anchor], max_length, paths)
+        self.cycles = [tuple(self.edges[self.edge_index[(a, b)]] for a, b in zip(path, path[1:])) for path in paths]
+        # короткие циклы дополняются фиктивным ребром с нулевым весом (последний элемент массива весов)
+        padding = len(self.edges)
+        self.cycle_edges = np.full((len(paths), max_length), padding, dtype=np.int64)
+        for i, path in enumerate(paths):
+            self.cycle_edges[i, :len(path) - 1] = [self.edge_index[(a, b)] for a, b in zip(path, path[1:])]
+        self.weights = np.full(len(self.edges) + 1, np.inf)
+        self.weights[padding] = 0.0
+        self.totals = np.full(len(paths), np.inf)
+
+        by_symbol = {}
+        for i, cycle in enumerate(self.cycles):
+            for symbol, *_ in cycle:
+                by_symbol.setdefault(symbol, []).append(i)
+        self.symbol_cycles = {symbol: np.array(indices, dtype=np.int64) for symbol, indices in by_symbol.items()}
+
+    def _find_cycles(self, adjacency, path, max_length, paths):
+        for target in adjacency.get(path[-1], ()):
+            if target == self.anchor:
+                # цикл из двух ног - купить и продать одну пару, он прибыльным не бывает
+                if len(path) >= 3:
+                    paths.append(path + [target])
+            elif target not in path and len(path) < max_length:
+                self._find_cycles(adjacency, path + [target], max_length, paths)
+
+    def update(self, prices, changed=None):
+        """
+        Updates the edges of the changed books and the totals of the cycles that use them.
+
+        Args:
+        - prices (dict): Current books by symbol.
+        - changed (set): Symbols whose books changed; None updates every edge.
+
+        Returns:
+        - tuple: (indices of the cycles that are negative now, indices of the cycles that were re-summed).
+        """
+        symbols = self.symbol_edges if changed is None else [symbol for symbol in changed if symbol in self.symbol_edges]
+        for symbol in symbols:
+            buy, sell = self.symbol_edges[symbol]
+            book = prices.get(symbol)
+            asks = book['asks'] if book is not None else None
+            bids = book['bids'] if book is not None else None
+            self.weights[buy] = math.log(asks[0][0]) - self.log_fees[buy] if asks and asks[0][0] > 0 else np.inf
+            self.weights[sell] = -math.log(bids[0][0]) - self.log_fees[sell] if bids and bids[0][0] > 0 else np.inf
+
+        if changed is None:
+            affected = np.arange(len(self.cycles))
+        else:
+            indices = [self.symbol_cycles[symbol] for symbol in symbols if symbol in self.symbol_cycles]
+            affected = np.unique(np.concatenate(indices)) if indices else np.empty(0, dtype=np.int64)
+        if len(affected):
+            self.totals[affected] = self.weights[self.cycle_edges[affected]].sum(axis=1)
+        return np.flatnonzero(self.totals < 0), affected
+
+
+def new_cycle_route(cycle) -> Opportunity:
+    route = Opportunity(cycle_direction(cycle),
+                        [Leg(f"{side.lower()}_orders_{symbol}", symbol, side) for symbol, side, _, _ in cycle])
+    route.pair1 = cycle[0][0]
+    route.pair2 = cycle[1][0]
+    return route
+
+
+def simulate_cycle(cycle, prices, fee=0.001, route=None, qty_usdt=100, instruments=None):
+    """
+    Walks qty_usdt of the anchor currency through the books of every leg of the cycle, like the fixed routes do.
+    Leftovers below the quantity step of a leg are not carried over.
+
+    Returns:
+    - Opportunity: The simulated route, or None if one of the books is missing or empty.
+    """
+    if route is None:
+        route = new_cycle_route(cycle)
+    route.qty_usdt = qty_usdt
+    amount = qty_usdt
+    for leg, (symbol, side, _, _) in zip(route.legs, cycle):
+        leg.reset(symbol)
+        book = prices.get(symbol)
+        levels = book and (book['asks'] if side == 'Buy' else book['bids'])
+        if not levels:
+            return None
+        leg_fee = taker_fee(instruments, symbol, fee)
+        qty_degree, price_decimals = steps(instruments, symbol)
+        received = 0.0
+        for price, size in levels:
+            # покупка тратит котируемую валюту, продажа - базовую
+            qty = rounding(min(amount / price if side == 'Buy' else amount, size), qty_degree)
+            if qty <= 0:
+                break
+            if side == 'Buy':
+                amount -= qty * price
+                received += qty * (1 - leg_fee)
+            else:
+                amount -= qty
+                received += qty * price * (1 - leg_fee)
+            leg.orders.append((rounding_price(price, price_decimals), qty))
+        amount = received
+    route.simulated_usdt = amount
+    return route
+
+
+def top_capacity(cycle, prices) -> float:
+    """
+    How much of the anchor currency the best levels of every leg can take, converted along the cycle.
+    """
+    capacity = math.inf
+    rate = 1.0
+    for symbol, side, _, _ in cycle:
+        price, size = prices[symbol]['asks' if side == 'Buy' else 'bids'][0]
+        if side == 'Buy':
+            capacity = min(capacity, size * price / rate)
+            rate /= price
+        else:
+            capacity = min(capacity, size / rate)
+            rate *= price
+    return capacity
+
+
+class GraphEvaluator:
+    """
+    Finds profitable cycles of 3 to max_length legs over every given symbol, with the same interface as
+    IncrementalEvaluator. Top-of-book cycle sums select the candidates; candidates are then sized and
+    simulated through the book depth with the symbol steps, fees and minimums, like the fixed routes.
+
+    Args:
+    - symbols (list): Spot symbols of the graph, e.g. from graph_symbols().
+    - fee (float): Trading fee for symbols without instrument data.
+    - max_notional (float): Cap for the trade size; None keeps the fixed 100 USDT.
+    - min_notional (float): Smallest trade size worth placing.
+    - instruments (InstrumentCache): Per-symbol steps, minimums and fees.
+    - anchor (str), max_length (int), quotes (tuple): See CurrencyGraph.
+    """
+
+    def __init__(self, symbols, fee=0.001, max_notional=None, min_notional=0, instruments=None, anchor=ANCHOR,
+                 max_length=MAX_CYCLE_LENGTH, quotes=QUOTE_COINS):
+        self.symbols = list(symbols)
+        self.fee = fee
+        self.max_notional = max_notional
+        self.min_notional = min_notional
+        self.instruments = instruments
+        self.anchor = anchor
+        self.max_length = max_length
+        self.quotes = quotes
+        self.graph = CurrencyGraph(self.symbols, anchor, max_length, fee, instruments, quotes)
+        self.records = {}
+        self.profitable = {}
+        # отрицательные по лучшим ценам, но не прибыльные по глубине; пересчитываются только при изменении стаканов
+        self.rejected = set()
+        self._invalidated = False
+
+    def invalidate(self):
+        """
+        Rebuilds the graph with the current fee rates and re-simulates every cycle on the next update.
+        """
+        self.graph = CurrencyGraph(self.symbols, self.anchor, self.max_length, self.fee, self.instruments, self.quotes)
+        self.records = {}
+        self.profitable = {}
+        self.rejected = set()
+        self._invalidated = True
+
+    def set_max_notional(self, max_notional):
+        if max_notional != self.max_notional:
+            self.max_notional = max_notional
+            self._invalidated = True
+
+    def sizes(self, cycle, prices) -> list:
+        if self.max_notional is None:
+            return [100]
+        capacity = max(self.min_notional, min(top_capacity(cycle, prices), self.max_notional))
+        return sorted({capacity, self.max_notional})
+
+    def simulate(self, index: int, prices):
+        """
+        Returns:
+        - Opportunity: The most profitable of the candidate sizes of the cycle, or None if none is profitable.
+        """
+        cycle = self.graph.cycles[index]
+        best = None
+        for size in self.sizes(cycle, prices):
+            key = (index, size == self.max_notional)
+            if key not in self.records:
+                self.records[key] = new_cycle_route(cycle)
+            route = simulate_cycle(cycle, prices, self.fee, self.records[key], size, self.instruments)
+            if (route is not None and route.simulated_usdt > route.qty_usdt and meets_minimums(route, self.instruments)
+                    and (best is None or route.simulated_usdt - route.qty_usdt > best.simulated_usdt - best.qty_usdt)):
+                best = route
+        return best
+
+    def update(self, prices, changed=None):
+        """
+        Returns:
+        - list: Opportunities for every cycle that is currently profitable.
+        """
+        start_time = time.time()
+        if self._invalidated:
+            changed = None
+            self._invalidated = False
+        negative, affected = self.graph.update(prices, changed)
+        affected = set(affected.tolist())
+        current = set(negative.tolist())
+        for index in list(self.profitable):
+            if index not in current:
+                del self.profitable[index]
+        self.rejected &= current
+        for index in current:
+            if index in affected or (index not in self.profitable and index not in self.rejected):
+                route = self.simulate(index, prices)
+                if route is None:
+                    self.profitable.pop(index, None)
+                    self.rejected.add(index)
+                else:
+                    self.profitable[index] = route
+                    self.rejected.discard(index)
+
+        opportunities = [make_opportunity(route) for route in self.profitable.values()]
+        logging.info("Recalculated %d cycles in %s seconds", len(affected), time.time() - start_time)
+        return opportunities
@@ -1,49 +1,42 @@
 import logging
-import subprocess
-import re
 
+from utils.journal import OpportunityJournal
+from utils.log_reader import read_last_records
+from utils.status import bot_state, read_status
 
-def check_status() -> bool:
-    """
-       Checks if a process with the name 'arbitrage_bot.py' is running.
 
-       Returns:
-       - bool: True if the process is running, False otherwise.
-       """
+def get_status() -> dict:
+    """
+    Reads the status published by arbitrage_bot.py without spawning any process.
 
-    try:
-        result = subprocess.run('ps -ax | grep arbitrage_bot.py', shell=True, stdout=subprocess.PIPE, text=True)
-        processes = result.stdout.split('\n')
-        regex = re.compile('[p|P]ython\d? arbitrage_bot\.py')
-        for process in processes:
-            if regex.search(process):
-                return True
-        return False
-    except Exception as e:
-        logging.error(f"An error occured. Here is it:\n{e}")
-        return False
+    Returns:
+    - dict: The published fields plus 'state': 'running', 'wedged' (the process is alive but its loop
+      stopped making progress) or 'stopped'.
+    """
+    status = read_status() or {}
+    status['state'] = bot_state(status or None)
+    return status
 
 
-def get_last_n_log(n: int, date_only: bool = False) -> str:
+def get_last_n_log(n: int, date_only: bool = False, level: str = None, since: float = None) -> str:
     """
-       Gets the last n lines from the arbitrage_bot.log file.
-       If date_only is True, returns only the date and time from each line.
+       Gets the last n records from the arbitrage_bot.log file and its rotated segments,
+       reading backwards from the end instead of the whole file.
+       If date_only is True, returns only the date and time from each record.
 
        Args:
-       - n (int): The number of lines to retrieve.
-       - date_only (bool): If True, returns only the date and time from each line.
+       - n (int): The number of records to retrieve.
+       - date_only (bool): If True, returns only the date and time from each record.
+       - level (str): If set, only records of this level or higher (e.g., 'ERROR').
+       - since (float): If set, only records written after this Unix time.
 
        Returns:
-       - str: The last n lines from the log file, or only the date and time from each line if date_only is True.
+       - str: The last n records from the log file, or only the date and time from each record if date_only is True.
        """
 
     try:
-        result = subprocess.run(f'tail -n {n} logs/arbitrage_bot.log', shell=True, stdout=subprocess.PIPE, text=True)
-        log_lines = result.stdout.strip().split('\n')
-        if date_only:
-            date_pattern = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}')
-            log_lines = [date_pattern.match(line).group(0) for line in log_lines if date_pattern.match(line)]
-        return '\n'.join(log_lines)
+        records = read_last_records(n, level=level, since=since)
+        return '\n'.join(asctime if date_only else text for asctime, _, text in records)
     except Exception as e:
         logging.error(f"An error occured. Here is it:\n{e} ")
         return ""
@@ -51,52 +44,44 @@ def get_last_n_log(n: int, date_only: bool = False) -> str:
 
 def get_oppotunities(last_lines: int = False):
     """
-    Reads the file arbitrage_opportunities.txt and returns its output
+    Reads the latest opportunities from the opportunity journal and returns them formatted
 
     Args:
-    - last_lines(int): if set, returns only last n lines from the file
+    - last_lines(int): if set, returns last n opportunities instead of only the latest one
 
     :return:
-    - str: an output from the arbitrage_opportunities.txt file
+    - str: formatted opportunities from the arbitrage_opportunities.db journal
     """
 
     try:
-        result = subprocess.run('cat arbitrage_opportunities.txt', shell=True, stdout=subprocess.PIPE, text=True)
-        opps = result.stdout.strip().split('\n')
-        if last_lines:
-            lines = [line for line in opps[-last_lines:]]
-            return '\n'.join(format_opportunity(line) for line in lines)
-        return format_opportunity(opps[-1])
+        journal = OpportunityJournal(readonly=True)
+        try:
+            opps = journal.last(last_lines or 1)
+        finally:
+            journal.close()
+        return '\n'.join(format_opportunity(opp) for opp in opps)
     except Exception as e:
         logging.error(f"An error occurred. Here it is:\n{e}")
         return ""
 
 
-def format_opportunity(opportunity_str: str) -> str:
+def format_opportunity(opportunity: dict) -> str:
     """
-    Formats the opportunity string to a more readable format.
+    Formats the opportunity to a more readable format.
 
     Args:
-    - opportunity_str (str): The opportunity string.
+    - opportunity (dict): The opportunity as stored in the journal.
 
     Returns:
     - str: The formatted opportunity string.
     """
-    try:
-        # Преобразование строки в словарь
-        opportunity_dict = eval(opportunity_str.split("! ")[-1])
-
-        # Форматирование строки
-        formatted_str = "*Arbitrage Opportunity Found:*\n"
-        for key, value in opportunity_dict.items():
-            formatted_str += f"*{key.capitalize()}*: `{value}`\n"
-        return formatted_str
-    except Exception as e:
-        logging.error(f"Error formatting opportunity: {e}")
-        return opportunity_str
+    formatted_str = "*Arbitrage Opportunity Found:*\n"
+    for key, value in opportunity.items():
+        formatted_str += f"*{key.capitalize()}*: `{value}`\n"
+    return formatted_str
 
 
 if __name__ == '__main__':
-    print(check_status())
+    print(get_status()['state'])
     print(get_last_n_log(3, date_only=True))
     print(get_oppotunities(last_lines=2))
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import time
+from decimal import ROUND_DOWN, ROUND_UP, Decimal
+
+INSTRUMENTS_FILE = "settings/instruments.json"
+INSTRUMENTS_TTL = 6 * 60 * 60
+
+# значения, с которыми калькулятор работал до появления метаданных инструментов
+DEFAULT_QTY_DEGREE = 100
+DEFAULT_PRICE_DECIMALS = 4
+
+
+def step_decimals(step: str) -> int:
+    """
+    Number of decimals of a step like '0.0001' (4) or '1' (0).
+    """
+    return max(0, -Decimal(step).normalize().as_tuple().exponent)
+
+
+class Instrument:
+    """
+    Trading rules of a single spot symbol as returned by get_instruments_info, plus its fee rates.
+    Steps are kept as Decimal for exact quantisation of orders, and as integer degrees (10 ** decimals)
+    for the fast floor rounding in the calculator.
+    """
+
+    __slots__ = ('symbol', 'qty_step', 'tick_size', 'min_qty', 'min_amount', 'taker_fee', 'maker_fee',
+                 'qty_degree', 'price_decimals')
+
+    def __init__(self, symbol, qty_step, tick_size, min_qty, min_amount, taker_fee=None, maker_fee=None):
+        self.symbol = symbol
+        self.qty_step = Decimal(qty_step)
+        self.tick_size = Decimal(tick_size)
+        self.min_qty = Decimal(min_qty)
+        self.min_amount = Decimal(min_amount)
+        self.taker_fee = float(taker_fee) if taker_fee is not None else None
+        self.maker_fee = float(maker_fee) if maker_fee is not None else None
+        self.qty_degree = 10 ** step_decimals(qty_step)
+        self.price_decimals = step_decimals(tick_size)
+
+    def quantize_qty(self, qty) -> Decimal:
+        # количество всегда округляется вниз, иначе монет на балансе может не хватить
+        return (Decimal(str(qty)) / self.qty_step).to_integral_value(ROUND_DOWN) * self.qty_step
+
+    def quantize_price(self, price, side: str) -> Decimal:
+        # цена покупки округляется вниз, продажи - вверх: ордер никогда не исполняется хуже рассчитанной цены
+        rounding = ROUND_DOWN if side == 'Buy' else ROUND_UP
+        return (Decimal(str(price)) / self.tick_size).to_integral_value(rounding) * self.tick_size
+
+    def check_order(self, qty, price) -> str:
+        """
+        Returns:
+        - str: Why the exchange would reject the order, or an empty string if it passes the filters.
+        """
+        qty = Decimal(str(qty))
+        if qty < self.min_qty:
+            return f"quantity {qty} is below the minimum {self.min_qty} for {self.symbol}"
+        amount = qty * Decimal(str(price))
+        if amount < self.min_amount:
+            return f"order amount {amount} is below the minimum {self.min_amount} for {self.symbol}"
+        return ""
+
+    def to_json(self) -> dict:
+        return {
+            'qty_step': str(self.qty_step),
+            'tick_size': str(self.tick_size),
+            'min_qty': str(self.min_qty),
+            'min_amount': str(self.min_amount),
+            'taker_fee': self.taker_fee,
+            'maker_fee': self.maker_fee,
+        }
+
+
+class InstrumentCache:
+    """
+    Spot instrument rules and fee rates loaded once via the Bybit API, refreshed after a TTL
+    and persisted on disk so a restart does not have to wait for the API.
+
+    Args:
+    - session: pybit HTTP session, or None to only read the file (e.g. in detection worker processes).
+    - path (str): File the cache is persisted to.
+    - ttl (float): Seconds after which the cache is considered stale.
+    """
+
+    def __init__(self, session, path: str = INSTRUMENTS_FILE, ttl: float = INSTRUMENTS_TTL):
+        self.session = session
+        self.path = path
+        self.ttl = ttl
+        self.instruments = {}
+        self.updated_at = 0.0
+
+    def __contains__(self, symbol):
+        return symbol in self.instruments
+
+    def __getitem__(self, symbol) -> Instrument:
+        return self.instruments[symbol]
+
+    def is_stale(self) -> bool:
+        return time.time() - self.updated_at > self.ttl
+
+    def load(self):
+        """
+        Loads the cache from disk if it is fresh enough, otherwise from the API.
+        """
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            self.instruments = {symbol: Instrument(symbol, **fields) for symbol, fields in data['instruments'].items()}
+            self.updated_at = data['updated_at']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Failed to read instruments cache: {e}")
+
+        if self.is_stale():
+            self.refresh()
+
+    def refresh(self):
+        """
+        Reloads instrument rules and fee rates from the API and persists them.
+        If the API fails, the previous (possibly stale) data is kept.
+        """
+        if self.session is None:
+            return
+        try:
+            rules = self.session.get_instruments_info(category="spot")['result']['list']
+            fees = {item['symbol']: item for item in self.session.get_fee_rates(category="spot")['result']['list']}
+        except Exception as e:
+            logging.error(f"Failed to load instruments info: {e}")
+            return
+
+        instruments = {}
+        for item in rules:
+            symbol = item['symbol']
+            fee = fees.get(symbol, {})
+            instruments[symbol] = Instrument(
+                symbol,
+                qty_step=item['lotSizeFilter']['basePrecision'],
+                tick_size=item['priceFilter']['tickSize'],
+                min_qty=item['lotSizeFilter']['minOrderQty'],
+                min_amount=item['lotSizeFilter']['minOrderAmt'],
+                taker_fee=fee.get('takerFeeRate'),
+                maker_fee=fee.get('makerFeeRate'),
+            )
+        self.instruments = instruments
+        self.updated_at = time.time()
+        self.save()
+
+    def save(self):
+        data = {
+            'updated_at': self.updated_at,
+            'instruments': {symbol: instrument.to_json() for symbol, instrument in self.instruments.items()}
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.error(f"Failed to save instruments cache: {e}")
+
+
+def steps(instruments, symbol):
+    """
+    Returns:
+    - tuple: (qty_degree, price_decimals) of the symbol, or the old fixed values if there is no metadata.
+    """
+    if instruments is not None and symbol in instruments:
+        instrument = instruments[symbol]
+        return instrument.qty_degree, instrument.price_decimals
+    return DEFAULT_QTY_DEGREE, DEFAULT_PRICE_DECIMALS
+
+
+def taker_fee(instruments, symbol, default: float) -> float:
+    if instruments is not None and symbol in instruments and instruments[symbol].taker_fee is not None:
+        return instruments[symbol].taker_fee
+    return default
+
+
+def meets_minimums(route, instruments) -> bool:
+    """
+    Checks every order of a simulated route against the minimum quantity and amount of its symbol.
+    """
+    if instruments is None:
+        return True
+    for leg in route.legs:
+        if leg.symbol not in instruments:
+            continue
+        instrument = instruments[leg.symbol]
+        for price, qty in leg.orders:
+            if instrument.check_order(qty, price):
+                return False
+    return True
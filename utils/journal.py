@@ -0,0 +1,157 @@
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+JOURNAL_FILE = "arbitrage_opportunities.db"
+# сколько последних возможностей хранить; более старые удаляются при компактизации
+MAX_ROWS = 100000
+# размер данных журнала: строки с длинными маршрутами занимают больше места, одного числа строк недостаточно
+MAX_BYTES = 100 * 1024 * 1024
+# после компактизации по размеру остается эта доля лимита, чтобы следующая пачка не запускала ее снова
+COMPACT_TARGET = 0.9
+COMPACT_EVERY = 1000
+
+
+class OpportunityJournal:
+    """
+    Append-only journal of found opportunities in SQLite (WAL mode, so the Telegram bot can read
+    while the trading bot writes). Rows are indexed by time and by pair; the full opportunity is kept as JSON.
+    Inserts and compaction run in a single journal thread, so the event loop never waits for the disk.
+
+    Args:
+    - path (str): Database file.
+    - max_rows (int): Number of most recent rows kept by compaction.
+    - max_bytes (int): Size of the pages in use above which compaction deletes the oldest rows too. Deleted
+      pages are reused by new rows, so the file stops growing at about this size.
+    - readonly (bool): Open an existing journal for reading only.
+    """
+
+    def __init__(self, path: str = JOURNAL_FILE, max_rows: int = MAX_ROWS, max_bytes: int = MAX_BYTES,
+                 readonly: bool = False):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self._appended = 0
+        self._writer = None
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            return
+        # соединение используется только потоком журнала (и до его запуска - здесь), транзакции не пересекаются
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # в WAL-режиме NORMAL не делает fsync на каждый commit
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS opportunities (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                pair1 TEXT NOT NULL,
+                pair2 TEXT NOT NULL,
+                direction TEXT NOT NULL,
+                profit REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS opportunities_ts ON opportunities (ts);
+            CREATE INDEX IF NOT EXISTS opportunities_pair1 ON opportunities (pair1, ts);
+            CREATE INDEX IF NOT EXISTS opportunities_pair2 ON opportunities (pair2, ts);
+        """)
+
+    def append(self, opportunities):
+        """
+        Queues opportunities (Opportunity records) to be written in one transaction by the journal thread,
+        followed by a compaction every COMPACT_EVERY rows. Rows are built right away, as the evaluator
+        overwrites the records on the next tick.
+        """
+        rows = [
+            (opp.date, opp.pair1, opp.pair2, opp.direction, opp.profit, json.dumps(opp.as_dict()))
+            for opp in opportunities
+        ]
+        self._appended += len(rows)
+        compact = self._appended >= COMPACT_EVERY
+        if compact:
+            self._appended = 0
+        self._writer.submit(self._write, rows, compact)
+
+    def _write(self, rows, compact: bool):
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO opportunities (ts, pair1, pair2, direction, profit, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to write {len(rows)} opportunities to the journal: {e}")
+        if compact:
+            self.compact()
+
+    def flush(self):
+        """
+        Waits until the journal thread has written everything queued so far.
+        """
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result()
+
+    def used_bytes(self) -> int:
+        """
+        Returns:
+        - int: Size of the database pages holding data, without the free pages left by deletes.
+        """
+        page_size, = self.conn.execute("PRAGMA page_size").fetchone()
+        pages, = self.conn.execute("PRAGMA page_count").fetchone()
+        free, = self.conn.execute("PRAGMA freelist_count").fetchone()
+        return (pages - free) * page_size
+
+    def compact(self):
+        """
+        Deletes everything but the max_rows most recent rows, and then the oldest rows until the data
+        fits into max_bytes.
+        """
+        try:
+            with self.conn:
+                self.conn.execute("DELETE FROM opportunities WHERE id <= (SELECT MAX(id) FROM opportunities) - ?",
+                                  (self.max_rows,))
+            used = self.used_bytes()
+            if used > self.max_bytes:
+                count, = self.conn.execute("SELECT COUNT(*) FROM opportunities").fetchone()
+                # место на строку считается средним по журналу, вместе с индексами
+                keep = int(count * self.max_bytes * COMPACT_TARGET / used)
+                with self.conn:
+                    self.conn.execute("DELETE FROM opportunities WHERE id <= (SELECT MAX(id) FROM opportunities) - ?",
+                                      (keep,))
+                logging.info(f"Opportunity journal exceeded {self.max_bytes} bytes, kept {keep} of {count} rows")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            logging.error(f"Failed to compact the opportunity journal: {e}")
+
+    def last(self, n: int = 1) -> list:
+        """
+        Returns:
+        - list: The n most recent opportunities as dicts, oldest first.
+        """
+        rows = self.conn.execute("SELECT data FROM opportunities ORDER BY id DESC LIMIT ?", (n,)).fetchall()
+        return [json.loads(data) for data, in reversed(rows)]
+
+    def range(self, start: float = None, end: float = None, pair: str = None) -> list:
+        """
+        Opportunities found between two Unix timestamps, optionally only those involving a pair.
+
+        Args:
+        - start (float): Inclusive lower bound; no bound if None.
+        - end (float): Exclusive upper bound; no bound if None.
+        - pair (str): Symbol that has to be pair1 or pair2 (e.g., 'XRPUSDT').
+
+        Returns:
+        - list: Opportunities as dicts in time order.
+        """
+        query = "SELECT data FROM opportunities WHERE ts >= ? AND ts < ?"
+        params = [start if start is not None else float('-inf'), end if end is not None else float('inf')]
+        if pair is not None:
+            query += " AND (pair1 = ? OR pair2 = ?)"
+            params += [pair, pair]
+        rows = self.conn.execute(query + " ORDER BY ts", params).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+        self.conn.close()
@@ -0,0 +1,105 @@
+import logging
+import os
+import re
+from datetime import datetime
+
+from utils.logs import LOG_FILE
+
+BLOCK_SIZE = 64 * 1024
+# начало записи в формате LOG_FORMAT: '2024-06-01 12:00:00,123 - INFO - ...'
+RECORD_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - ([A-Z]+) - ')
+
+
+def log_segments(path: str = LOG_FILE) -> list:
+    """
+    The current log file and its rotated segments (path.1, path.2, ...), newest first.
+    """
+    segments = [path] if os.path.exists(path) else []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        segments.append(f"{path}.{index}")
+        index += 1
+    return segments
+
+
+def reverse_lines(path: str, block_size: int = BLOCK_SIZE):
+    """
+    Yields the lines of a file from the last one to the first, reading fixed-size blocks backwards from the end,
+    so the cost depends on how much is read and not on the file size.
+    """
+    with open(path, 'rb') as file:
+        position = file.seek(0, os.SEEK_END)
+        tail = b''
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            file.seek(position)
+            lines = (file.read(size) + tail).split(b'\n')
+            # первая строка блока может быть неполной, ее начало лежит в предыдущем блоке
+            tail = lines[0]
+            for line in reversed(lines[1:]):
+                yield line.decode(errors='replace')
+        yield tail.decode(errors='replace')
+
+
+def reverse_records(path: str = LOG_FILE):
+    """
+    Yields (asctime, level, text) of every log record, newest first, across rotated segments.
+    Lines without a timestamp (tracebacks) are kept together with the record they belong to.
+    """
+    continuation = []
+    for segment in log_segments(path):
+        for line in reverse_lines(segment):
+            if not line:
+                continue
+            match = RECORD_PATTERN.match(line)
+            if match is None:
+                continuation.append(line)
+                continue
+            text = '\n'.join([line] + continuation[::-1])
+            continuation = []
+            yield match.group(1), match.group(2), text
+
+
+def parse_asctime(asctime: str) -> float:
+    return datetime.strptime(asctime, '%Y-%m-%d %H:%M:%S,%f').timestamp()
+
+
+def read_last_records(n: int, path: str = LOG_FILE, level: str = None, since: float = None, until: float = None):
+    """
+    Reads the last n records matching the filters without loading the whole log.
+
+    Args:
+    - n (int): Maximum number of records.
+    - path (str): Log file; its rotated segments are read too.
+    - level (str): Minimum level name in any case (e.g., 'ERROR' or 'error').
+    - since (float): Unix time of the oldest record to include; reading stops as soon as it is passed.
+    - until (float): Unix time after which records are skipped.
+
+    Returns:
+    - list: (asctime, level, text) of the matching records in chronological order.
+
+    Raises:
+    - ValueError: If level is not a logging level name.
+    """
+    min_level = None
+    if level:
+        # для неизвестного имени getLevelName возвращает строку 'Level X', сравнение с числом упало бы позже
+        min_level = logging.getLevelName(level.upper())
+        if not isinstance(min_level, int):
+            raise ValueError(f"Unknown log level: {level}")
+    records = []
+    for record in reverse_records(path):
+        if len(records) == n:
+            break
+        asctime, record_level, _ = record
+        if since is not None or until is not None:
+            ts = parse_asctime(asctime)
+            if since is not None and ts < since:
+                break
+            if until is not None and ts > until:
+                continue
+        if min_level is not None and logging.getLevelName(record_level) < min_level:
+            continue
+        records.append(record)
+    return records[::-1]
@@ -0,0 +1,69 @@
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FILE = "logs/arbitrage_bot.log"
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+CONSOLE_FORMAT = '%(asctime)s - %(message)s'
+# лог ротируется по размеру: arbitrage_bot.log.1, .2, ... (их читает utils.log_reader)
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most one record per message template every interval seconds.
+    Records are dropped before their arguments are formatted, so a skipped market snapshot costs
+    only the creation of a LogRecord.
+
+    Args:
+    - interval (float): Minimum number of seconds between two records with the same template.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+        self.last = {}
+
+    def filter(self, record) -> bool:
+        now = time.monotonic()
+        if now - self.last.get(record.msg, float('-inf')) < self.interval:
+            return False
+        self.last[record.msg] = now
+        return True
+
+
+def setup_logging(path: str = LOG_FILE, queued: bool = True, max_bytes: int = LOG_MAX_BYTES,
+                  backup_count: int = LOG_BACKUP_COUNT):
+    """
+    Configures the root logger: INFO and above to the log file, rotated by size, ERROR and above to the console.
+
+    With queued set, the root logger only puts records into a queue and a QueueListener thread does all
+    file and console writes, so the event loop never waits for disk. The message itself (arguments and
+    traceback) is still merged in the calling thread by QueueHandler.prepare, because the arguments may be
+    objects reused on the next tick; the listener only adds the time and level to the final line.
+
+    Returns:
+    - QueueListener: The started listener (stop it on exit to flush the queue), or None if not queued.
+    """
+    file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setLevel(logging.INFO)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.ERROR)
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    if not queued:
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
+        return None
+
+    records = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(records))
+    listener = QueueListener(records, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    return listener
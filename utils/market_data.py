@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from utils.records import ArrayBook
+
+BYBIT_REST_URL = "https://api.bybit.com"
+FETCH_CONCURRENCY = 20
+FETCH_TIMEOUT = 2
+# стакан старше этого к моменту расчета не используется; заметно меньше FETCH_TIMEOUT, иначе ничего не отсеивается
+MAX_BOOK_AGE = 1
+ORDERBOOK_PATH = "/v5/market/orderbook"
+
+
+async def fetch_ticker_info(http, pair, semaphore, limit=3, book=None, url=BYBIT_REST_URL, timeout=FETCH_TIMEOUT,
+                            limiter=None):
+    """
+    Fetches the order book for a single pair without blocking the event loop.
+
+    Args:
+    - http (aiohttp.ClientSession): Pooled HTTP client shared by all requests.
+    - pair (str): The trading pair symbol (e.g., 'XRPUSDT').
+    - semaphore (asyncio.Semaphore): Caps the number of requests in flight.
+    - limit (int): Depth of the order book.
+    - book (ArrayBook): Book to update in place; a new one is created if not given.
+    - url (str): REST endpoint. Can point at a local stand-in server.
+    - timeout (float): Seconds to wait for the response.
+    - limiter (RateLimiter): Shared REST budget; market data yields to orders when it runs low.
+
+    Returns:
+    - ArrayBook: The book with ts set to the local time the request was sent, or None on error. The exchange
+      builds the snapshot after that moment, so ts bounds its age from above without trusting the exchange clock.
+    """
+    try:
+        if limiter is not None:
+            await limiter.wait(ORDERBOOK_PATH)
+        async with semaphore:
+            # время отправки, а не ответа: медленный ответ несет снапшот, который старше времени его прихода
+            sent_at = time.time()
+            async with http.get(
+                f"{url}{ORDERBOOK_PATH}",
+                params={'category': 'spot', 'symbol': pair, 'limit': limit},
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if limiter is not None:
+                    limiter.update(ORDERBOOK_PATH, response.headers, response.status)
+                data = await response.json()
+        if data.get('result'):
+            if book is None:
+                book = ArrayBook(pair, limit)
+            book.update(data['result']['b'], data['result']['a'], sent_at)
+            return book
+        else:
+            logging.error(f"Error: No data in response for pair {pair}: {data.get('retMsg')}")
+            return None
+    except asyncio.TimeoutError:
+        logging.error(f"Timeout fetching price data for pair {pair}")
+        return None
+    except Exception as e:
+        logging.error(f"Error fetching price data for pair {pair}: {str(e)}")
+        return None
+
+
+async def fetch_all_tickers_info(pairs, http, books, concurrency=FETCH_CONCURRENCY, limit=3, url=BYBIT_REST_URL,
+                                 timeout=FETCH_TIMEOUT, limiter=None):
+    """
+    Fetches all books concurrently, updating the ArrayBook of every pair in place.
+
+    Args:
+    - books (dict): ArrayBook by symbol kept between cycles; missing ones are created.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    for pair in pairs:
+        if pair not in books:
+            books[pair] = ArrayBook(pair, limit)
+    tasks = [fetch_ticker_info(http, pair, semaphore, limit, books[pair], url, timeout, limiter) for pair in pairs]
+    results = await asyncio.gather(*tasks)
+    return {result['symbol']: result for result in results if result is not None}
+
+
+def drop_stale_books(prices, max_age=MAX_BOOK_AGE):
+    """
+    Removes books requested more than max_age seconds ago so they never take part in calculation: books whose
+    response was slow, or which waited for the slowest request of the cycle.
+    """
+    now = time.time()
+    return {symbol: book for symbol, book in prices.items() if now - book['ts'] <= max_age}
@@ -0,0 +1,156 @@
+import asyncio
+import math
+import os
+
+from aiohttp import web
+
+METRICS_FILE = "logs/arbitrage_bot.prom"
+METRICS_INTERVAL = 10
+# этапы пути от стакана до сделки, в порядке прохождения
+STAGES = ('book', 'calc', 'decision', 'place_ack', 'fill', 'final_leg')
+COUNTERS = ('cycles', 'opportunities', 'rejections', 'retries', 'throttled', 'rate_limited')
+QUANTILES = (0.5, 0.99)
+
+
+class Histogram:
+    """
+    Latency histogram with logarithmic buckets in the spirit of HdrHistogram: every bucket is growth times wider
+    than the previous one, so a percentile is reported with at most (growth - 1) relative error, and recording
+    is one log and one list increment whatever the number of samples.
+
+    Args:
+    - lowest (float): Smallest distinguishable value in seconds; anything below falls into the first bucket.
+    - highest (float): Largest tracked value in seconds; anything above falls into the last bucket.
+    - growth (float): Ratio between the bounds of two consecutive buckets.
+    """
+
+    def __init__(self, lowest: float = 1e-6, highest: float = 1e3, growth: float = 1.02):
+        self.lowest = lowest
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.counts = [0] * (int(math.log(highest / lowest) / self._log_growth) + 2)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        if value <= self.lowest:
+            index = 0
+        else:
+            # корзина i покрывает (lowest * growth ** (i - 1), lowest * growth ** i]
+            index = min(math.ceil(math.log(value / self.lowest) / self._log_growth), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, quantile: float) -> float:
+        """
+        Args:
+        - quantile (float): From 0 to 1, e.g. 0.99.
+
+        Returns:
+        - float: Upper bound of the bucket holding the quantile, capped by the largest recorded value.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * quantile))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.lowest * self.growth ** index, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+        }
+
+
+class Metrics:
+    """
+    Stage latency histograms and event counters of the bot, exported in the Prometheus text format
+    through an HTTP endpoint or a file snapshot (e.g. for the node_exporter textfile collector).
+
+    Stages: book (book receive: REST fetch cycle, or age of the stream update at calculation), calc, decision
+    (calculation done to the first order request), place_ack, fill (order ack to the leg filled) and final_leg
+    (book receive to the last leg filled, i.e. tick-to-trade).
+
+    Args:
+    - prefix (str): Prefix of every metric name.
+    """
+
+    def __init__(self, prefix: str = 'arbitrage'):
+        self.prefix = prefix
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram()
+        histogram.record(seconds)
+
+    def increment(self, counter: str, value: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def snapshot(self) -> dict:
+        return {
+            'stages': {stage: histogram.summary() for stage, histogram in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+    def prometheus(self) -> str:
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Latency of the stages from book receive to the final leg.",
+                 f"# TYPE {name} summary"]
+        for stage, histogram in self.stages.items():
+            for quantile in QUANTILES:
+                lines.append(f'{name}{{stage="{stage}",quantile="{quantile}"}} {histogram.percentile(quantile):.9g}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.9g}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        lines += [f"# HELP {name}_max Largest latency of the stage since start.", f"# TYPE {name}_max gauge"]
+        lines += [f'{name}_max{{stage="{stage}"}} {histogram.max:.9g}' for stage, histogram in self.stages.items()]
+        for counter, value in self.counters.items():
+            lines += [f"# TYPE {self.prefix}_{counter}_total counter", f"{self.prefix}_{counter}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str = METRICS_FILE):
+        # запись через временный файл, чтобы читатель никогда не увидел половину снимка
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as file:
+            file.write(self.prometheus())
+        os.replace(tmp, path)
+
+    async def run(self, path: str = METRICS_FILE, interval: float = METRICS_INTERVAL):
+        """
+        Writes a snapshot to the file every interval seconds, and a last one when cancelled.
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await loop.run_in_executor(None, self.write, path)
+        finally:
+            self.write(path)
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 9108) -> web.AppRunner:
+        """
+        Serves GET /metrics. Returns the runner; call its cleanup() on exit.
+        """
+        async def handle(request):
+            return web.Response(body=self.prometheus().encode(),
+                                headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
@@ -0,0 +1,633 @@
+"""
+Local imitation of the Bybit v5 spot API for end-to-end and load tests of the bot.
+
+    python -m utils.mock_exchange --port 8080 --latency 0.05 --jitter 0.02 --rate-limit 20 --disconnect-rate 0.01
+
+then start the bot with
+
+    BYBIT_REST_URL=http://127.0.0.1:8080
+    BYBIT_PUBLIC_WS_URL=ws://127.0.0.1:8080/v5/public/spot
+    BYBIT_PRIVATE_WS_URL=ws://127.0.0.1:8080/v5/private
+
+Books are the seeded random walks of utils.synthetic; any *USDT/*USDC symbol the bot asks for starts being
+quoted on first use. Limit orders are matched against the books (taken liquidity is removed until the next tick
+of the book) and fills are pushed to the private stream like the exchange does.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import time
+import uuid
+
+from aiohttp import WSMsgType, web
+
+from utils.order_tracker import TERMINAL_STATUSES
+from utils.synthetic import SyntheticMarket
+
+TAKER_FEE = 0.001
+MAKER_FEE = 0.001
+QTY_STEP = "0.0001"
+TICK_SIZE = "0.0000001"
+MIN_ORDER_AMOUNT = 1
+# цены и объемы отдаются строками, как их отдает биржа; один формат нужен, чтобы дельты совпадали со снапшотом
+NUMBER_FORMAT = "{:.8g}"
+
+# коды ошибок Bybit, которые воспроизводит имитация
+RATE_LIMIT_CODE = 10006
+INSUFFICIENT_BALANCE_CODE = 170131
+ORDER_NOT_FOUND_CODE = 110001
+QTY_DECIMALS_CODE = 170137
+MIN_AMOUNT_CODE = 170140
+DUPLICATE_ORDER_LINK_ID_CODE = 110072
+
+
+def number(value: float) -> str:
+    return NUMBER_FORMAT.format(value)
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class ExchangeError(Exception):
+    """
+    Business error answered with HTTP 200 and a non-zero retCode, like the real API does.
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class TokenBucket:
+    """
+    Request limit of one endpoint: capacity requests, refilled at rate requests per second.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def headers(self) -> dict:
+        # Reset-Timestamp - когда ведро снова будет полным
+        reset = time.time() + (self.capacity - self.tokens) / self.rate
+        return {
+            'X-Bapi-Limit': str(self.capacity),
+            'X-Bapi-Limit-Status': str(int(self.tokens)),
+            'X-Bapi-Limit-Reset-Timestamp': str(int(reset * 1000)),
+        }
+
+
+class MockExchange:
+    """
+    aiohttp application that answers the REST endpoints and WebSocket streams used by the bot.
+
+    Args:
+    - pairs (list): (USDT pair, USDC pair) tuples quoted from the start.
+    - depth (int): Levels per side of every book.
+    - seed (int): Seed of the books and of the random latency, errors and disconnects.
+    - balances (dict): Starting wallet, {coin: amount}; 10000 USDT and 10000 USDC if None.
+    - latency (float): Seconds added to every REST response.
+    - jitter (float): Up to this many random seconds added on top of latency.
+    - rate_limit (float): Requests per second allowed per endpoint; unlimited if None.
+    - disconnect_rate (float): Probability that a REST request or a stream tick drops the connection
+      without a response.
+    - tick_interval (float): Seconds between two book updates.
+    """
+
+    def __init__(self, pairs=(), depth: int = 50, seed: int = 0, balances: dict = None, latency: float = 0.0,
+                 jitter: float = 0.0, rate_limit: float = None, disconnect_rate: float = 0.0,
+                 tick_interval: float = 0.1):
+        self.market = SyntheticMarket(pairs, depth, seed)
+        self.rng = random.Random(seed + 1)
+        self.wallet = dict(balances) if balances is not None else {'USDT': 10000.0, 'USDC': 10000.0}
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.disconnect_rate = disconnect_rate
+        self.tick_interval = tick_interval
+        self.buckets = {}
+        self.orders = {}
+        self.order_links = {}
+        self.ids = itertools.count(1)
+        # последнее разосланное состояние стаканов: {symbol: {'u', 'b', 'a'}} с уровнями в виде строк
+        self.published = {}
+        # подписчики публичного потока {symbol: {ws: topic}} и приватного {ws: set(topics)}
+        self.book_subscribers = {}
+        self.private_subscribers = {}
+        self.stats = {'requests': 0, 'rate_limited': 0, 'disconnects': 0, 'orders': 0, 'fills': 0}
+        self.app = self.make_app()
+        self._runner = None
+        self._ticker = None
+
+    # ---- приложение и транспорт ----
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.transport_middleware])
+        routes = [
+            web.get('/v5/market/time', self.rest(self.get_server_time)),
+            web.get('/v5/market/orderbook', self.rest(self.get_orderbook)),
+            web.get('/v5/market/tickers', self.rest(self.get_tickers)),
+            web.get('/v5/market/instruments-info', self.rest(self.get_instruments_info)),
+            web.get('/v5/account/fee-rate', self.rest(self.get_fee_rate)),
+            web.get('/v5/account/wallet-balance', self.rest(self.get_wallet_balance)),
+            web.post('/v5/order/create', self.rest(self.place_order)),
+            web.post('/v5/order/create-batch', self.rest(self.place_batch_order)),
+            web.post('/v5/order/cancel', self.rest(self.cancel_order)),
+            web.get('/v5/order/realtime', self.rest(self.get_open_orders)),
+            web.get('/v5/order/history', self.rest(self.get_order_history)),
+            web.get('/v5/public/spot', self.public_stream),
+            web.get('/v5/private', self.private_stream),
+        ]
+        app.add_routes(routes)
+        return app
+
+    @web.middleware
+    async def transport_middleware(self, request, handler):
+        if request.path.startswith('/v5/public') or request.path == '/v5/private':
+            return await handler(request)
+        self.stats['requests'] += 1
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.rng.random() < self.disconnect_rate:
+            # соединение закрывается без ответа: клиент получает RemoteDisconnected, как в backlog.
+            # В половине случаев запрос успевает выполниться, и клиент не знает, принят ли ордер
+            self.stats['disconnects'] += 1
+            if self.rng.random() < 0.5:
+                await handler(request)
+            request.transport.close()
+            raise asyncio.CancelledError()
+        return await handler(request)
+
+    def rest(self, method):
+        """
+        Wraps a handler that takes the request parameters and returns the result into a Bybit JSON envelope
+        with rate limit headers.
+        """
+        async def handler(request):
+            bucket = None
+            if self.rate_limit:
+                bucket = self.buckets.setdefault(request.path, TokenBucket(self.rate_limit))
+                if not bucket.take():
+                    self.stats['rate_limited'] += 1
+                    return web.json_response(
+                        {'retCode': RATE_LIMIT_CODE, 'retMsg': "Too many visits!", 'result': {},
+                         'retExtInfo': {}, 'time': now_ms()}, headers=bucket.headers())
+
+            params = dict(request.query)
+            if request.method == 'POST':
+                params.update(await request.json())
+            ext_info = {}
+            try:
+                result = method(params)
+                if isinstance(result, tuple):
+                    result, ext_info = result
+                body = {'retCode': 0, 'retMsg': 'OK', 'result': result}
+            except ExchangeError as e:
+                body = {'retCode': e.code, 'retMsg': e.message, 'result': {}}
+            body.update({'retExtInfo': ext_info, 'time': now_ms()})
+            return web.json_response(body, headers=bucket.headers() if bucket else None)
+        return handler
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """
+        Starts the server and the book updates.
+
+        Returns:
+        - str: Base URL of the REST API, e.g. 'http://127.0.0.1:8080'.
+        """
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._ticker = asyncio.ensure_future(self.run_ticks())
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # ---- рыночные данные ----
+
+    def book(self, symbol: str):
+        if not symbol or not (symbol.endswith('USDT') or symbol.endswith('USDC')):
+            raise ExchangeError(10001, f"Not supported symbols: {symbol}")
+        return self.market.add(symbol)
+
+    def get_server_time(self, params):
+        now = time.time()
+        return {'timeSecond': str(int(now)), 'timeNano': str(int(now * 1e9))}
+
+    def get_orderbook(self, params):
+        book = self.book(params.get('symbol'))
+        limit = int(params.get('limit', 1))
+        return {
+            's': book.symbol,
+            'b': [[number(price), number(size)] for price, size in list(book.bids)[:limit]],
+            'a': [[number(price), number(size)] for price, size in list(book.asks)[:limit]],
+            'ts': int(book.ts * 1000),
+            'u': self.published.get(book.symbol, {}).get('u', 1),
+        }
+
+    def get_tickers(self, params):
+        books = [self.book(params['symbol'])] if params.get('symbol') else list(self.market.books.values())
+        return {'category': 'spot', 'list': [{
+            'symbol': book.symbol,
+            'bid1Price': number(book.bids[0][0]), 'bid1Size': number(book.bids[0][1]),
+            'ask1Price': number(book.asks[0][0]), 'ask1Size': number(book.asks[0][1]),
+            'lastPrice': number((book.bids[0][0] + book.asks[0][0]) / 2),
+            'turnover24h': number(1000 * sum(size * price for price, size in book.bids)),
+        } for book in books]}
+
+    def get_instruments_info(self, params):
+        symbols = [params['symbol']] if params.get('symbol') else self.market.symbols
+        return {'category': 'spot', 'list': [{
+            'symbol': symbol,
+            'baseCoin': symbol[:-4],
+            'quoteCoin': symbol[-4:],
+            'status': 'Trading',
+            'lotSizeFilter': {'basePrecision': QTY_STEP, 'quotePrecision': TICK_SIZE, 'minOrderQty': QTY_STEP,
+                              'maxOrderQty': '1000000', 'minOrderAmt': str(MIN_ORDER_AMOUNT),
+                              'maxOrderAmt': '1000000'},
+            'priceFilter': {'tickSize': TICK_SIZE},
+        } for symbol in symbols]}
+
+    def get_fee_rate(self, params):
+        symbols = [params['symbol']] if params.get('symbol') else self.market.symbols
+        return {'list': [{'symbol': symbol, 'takerFeeRate': str(TAKER_FEE), 'makerFeeRate': str(MAKER_FEE)}
+                         for symbol in symbols]}
+
+    def wallet_coins(self, coins=None) -> list:
+        coins = coins if coins is not None else sorted(self.wallet)
+        return [{'coin': coin, 'equity': number(self.wallet.get(coin, 0.0)),
+                 'walletBalance': number(self.wallet.get(coin, 0.0))} for coin in coins]
+
+    def get_wallet_balance(self, params):
+        coins = params['coin'].split(',') if params.get('coin') else None
+        return {'list': [{'accountType': params.get('accountType', 'UNIFIED'), 'coin': self.wallet_coins(coins)}]}
+
+    # ---- ордера ----
+
+    def create_order(self, item: dict) -> dict:
+        if item.get('orderLinkId') in self.order_links:
+            raise ExchangeError(DUPLICATE_ORDER_LINK_ID_CODE, "OrderLinkedID is duplicate")
+        symbol = item.get('symbol')
+        book = self.book(symbol)
+        side = item.get('side')
+        price = float(item.get('price') or 0)
+        qty = item.get('qty', '0')
+        if '.' in qty and len(qty.split('.')[1].rstrip('0')) > len(QTY_STEP.split('.')[1]):
+            raise ExchangeError(QTY_DECIMALS_CODE, "Order quantity has too many decimals.")
+        qty = float(qty)
+        if price == 0:
+            # рыночный ордер исполняется по всему стакану
+            price = math.inf if side == 'Buy' else 0.0
+        else:
+            if qty * price < MIN_ORDER_AMOUNT:
+                raise ExchangeError(MIN_AMOUNT_CODE, "Order value exceeded lower limit.")
+        base, quote = symbol[:-4], symbol[-4:]
+        needed = qty * (price if price != math.inf else book.asks[0][0]) if side == 'Buy' else qty
+        if self.wallet.get(quote if side == 'Buy' else base, 0.0) + 1e-9 < needed:
+            raise ExchangeError(INSUFFICIENT_BALANCE_CODE, "Insufficient balance.")
+
+        order_id = str(uuid.UUID(int=next(self.ids)))
+        created = str(now_ms())
+        order = {
+            'orderId': order_id,
+            'orderLinkId': item.get('orderLinkId', ''),
+            'symbol': symbol,
+            'side': side,
+            'orderType': item.get('orderType', item.get('order_type', 'Limit')),
+            'timeInForce': item.get('timeInForce', item.get('time_in_force', 'GTC')),
+            'price': number(price) if math.isfinite(price) and price else '0',
+            'qty': number(qty),
+            'leavesQty': number(qty),
+            'cumExecQty': '0',
+            'cumExecValue': '0',
+            'cumExecFee': '0',
+            'avgPrice': '0',
+            'orderStatus': 'New',
+            'createdTime': created,
+            'updatedTime': created,
+            '_limit': price,
+        }
+        self.orders[order_id] = order
+        if order['orderLinkId']:
+            self.order_links[order['orderLinkId']] = order_id
+        self.stats['orders'] += 1
+        self.match(order, TAKER_FEE)
+        if order['orderStatus'] == 'New':
+            if order['orderType'] == 'Market' or order['timeInForce'] in ('IOC', 'FOK'):
+                self.finish(order, 'Cancelled')
+            else:
+                self.emit('order', [self.public_order(order)])
+        elif order['orderStatus'] == 'PartiallyFilled' and (
+                order['orderType'] == 'Market' or order['timeInForce'] in ('IOC', 'FOK')):
+            self.finish(order, 'PartiallyFilledCanceled')
+        return order
+
+    def place_order(self, params):
+        order = self.create_order(params)
+        return {'orderId': order['orderId'], 'orderLinkId': order['orderLinkId']}
+
+    def place_batch_order(self, params):
+        results, codes = [], []
+        for item in params.get('request', []):
+            try:
+                order = self.create_order(item)
+                results.append({'category': 'spot', 'symbol': order['symbol'], 'orderId': order['orderId'],
+                                'orderLinkId': order['orderLinkId'], 'createAt': order['createdTime']})
+                codes.append({'code': 0, 'msg': 'OK'})
+            except ExchangeError as e:
+                results.append({'category': 'spot', 'symbol': item.get('symbol', ''), 'orderId': '',
+                                'orderLinkId': item.get('orderLinkId', ''), 'createAt': ''})
+                codes.append({'code': e.code, 'msg': e.message})
+        return {'list': results}, {'list': codes}
+
+    def find_order(self, params) -> dict:
+        order = self.orders.get(params.get('orderId'))
+        if order is None and params.get('orderLinkId'):
+            order = self.orders.get(self.order_links.get(params['orderLinkId']))
+        return order
+
+    def cancel_order(self, params):
+        order = self.find_order(params)
+        if order is None or order['orderStatus'] in TERMINAL_STATUSES:
+            raise ExchangeError(ORDER_NOT_FOUND_CODE, "Order does not exist.")
+        self.finish(order, 'PartiallyFilledCanceled' if order['orderStatus'] == 'PartiallyFilled' else 'Cancelled')
+        return {'orderId': order['orderId'], 'orderLinkId': order['orderLinkId']}
+
+    def get_open_orders(self, params):
+        if params.get('orderId') or params.get('orderLinkId'):
+            order = self.find_order(params)
+            orders = [order] if order is not None and order['orderStatus'] not in TERMINAL_STATUSES else []
+        else:
+            orders = [order for order in self.orders.values() if order['orderStatus'] not in TERMINAL_STATUSES
+                      and params.get('symbol') in (None, order['symbol'])]
+        return {'category': 'spot', 'list': [self.public_order(order) for order in orders]}
+
+    def get_order_history(self, params):
+        if params.get('orderId') or params.get('orderLinkId'):
+            order = self.find_order(params)
+            orders = [order] if order is not None else []
+        else:
+            orders = list(self.orders.values())
+        return {'category': 'spot', 'list': [self.public_order(order) for order in orders]}
+
+    @staticmethod
+    def public_order(order: dict) -> dict:
+        return {key: value for key, value in order.items() if not key.startswith('_')}
+
+    def finish(self, order: dict, status: str):
+        order['orderStatus'] = status
+        order['leavesQty'] = '0'
+        order['updatedTime'] = str(now_ms())
+        self.emit('order', [self.public_order(order)])
+
+    def match(self, order: dict, fee: float):
+        """
+        Fills the order against the opposite side of its book up to its limit price and removes the taken
+        liquidity from the book.
+        """
+        book = self.market.books[order['symbol']]
+        buy = order['side'] == 'Buy'
+        limit = order['_limit']
+        left = float(order['qty']) - float(order['cumExecQty'])
+        levels = list(book.asks if buy else book.bids)
+        taken = False
+        for i, (price, size) in enumerate(levels):
+            if left <= 1e-12 or (price > limit if buy else price < limit):
+                break
+            qty = min(size, left)
+            levels[i] = (price, size - qty)
+            left -= qty
+            taken = True
+            self.fill(order, price, qty, fee)
+        if not taken:
+            return
+        levels = [level for level in levels if level[1] > 1e-12]
+        if buy:
+            book.update(list(book.bids), levels, time.time())
+        else:
+            book.update(levels, list(book.asks), time.time())
+
+    def fill(self, order: dict, price: float, qty: float, fee: float):
+        symbol = order['symbol']
+        base, quote = symbol[:-4], symbol[-4:]
+        value = price * qty
+        # комиссия списывается в получаемой монете
+        if order['side'] == 'Buy':
+            exec_fee = qty * fee
+            self.wallet[quote] = self.wallet.get(quote, 0.0) - value
+            self.wallet[base] = self.wallet.get(base, 0.0) + qty - exec_fee
+        else:
+            exec_fee = value * fee
+            self.wallet[base] = self.wallet.get(base, 0.0) - qty
+            self.wallet[quote] = self.wallet.get(quote, 0.0) + value - exec_fee
+
+        cum_qty = float(order['cumExecQty']) + qty
+        cum_value = float(order['cumExecValue']) + value
+        order['cumExecQty'] = number(cum_qty)
+        order['cumExecValue'] = number(cum_value)
+        order['cumExecFee'] = number(float(order['cumExecFee']) + exec_fee)
+        order['avgPrice'] = number(cum_value / cum_qty)
+        leaves = float(order['qty']) - cum_qty
+        order['leavesQty'] = number(max(leaves, 0.0))
+        order['orderStatus'] = 'Filled' if leaves <= 1e-12 else 'PartiallyFilled'
+        order['updatedTime'] = str(now_ms())
+        self.stats['fills'] += 1
+
+        self.emit('execution', [{
+            'category': 'spot', 'symbol': symbol, 'orderId': order['orderId'], 'orderLinkId': order['orderLinkId'],
+            'side': order['side'], 'execId': str(uuid.uuid4()), 'execPrice': number(price), 'execQty': number(qty),
+            'execValue': number(value), 'execFee': number(exec_fee), 'execTime': order['updatedTime'],
+        }])
+        self.emit('order', [self.public_order(order)])
+        self.emit('wallet', [{'accountType': 'UNIFIED', 'coin': self.wallet_coins([base, quote])}])
+
+    # ---- потоки ----
+
+    @staticmethod
+    async def send(ws, message: str):
+        try:
+            await ws.send_str(message)
+        except ConnectionError:
+            # подписчик отключился, его уберет обработчик соединения
+            pass
+
+    def emit(self, topic: str, data: list):
+        message = json.dumps({'id': str(uuid.uuid4()), 'topic': topic, 'creationTime': now_ms(), 'data': data})
+        for ws, topics in list(self.private_subscribers.items()):
+            if topic in topics and not ws.closed:
+                asyncio.ensure_future(self.send(ws, message))
+
+    def levels(self, book) -> dict:
+        return {'b': {number(price): number(size) for price, size in book.bids},
+                'a': {number(price): number(size) for price, size in book.asks}}
+
+    def publish(self, symbol: str):
+        """
+        Sends the change of a book since its previous publication to every subscriber as a delta.
+        """
+        current = self.levels(self.market.books[symbol])
+        previous = self.published.get(symbol)
+        state = {'u': previous['u'] + 1 if previous else 1, **current}
+        self.published[symbol] = state
+        subscribers = self.book_subscribers.get(symbol)
+        if not previous or not subscribers:
+            return
+        delta = {}
+        for side in ('b', 'a'):
+            changed = [[price, size] for price, size in current[side].items() if previous[side].get(price) != size]
+            removed = [[price, '0'] for price in previous[side] if price not in current[side]]
+            delta[side] = changed + removed
+        ts = now_ms()
+        for ws, topic in list(subscribers.items()):
+            message = {'topic': topic, 'type': 'delta', 'ts': ts, 'cts': ts,
+                       'data': {'s': symbol, 'b': delta['b'], 'a': delta['a'], 'u': state['u'], 'seq': state['u']}}
+            if not ws.closed:
+                asyncio.ensure_future(self.send(ws, json.dumps(message)))
+
+    def snapshot_message(self, symbol: str, topic: str) -> dict:
+        if symbol not in self.published:
+            self.publish(symbol)
+        state = self.published[symbol]
+        ts = now_ms()
+        return {'topic': topic, 'type': 'snapshot', 'ts': ts, 'cts': ts,
+                'data': {'s': symbol, 'b': [[price, size] for price, size in state['b'].items()],
+                         'a': [[price, size] for price, size in state['a'].items()],
+                         'u': state['u'], 'seq': state['u']}}
+
+    def tick(self):
+        """
+        Moves one random book, matches resting orders against it and publishes the change.
+        """
+        book = self.market.tick()
+        for order in list(self.orders.values()):
+            if order['symbol'] == book.symbol and order['orderStatus'] in ('New', 'PartiallyFilled'):
+                self.match(order, MAKER_FEE)
+        self.publish(book.symbol)
+
+    async def run_ticks(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            self.tick()
+            if self.disconnect_rate and self.rng.random() < self.disconnect_rate:
+                # обрыв одного из потоков, как при перезапуске сервиса биржи
+                connections = [ws for subscribers in self.book_subscribers.values() for ws in subscribers]
+                connections += list(self.private_subscribers)
+                if connections:
+                    self.stats['disconnects'] += 1
+                    await self.rng.choice(connections).close()
+
+    async def public_stream(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                message = json.loads(msg.data)
+                op = message.get('op')
+                if op == 'ping':
+                    await ws.send_json({'success': True, 'ret_msg': 'pong', 'op': 'ping'})
+                elif op in ('subscribe', 'unsubscribe'):
+                    await ws.send_json({'success': True, 'ret_msg': op, 'op': op, 'req_id': message.get('req_id')})
+                    for topic in message.get('args', []):
+                        symbol = topic.split('.')[-1]
+                        if op == 'unsubscribe':
+                            self.book_subscribers.get(symbol, {}).pop(ws, None)
+                            continue
+                        self.book(symbol)
+                        self.book_subscribers.setdefault(symbol, {})[ws] = topic
+                        await ws.send_json(self.snapshot_message(symbol, topic))
+        finally:
+            for subscribers in self.book_subscribers.values():
+                subscribers.pop(ws, None)
+        return ws
+
+    async def private_stream(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        authorized = False
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                message = json.loads(msg.data)
+                op = message.get('op')
+                if op == 'ping':
+                    await ws.send_json({'success': True, 'ret_msg': 'pong', 'op': 'ping'})
+                elif op == 'auth':
+                    # подпись не проверяется, достаточно срока действия в будущем
+                    args = message.get('args') or [None, 0, None]
+                    authorized = int(args[1]) > now_ms()
+                    await ws.send_json({'success': authorized, 'ret_msg': '' if authorized else 'Params Error',
+                                        'op': 'auth', 'conn_id': str(id(ws))})
+                elif op == 'subscribe':
+                    if authorized:
+                        self.private_subscribers.setdefault(ws, set()).update(message.get('args', []))
+                    await ws.send_json({'success': authorized, 'ret_msg': '' if authorized else 'Request not authorized',
+                                        'op': 'subscribe', 'conn_id': str(id(ws))})
+        finally:
+            self.private_subscribers.pop(ws, None)
+        return ws
+
+
+async def serve(exchange: MockExchange, host: str, port: int):
+    url = await exchange.start(host, port)
+    logging.info(f"Mock exchange listening on {url}")
+    print(f"BYBIT_REST_URL={url}")
+    print(f"BYBIT_PUBLIC_WS_URL={url.replace('http', 'ws', 1)}/v5/public/spot")
+    print(f"BYBIT_PRIVATE_WS_URL={url.replace('http', 'ws', 1)}/v5/private")
+    try:
+        while True:
+            await asyncio.sleep(60)
+            print(json.dumps(exchange.stats))
+    finally:
+        await exchange.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local imitation of the Bybit spot API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--coins', nargs='*', default=[], help="coins quoted from the start, e.g. ADA XRP")
+    parser.add_argument('--depth', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--usdt', type=float, default=10000)
+    parser.add_argument('--usdc', type=float, default=10000)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every REST response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="random extra latency, up to this many seconds")
+    parser.add_argument('--rate-limit', type=float, default=None, help="requests per second per endpoint")
+    parser.add_argument('--disconnect-rate', type=float, default=0.0,
+                        help="probability of dropping a REST request or a stream on a book tick")
+    parser.add_argument('--tick-interval', type=float, default=0.1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    mock = MockExchange([(f"{coin}USDT", f"{coin}USDC") for coin in args.coins], args.depth, args.seed,
+                        {'USDT': args.usdt, 'USDC': args.usdc}, args.latency, args.jitter, args.rate_limit,
+                        args.disconnect_rate, args.tick_interval)
+    try:
+        asyncio.run(serve(mock, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
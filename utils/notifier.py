@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from collections import deque
+
+import aiohttp
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+QUEUE_SIZE = 100
+# Telegram разрешает примерно одно сообщение в секунду в один чат
+MIN_INTERVAL = 1.0
+MAX_MESSAGE_LENGTH = 4096
+SEND_TIMEOUT = 5
+SEND_ATTEMPTS = 3
+
+
+class TelegramNotifier:
+    """
+    Sends notifications from a background task so the caller never waits for Telegram.
+
+    send() only appends to a bounded queue; when it is full the oldest message is dropped. The task posts
+    at most one message per min_interval over a single pooled connection, and everything queued in between
+    is merged into one digest message.
+
+    Args:
+    - token (str): Telegram bot token.
+    - chat_id (str): Chat to send to. Messages are discarded with an error log if it is not set.
+    - base_url (str): Telegram Bot API endpoint. Can point at a local stand-in server.
+    - maxsize (int): Queue capacity.
+    - min_interval (float): Seconds between two posts.
+    """
+
+    def __init__(self, token: str, chat_id, base_url: str = TELEGRAM_API_URL, maxsize: int = QUEUE_SIZE,
+                 min_interval: float = MIN_INTERVAL):
+        self.token = token
+        self.chat_id = chat_id
+        self.base_url = base_url
+        self.min_interval = min_interval
+        self.queue = deque(maxlen=maxsize)
+        self.dropped = 0
+        self.sent = 0
+        self._loop = None
+        self._wakeup = None
+        self._stopped = False
+
+    def send(self, message: str):
+        """
+        Queues a message. Never blocks and is safe to call from executor threads.
+        """
+        if not self.chat_id:
+            logging.error("chat_id is not set. Cannot send message.")  # Логирование ошибки, если chat_id не установлен
+            return
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(str(message))
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def digest(self) -> str:
+        """
+        Takes as many queued messages as fit into one Telegram message.
+        """
+        parts = []
+        length = 0
+        if self.dropped:
+            parts.append(f"({self.dropped} notifications dropped)")
+            length = len(parts[0])
+            self.dropped = 0
+        while self.queue:
+            message = self.queue[0][:MAX_MESSAGE_LENGTH]
+            if parts and length + 1 + len(message) > MAX_MESSAGE_LENGTH:
+                break
+            self.queue.popleft()
+            parts.append(message)
+            length += len(message) + 1
+        return "\n".join(parts)[:MAX_MESSAGE_LENGTH]
+
+    async def post(self, http, text: str):
+        url = f"{self.base_url}/bot{self.token}/sendMessage"
+        for _ in range(SEND_ATTEMPTS):
+            try:
+                async with http.post(url, data={'chat_id': self.chat_id, 'text': text}) as response:
+                    if response.status != 429:
+                        if response.status != 200:
+                            logging.error(f"Telegram responded {response.status}: {await response.text()}")
+                        return
+                    body = await response.json()
+                    # Telegram сообщает, сколько ждать до следующей попытки
+                    await asyncio.sleep(body.get('parameters', {}).get('retry_after', self.min_interval))
+            except Exception as e:
+                logging.error(f"Failed to send Telegram message: {e}")
+                return
+
+    async def run(self):
+        """
+        Drains the queue until stop() is called, then flushes what is left.
+        """
+        loop = asyncio.get_event_loop()
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        next_at = 0.0
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=SEND_TIMEOUT)) as http:
+            while self.queue or not self._stopped:
+                if not self.queue:
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+                    continue
+                # пока выдерживаем интервал, в очереди копятся сообщения для одного дайджеста
+                if next_at > loop.time():
+                    await asyncio.sleep(next_at - loop.time())
+                await self.post(http, self.digest())
+                self.sent += 1
+                next_at = loop.time() + self.min_interval
+        self._loop = None
+
+    def stop(self):
+        self._stopped = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+TERMINAL_STATUSES = {'Filled', 'Cancelled', 'PartiallyFilledCanceled', 'Rejected', 'Deactivated'}
+# сколько держать в таблице завершенные ордера
+FINISHED_TTL = 10 * 60
+
+
+class OrderTracker:
+    """
+    In-memory table of order states fed by the private 'order' and 'execution' topics.
+
+    Order updates carry cumulative fills; executions usually arrive first, so partial fills are also summed
+    from them and the larger value wins.
+
+    Args:
+    - stream (PrivateStream): Stream to subscribe to. While it is disconnected the tracker is not live
+      and callers should fall back to REST.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.orders = {}
+        self.executions = {}
+        self.finished = {}
+        self.version = 0
+        self._updated = asyncio.Event()
+        if stream is not None:
+            stream.subscribe('order', self.handle_order)
+            stream.subscribe('execution', self.handle_execution)
+
+    @property
+    def live(self) -> bool:
+        return self.stream is not None and self.stream.connected
+
+    def get(self, order_id: str):
+        return self.orders.get(order_id)
+
+    def handle_order(self, data):
+        for item in data:
+            self._update(item['orderId'], item)
+
+    def handle_execution(self, data):
+        for item in data:
+            order_id = item['orderId']
+            fills = self.executions.setdefault(order_id, {})
+            fills[item['execId']] = item
+            self._update(order_id, {
+                'symbol': item.get('symbol'),
+                'side': item.get('side'),
+                'cumExecQty': str(sum(float(fill['execQty']) for fill in fills.values())),
+                'cumExecValue': str(sum(float(fill['execValue']) for fill in fills.values())),
+                'cumExecFee': str(sum(float(fill.get('execFee') or 0) for fill in fills.values())),
+            })
+
+    def _update(self, order_id: str, fields: dict):
+        order = self.orders.setdefault(order_id, {'orderId': order_id, 'orderStatus': 'New'})
+        for key, value in fields.items():
+            if value is None:
+                continue
+            if key in ('cumExecQty', 'cumExecValue', 'cumExecFee'):
+                # сообщения двух топиков приходят в любом порядке, накопленные объемы только растут
+                if float(value) < float(order.get(key) or 0):
+                    continue
+            order[key] = value
+        if order['orderStatus'] == 'New' and float(order.get('cumExecQty') or 0) > 0:
+            order['orderStatus'] = 'PartiallyFilled'
+
+        if order['orderStatus'] in TERMINAL_STATUSES and order_id not in self.finished:
+            self.finished[order_id] = time.time()
+            self._prune()
+
+        # будим всех, кто ждет любое изменение, и заводим событие для следующего
+        self.version += 1
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    def _prune(self):
+        expired = [order_id for order_id, finished_at in self.finished.items()
+                   if time.time() - finished_at > FINISHED_TTL]
+        self.forget(expired)
+
+    def forget(self, order_ids):
+        for order_id in order_ids:
+            self.orders.pop(order_id, None)
+            self.executions.pop(order_id, None)
+            self.finished.pop(order_id, None)
+
+    async def wait_for_update(self, timeout: float, since: int = None) -> bool:
+        """
+        Waits for any order or execution update.
+
+        Args:
+        - timeout (float): Seconds to wait.
+        - since (int): Version the caller has already seen; returns at once if the table changed after it.
+
+        Returns:
+        - bool: False if nothing arrived within the timeout.
+        """
+        if since is not None and since != self.version:
+            return True
+        try:
+            await asyncio.wait_for(self._updated.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
@@ -0,0 +1,253 @@
+import asyncio
+import heapq
+import json
+import logging
+import time
+
+import websockets
+
+from utils.records import ArrayBook
+
+PUBLIC_SPOT_URL = "wss://stream.bybit.com/v5/public/spot"
+
+# Bybit принимает не больше 10 топиков в одном запросе subscribe для spot
+SUBSCRIBE_CHUNK = 10
+PING_INTERVAL = 20
+
+
+class LocalOrderBook:
+    """
+    Local copy of a single spot order book maintained from Bybit snapshot/delta messages.
+
+    Args:
+    - symbol (str): The trading pair symbol (e.g., 'XRPUSDT').
+    - levels (int): How many levels per side the view exposes.
+    """
+
+    def __init__(self, symbol: str, levels: int = 3):
+        self.symbol = symbol
+        self.levels = levels
+        self.bids = {}
+        self.asks = {}
+        self.update_id = None
+        self.ts = 0.0
+        self.ready = False
+        self._view = ArrayBook(symbol, levels)
+        self._changed = True
+
+    def reset(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.update_id = None
+        self.ready = False
+        self._changed = True
+
+    def apply_snapshot(self, data: dict, ts: float):
+        self.bids = {float(price): float(size) for price, size in data['b']}
+        self.asks = {float(price): float(size) for price, size in data['a']}
+        self.update_id = data['u']
+        self.ts = ts
+        self.ready = True
+        self._changed = True
+
+    def apply_delta(self, data: dict, ts: float) -> bool:
+        """
+        Applies a delta to the book.
+
+        Returns:
+        - bool: False if the update id does not follow the previous one and the book has to be resynced.
+        """
+        if not self.ready or data['u'] != self.update_id + 1:
+            self.reset()
+            return False
+
+        for side, levels in ((self.bids, data['b']), (self.asks, data['a'])):
+            for price, size in levels:
+                size = float(size)
+                if size == 0:
+                    side.pop(float(price), None)
+                else:
+                    side[float(price)] = size
+        self.update_id = data['u']
+        self.ts = ts
+        self._changed = True
+        return True
+
+    def view(self) -> ArrayBook:
+        """
+        Returns the best levels in the same form as fetch_ticker_info does.
+        The same ArrayBook is refreshed in place only after an update, so unchanged books cost nothing per tick.
+        """
+        if self._changed:
+            self._view.update(heapq.nlargest(self.levels, self.bids.items()),
+                              heapq.nsmallest(self.levels, self.asks.items()), self.ts)
+            self._changed = False
+        return self._view
+
+
+class OrderBookEngine:
+    """
+    Keeps local order books for the given symbols up to date via the Bybit public spot orderbook stream.
+
+    Args:
+    - symbols (list): Symbols to subscribe to (e.g., ['XRPUSDT', 'XRPUSDC', 'USDCUSDT']).
+    - url (str): WebSocket endpoint. Can point at a local stand-in server.
+    - depth (int): Depth of the orderbook topic (1, 50 or 200 for spot).
+    - levels (int): How many levels per side the snapshot view exposes.
+    """
+
+    def __init__(self, symbols, url: str = PUBLIC_SPOT_URL, depth: int = 50, levels: int = 3):
+        self.url = url
+        self.depth = depth
+        self.levels = levels
+        self.books = {symbol: LocalOrderBook(symbol, levels) for symbol in symbols}
+        self.dirty = set()
+        self.updated = asyncio.Event()
+        self.listeners = []
+        # вызываются со стаканом, который перестал быть актуальным: разрыв последовательности или обрыв связи
+        self.reset_listeners = []
+        self.resyncs = 0
+        # символы, для которых запрошен новый снапшот: их дельты до снапшота отбрасываются
+        self.resyncing = set()
+        self._ws = None
+        self._stopped = False
+
+    def topic(self, symbol: str) -> str:
+        return f"orderbook.{self.depth}.{symbol}"
+
+    def snapshot(self) -> dict:
+        """
+        Returns {symbol: {'symbol', 'bids', 'asks', 'ts'}} for every book that is in sync.
+        """
+        return {symbol: book.view() for symbol, book in self.books.items() if book.ready}
+
+    def pop_dirty(self) -> set:
+        """
+        Returns the symbols changed since the previous call and clears the set.
+        """
+        dirty, self.dirty = self.dirty, set()
+        self.updated.clear()
+        return dirty
+
+    async def wait_for_update(self, timeout: float = None) -> bool:
+        try:
+            await asyncio.wait_for(self.updated.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def handle_message(self, message: dict):
+        topic = message.get('topic')
+        if not topic or not topic.startswith('orderbook.'):
+            if message.get('success') is False:
+                logging.error(f"Orderbook stream error: {message}")
+            return
+
+        data = message['data']
+        book = self.books.get(data['s'])
+        if book is None:
+            return
+
+        ts = message.get('ts', time.time() * 1000) / 1000
+        # u == 1 означает, что сервис биржи перезапустился и прислал новый снапшот в виде дельты
+        if message['type'] == 'snapshot' or data['u'] == 1:
+            book.apply_snapshot(data, ts)
+            self.resyncing.discard(book.symbol)
+        elif book.symbol in self.resyncing:
+            # дельты, отправленные до переподписки, к новому снапшоту не относятся
+            return
+        elif not book.apply_delta(data, ts):
+            self.resyncing.add(book.symbol)
+            self.resyncs += 1
+            logging.error(f"Sequence gap in {book.symbol} orderbook, resyncing")
+            asyncio.ensure_future(self.resync(book.symbol))
+            for listener in self.reset_listeners:
+                listener(book)
+
+        if book.ready:
+            # например, запись стаканов для последующего воспроизведения
+            for listener in self.listeners:
+                listener(book)
+        self.dirty.add(book.symbol)
+        self.updated.set()
+
+    def set_symbols(self, symbols):
+        """
+        Starts and stops books so the engine follows exactly the given symbols; on a live connection
+        the subscriptions are changed in place, otherwise the next connect subscribes to the new set.
+        """
+        symbols = list(symbols)
+        wanted = set(symbols)
+        removed = [symbol for symbol in self.books if symbol not in wanted]
+        added = [symbol for symbol in symbols if symbol not in self.books]
+        for symbol in removed:
+            del self.books[symbol]
+            self.dirty.discard(symbol)
+            self.resyncing.discard(symbol)
+        for symbol in added:
+            self.books[symbol] = LocalOrderBook(symbol, self.levels)
+        if self._ws is not None and (added or removed):
+            asyncio.ensure_future(self._change_subscriptions(added, removed))
+
+    async def _change_subscriptions(self, added, removed):
+        for op, symbols in (('unsubscribe', removed), ('subscribe', added)):
+            topics = [self.topic(symbol) for symbol in symbols]
+            for i in range(0, len(topics), SUBSCRIBE_CHUNK):
+                await self._ws.send(json.dumps({'op': op, 'args': topics[i:i + SUBSCRIBE_CHUNK]}))
+
+    async def resync(self, symbol: str):
+        if self._ws is None:
+            # переподключение и так подпишется заново на все стаканы
+            self.resyncing.discard(symbol)
+            return
+        topic = [self.topic(symbol)]
+        await self._ws.send(json.dumps({'op': 'unsubscribe', 'args': topic}))
+        await self._ws.send(json.dumps({'op': 'subscribe', 'args': topic}))
+
+    async def _subscribe(self, ws):
+        topics = [self.topic(symbol) for symbol in self.books]
+        for i in range(0, len(topics), SUBSCRIBE_CHUNK):
+            await ws.send(json.dumps({'op': 'subscribe', 'args': topics[i:i + SUBSCRIBE_CHUNK]}))
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            await ws.send(json.dumps({'op': 'ping'}))
+
+    async def run(self, reconnect_delay: float = 1.0):
+        """
+        Connects to the stream and keeps the books in sync, reconnecting on any transport error.
+        """
+        while not self._stopped:
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as ws:
+                    self._ws = ws
+                    await self._subscribe(ws)
+                    pinger = asyncio.ensure_future(self._ping(ws))
+                    try:
+                        async for raw in ws:
+                            self.handle_message(json.loads(raw))
+                    finally:
+                        pinger.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Orderbook stream disconnected: {e}")
+            finally:
+                self._ws = None
+                # после обрыва соединения локальные стаканы больше нельзя считать актуальными
+                for book in self.books.values():
+                    book.reset()
+                    for listener in self.reset_listeners:
+                        listener(book)
+                self.resyncing.clear()
+                self.dirty.update(self.books)
+                self.updated.set()
+
+            if not self._stopped:
+                await asyncio.sleep(reconnect_delay)
+
+    async def stop(self):
+        self._stopped = True
+        if self._ws is not None:
+            await self._ws.close()
@@ -0,0 +1,167 @@
+import math
+import time
+
+POLL_INTERVAL = 0.25
+# каждая пара опрашивается хотя бы раз в MIN_POLL_PERIOD секунд, даже если до безубыточности далеко
+MIN_POLL_PERIOD = 30
+# ближе этого к безубыточности пары уже не различаются: все одинаково горячие
+GAP_FLOOR = 0.0005
+# волатильность (стандартное отклонение лог-доходности за секунду), ниже которой пары считаются одинаково тихими
+VOLATILITY_FLOOR = 0.0001
+# вес нового наблюдения в скользящем среднем квадрата доходности
+VOLATILITY_ALPHA = 0.2
+SHARED_SYMBOLS = ('USDCUSDT',)
+
+
+def route_edges(routes) -> dict:
+    """
+    Best relative result of each pair over its directions, from IncrementalEvaluator.routes:
+    simulated_usdt / qty_usdt - 1, i.e. positive for a profitable pair and -0.002 for one 0.2% short of break-even.
+
+    Returns:
+    - dict: {(USDT pair, USDC pair): edge} for every pair with at least one simulated route.
+    """
+    edges = {}
+    for (pair1, pair2, _), route in routes.items():
+        if route is None or not route.qty_usdt:
+            continue
+        edge = route.simulated_usdt / route.qty_usdt - 1
+        if edge > edges.get((pair1, pair2), -math.inf):
+            edges[(pair1, pair2)] = edge
+    return edges
+
+
+def mid_price(book) -> float:
+    if book is None or not len(book['bids']) or not len(book['asks']):
+        return 0.0
+    return (book['bids'][0][0] + book['asks'][0][0]) / 2
+
+
+class PollScheduler:
+    """
+    Decides which books to fetch on every REST cycle so that a fixed request budget is spent on the pairs
+    most likely to turn profitable. A pair's weight is its volatility over its shortfall to break-even,
+    i.e. roughly how fast the market can close the gap; every pair gets a minimum rate, and the rest of
+    the budget is split by weight, capped at one poll per cycle.
+
+    Both symbols of a pair are fetched together, and the shared symbols (USDCUSDT, used by every route)
+    in every cycle that polls anything, so a route is always simulated on books fetched together.
+
+    Args:
+    - pairs (list): (USDT pair, USDC pair) tuples, as in PAIRS.
+    - budget (float): Order book requests per second for all symbols.
+    - interval (float): Seconds between two cycles of the bot.
+    - min_period (float): Longest time between two polls of a pair.
+    - shared (tuple): Symbols fetched in every polling cycle.
+
+    Raises:
+    - ValueError: If the budget cannot pay for the shared symbols and the minimum rate of every pair.
+    """
+
+    def __init__(self, pairs, budget: float, interval: float = POLL_INTERVAL, min_period: float = MIN_POLL_PERIOD,
+                 shared=SHARED_SYMBOLS):
+        self.pairs = list(pairs)
+        self.budget = budget
+        self.interval = interval
+        self.min_period = min_period
+        self.shared = list(shared)
+        self.min_rate = 1 / min_period
+        self.max_rate = 1 / interval
+        # два запроса на пару за один опрос
+        self.pair_budget = (budget - len(self.shared) / interval) / 2
+        if self.pair_budget < len(self.pairs) * self.min_rate:
+            raise ValueError(f"Polling budget of {budget} requests per second is too small for {len(self.pairs)} pairs")
+        # пары без истории считаются горячими, чтобы первая оценка пришла как можно раньше
+        self.gaps = dict.fromkeys(self.pairs, 0.0)
+        self.variances = dict.fromkeys(self.pairs, 0.0)
+        self.mids = {}
+        # доли кредита сверх единицы разносят следующие опросы пар по разным циклам: иначе пары с одинаковой
+        # частотой опрашиваются одним залпом, а общие символы запрашиваются реже, чем на них отложен бюджет
+        self.credits = {pair: 1.0 + k / len(self.pairs) for k, pair in enumerate(self.pairs)}
+        self.rates = {}
+        self.polled = []
+        self._last = None
+
+    def rebuild(self, pairs) -> 'PollScheduler':
+        """
+        Scheduler with the same budget for a new set of pairs; pairs present in both keep their estimates.
+
+        Raises:
+        - ValueError: If the budget cannot pay for the new pairs; this scheduler is left as it was.
+        """
+        scheduler = PollScheduler(pairs, self.budget, self.interval, self.min_period, self.shared)
+        for pair in scheduler.pairs:
+            if pair in self.gaps:
+                scheduler.gaps[pair] = self.gaps[pair]
+                scheduler.variances[pair] = self.variances[pair]
+            if pair in self.mids:
+                scheduler.mids[pair] = self.mids[pair]
+        return scheduler
+
+    def weight(self, pair) -> float:
+        return (math.sqrt(self.variances[pair]) + VOLATILITY_FLOOR) / (self.gaps[pair] + GAP_FLOOR)
+
+    def allocate(self) -> dict:
+        """
+        Polls per second of every pair: the minimum rate plus a share of the rest of the budget proportional
+        to the weight; shares above one poll per cycle are capped and their excess goes to the other pairs.
+        """
+        weights = {pair: self.weight(pair) for pair in self.pairs}
+        remaining = self.pair_budget - len(self.pairs) * self.min_rate
+        cap = self.max_rate - self.min_rate
+        extra = {}
+        free = set(self.pairs)
+        while free and remaining > 0:
+            total = sum(weights[pair] for pair in free)
+            saturated = [pair for pair in free if remaining * weights[pair] / total >= cap]
+            if not saturated:
+                for pair in free:
+                    extra[pair] = remaining * weights[pair] / total
+                break
+            for pair in saturated:
+                extra[pair] = cap
+                free.discard(pair)
+                remaining -= cap
+        self.rates = {pair: self.min_rate + extra.get(pair, 0.0) for pair in self.pairs}
+        return self.rates
+
+    def due(self, now: float = None) -> list:
+        """
+        Symbols to fetch in this cycle; remembers the polled pairs for the next update().
+        """
+        now = time.monotonic() if now is None else now
+        elapsed = self.interval if self._last is None else now - self._last
+        self._last = now
+        rates = self.allocate()
+        self.polled = []
+        for pair in self.pairs:
+            # дробный остаток переходит в следующий цикл, но после долгой паузы (например, исполнения сделки)
+            # кредит не копится, чтобы не было залпа запросов
+            self.credits[pair] = min(self.credits[pair] + rates[pair] * elapsed, 2.0)
+            if self.credits[pair] >= 1.0:
+                self.credits[pair] -= 1.0
+                self.polled.append(pair)
+        if not self.polled:
+            return []
+        return [symbol for pair in self.polled for symbol in pair] + self.shared
+
+    def update(self, prices, edges):
+        """
+        Updates the volatility and the gap to break-even of the pairs polled in this cycle.
+
+        Args:
+        - prices (dict): Books by symbol after the fetch.
+        - edges (dict): Result of route_edges() for the simulation on these books.
+        """
+        for pair in self.polled:
+            mid = mid_price(prices.get(pair[0]))
+            if mid > 0:
+                previous = self.mids.get(pair)
+                if previous is not None:
+                    last_mid, last_ts = previous
+                    elapsed = max(time.monotonic() - last_ts, self.interval)
+                    variance = math.log(mid / last_mid) ** 2 / elapsed
+                    self.variances[pair] += VOLATILITY_ALPHA * (variance - self.variances[pair])
+                self.mids[pair] = (mid, time.monotonic())
+            if pair in edges:
+                self.gaps[pair] = max(0.0, -edges[pair])
@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+
+import websockets
+
+PRIVATE_URL = "wss://stream.bybit.com/v5/private"
+PING_INTERVAL = 20
+AUTH_EXPIRES = 10
+# столько ждем ответа биржи на auth и subscribe, прежде чем переподключиться
+RESPONSE_TIMEOUT = 10
+
+
+def auth_message(api_key: str, api_secret: str) -> dict:
+    expires = int((time.time() + AUTH_EXPIRES) * 1000)
+    signature = hmac.new(api_secret.encode(), f"GET/realtime{expires}".encode(), hashlib.sha256).hexdigest()
+    return {'op': 'auth', 'args': [api_key, expires, signature]}
+
+
+class PrivateStream:
+    """
+    Authenticated connection to the Bybit private stream that dispatches messages to handlers by topic.
+
+    Args:
+    - api_key (str): Bybit API key.
+    - api_secret (str): Bybit API secret.
+    - url (str): WebSocket endpoint. Can point at a local stand-in server.
+    """
+
+    def __init__(self, api_key: str, api_secret: str, url: str = PRIVATE_URL):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.url = url
+        self.handlers = {}
+        self.on_connect = []
+        self.connected = False
+        self._ws = None
+        self._stopped = False
+
+    def subscribe(self, topic: str, handler):
+        """
+        Registers a handler called with the 'data' list of every message of the topic.
+        """
+        self.handlers.setdefault(topic, []).append(handler)
+
+    def handle_message(self, message: dict):
+        op = message.get('op')
+        if op in ('auth', 'subscribe') and not message.get('success', True):
+            logging.error(f"Private stream {op} failed: {message.get('ret_msg')}")
+            return
+        for handler in self.handlers.get(message.get('topic'), ()):
+            try:
+                handler(message['data'])
+            except Exception as e:
+                logging.error(f"Private stream handler for {message.get('topic')} failed: {e}")
+
+    async def _request(self, ws, message: dict, timeout: float = RESPONSE_TIMEOUT):
+        """
+        Sends an auth or subscribe request and reads the stream until the exchange answers it;
+        other messages that arrive meanwhile are dispatched as usual.
+
+        Raises:
+        - ConnectionError: If the exchange refused the request or did not answer in time.
+        """
+        op = message['op']
+        await ws.send(json.dumps(message))
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                raw = await asyncio.wait_for(ws.recv(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise ConnectionError(f"no response to {op} within {timeout} seconds")
+            response = json.loads(raw)
+            if response.get('op') != op:
+                self.handle_message(response)
+            elif response.get('success'):
+                return
+            else:
+                raise ConnectionError(f"{op} failed: {response.get('ret_msg')}")
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            await ws.send(json.dumps({'op': 'ping'}))
+
+    async def run(self, reconnect_delay: float = 1.0):
+        """
+        Connects, authenticates, subscribes to every registered topic and reconnects on any transport error.
+        The stream counts as connected only after the exchange accepted both the auth and the subscription;
+        a refused auth closes the connection and is retried after reconnect_delay.
+        """
+        while not self._stopped:
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as ws:
+                    self._ws = ws
+                    await self._request(ws, auth_message(self.api_key, self.api_secret))
+                    if self.handlers:
+                        await self._request(ws, {'op': 'subscribe', 'args': list(self.handlers)})
+                    self.connected = True
+                    for callback in self.on_connect:
+                        callback()
+                    pinger = asyncio.ensure_future(self._ping(ws))
+                    try:
+                        async for raw in ws:
+                            self.handle_message(json.loads(raw))
+                    finally:
+                        pinger.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Private stream disconnected: {e}")
+            finally:
+                self._ws = None
+                self.connected = False
+
+            if not self._stopped:
+                await asyncio.sleep(reconnect_delay)
+
+    async def stop(self):
+        self._stopped = True
+        if self._ws is not None:
+            await self._ws.close()
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import Metrics
+
+# приоритеты запросов: чем меньше число, тем раньше запрос получает бюджет
+ORDER = 0
+ACCOUNT = 1
+MARKET = 2
+
+# лимиты Bybit v5 по эндпоинтам (запросов в секунду на UID) до первого ответа с заголовками X-Bapi-Limit-*
+ENDPOINT_LIMITS = {
+    '/v5/order/create': 20,
+    '/v5/order/create-batch': 20,
+    '/v5/order/cancel': 20,
+    '/v5/order/cancel-batch': 20,
+    '/v5/order/amend': 10,
+    '/v5/order/realtime': 50,
+    '/v5/order/history': 50,
+    '/v5/account/wallet-balance': 50,
+    '/v5/account/fee-rate': 10,
+}
+DEFAULT_ENDPOINT_LIMIT = 10
+# общий лимит по IP на все HTTP-запросы: 600 запросов за 5 секунд
+IP_RATE = 120
+IP_CAPACITY = 600
+# доля общего бюджета, которую запросы этого приоритета не трогают: ее всегда оставляют ордерам
+RESERVE = {ORDER: 0.0, ACCOUNT: 0.1, MARKET: 0.25}
+# дольше не ждем сброса лимита, даже если часы биржи и локальные часы разошлись
+MAX_BACKOFF = 5.0
+BACKOFF = 1.0
+
+
+def request_priority(path: str) -> int:
+    """
+    Priority of a REST path: order placement and cancels first, then order and wallet state, then market data.
+    """
+    if path.startswith('/v5/market/'):
+        return MARKET
+    if path.startswith('/v5/order/') and path not in ('/v5/order/realtime', '/v5/order/history'):
+        return ORDER
+    return ACCOUNT
+
+
+class Bucket:
+    """
+    Token bucket of one request limit: capacity requests, refilled at rate requests per second.
+
+    Args:
+    - rate (float): Requests per second.
+    - capacity (float): Largest burst; rate if not given.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, floor: float = 0.0) -> float:
+        """
+        Seconds until a request may take a token leaving at least floor tokens behind; 0 if it may go now.
+        """
+        self.refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return max(0.0, (floor + 1 - self.tokens) / self.rate)
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, now: float, seconds: float):
+        # бюджет исчерпан на стороне биржи: до сброса ни один запрос не уходит
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def update(self, now: float, limit: int, remaining: int):
+        if limit > 0 and limit != self.capacity:
+            self.rate = self.capacity = float(limit)
+        self.refill(now)
+        # биржа знает о запросах, которых не видно отсюда (другие процессы с тем же ключом), верим меньшему
+        self.tokens = min(self.tokens, float(remaining))
+
+
+class RateLimiter:
+    """
+    Central scheduler of Bybit REST requests: a token bucket per endpoint plus one for the IP-wide limit,
+    corrected from the X-Bapi-Limit-* headers of every response. Market data may not spend the part of the IP
+    budget reserved for orders, so polling can never starve order placement; when the exchange reports the
+    budget as exhausted (X-Bapi-Limit-Status 0, retCode 10006, HTTP 403/429) the endpoint backs off until reset.
+
+    Thread-safe: pybit calls wait in their worker threads with acquire(), asyncio code awaits wait().
+
+    Args:
+    - limits (dict): Requests per second by path, on top of ENDPOINT_LIMITS.
+    - ip_rate (float), ip_capacity (float): IP-wide budget shared by every request.
+    - reserve (dict): Share of the IP budget each priority leaves untouched.
+    - metrics (Metrics): Receives 'throttled' (delayed here) and 'rate_limited' (refused by the exchange) counts.
+    """
+
+    def __init__(self, limits=None, ip_rate: float = IP_RATE, ip_capacity: float = IP_CAPACITY, reserve=None,
+                 metrics=None):
+        self.limits = dict(ENDPOINT_LIMITS, **(limits or {}))
+        self.ip = Bucket(ip_rate, ip_capacity)
+        self.reserve = dict(RESERVE, **(reserve or {}))
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, path: str) -> Bucket:
+        bucket = self.buckets.get(path)
+        if bucket is None:
+            # публичные данные ограничены только общим лимитом по IP
+            default = self.ip.rate if path.startswith('/v5/market/') else DEFAULT_ENDPOINT_LIMIT
+            bucket = self.buckets[path] = Bucket(self.limits.get(path, default))
+        return bucket
+
+    def try_acquire(self, path: str, priority: int = None) -> float:
+        """
+        Takes a token for the request if both its endpoint and the IP budget allow it.
+
+        Returns:
+        - float: 0 if the request may be sent now, otherwise seconds to wait before trying again.
+        """
+        if priority is None:
+            priority = request_priority(path)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.bucket(path)
+            wait = max(self.ip.wait_time(now, self.ip.capacity * self.reserve.get(priority, 0.0)),
+                       bucket.wait_time(now))
+            if wait > 0:
+                return wait
+            self.ip.take()
+            bucket.take()
+            return 0.0
+
+    def acquire(self, path: str, priority: int = None):
+        """
+        Blocks the calling thread until the request may be sent.
+        """
+        wait = self.try_acquire(path, priority)
+        if wait > 0:
+            self.metrics.increment('throttled')
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.try_acquire(path, priority)
+
+    async def wait(self, path: str, priority: int = None):
+        """
+        Waits without blocking the event loop until the request may be sent.
+        """
+        wait = self.try_acquire(path, priority)
+        if wait > 0:
+            self.metrics.increment('throttled')
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.try_acquire(path, priority)
+
+    def update(self, path: str, headers, status: int = 200):
+        """
+        Corrects the endpoint bucket from the X-Bapi-Limit-* headers of a response and backs off when
+        the exchange refused the request for exceeding a limit.
+        """
+        now = time.monotonic()
+        limit = headers.get('X-Bapi-Limit')
+        remaining = headers.get('X-Bapi-Limit-Status')
+        reset = headers.get('X-Bapi-Limit-Reset-Timestamp')
+        with self._lock:
+            bucket = self.bucket(path)
+            if limit is not None and remaining is not None:
+                try:
+                    bucket.update(now, int(limit), int(remaining))
+                except ValueError:
+                    pass
+            exhausted = remaining is not None and remaining == '0'
+            if status not in (403, 429) and not exhausted:
+                return
+            # retCode 10006 приходит с HTTP 200 и нулевым остатком в заголовках
+            delay = BACKOFF
+            if reset is not None:
+                try:
+                    delay = min(max(int(reset) / 1000 - time.time(), 0.0), MAX_BACKOFF)
+                except ValueError:
+                    pass
+            # 403/429 - превышен лимит по IP, останавливаются все запросы
+            (self.ip if status in (403, 429) else bucket).block(now, delay)
+        if status in (403, 429):
+            self.metrics.increment('rate_limited')
+            logging.warning(f"Rate limit hit on {path} (HTTP {status}), pausing requests for {delay:.2f} seconds")
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    requests transport adapter that passes every request of a session through the RateLimiter.
+    """
+
+    def __init__(self, limiter: RateLimiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        path = urlsplit(request.url).path
+        self.limiter.acquire(path)
+        response = super().send(request, **kwargs)
+        self.limiter.update(path, response.headers, response.status_code)
+        return response
+
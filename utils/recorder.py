@@ -0,0 +1,98 @@
+import os
+import struct
+
+import numpy as np
+
+RECORD_MAGIC = b'ARBREC01'
+SYMBOL_SIZE = 16
+# magic, depth, number of symbols
+HEADER = struct.Struct('<8sII')
+
+
+def record_dtype(depth: int) -> np.dtype:
+    """
+    Layout of one book update: local time, symbol index, level counts and (price, size) pairs of both sides.
+    Every record has the same size, so a recording can be memory-mapped as a NumPy array.
+    """
+    return np.dtype([
+        ('ts', '<f8'),
+        ('symbol', '<u2'),
+        ('bid_count', 'u1'),
+        ('ask_count', 'u1'),
+        ('pad', '<u4'),
+        ('bids', '<f8', (depth, 2)),
+        ('asks', '<f8', (depth, 2)),
+    ])
+
+
+def header_size(symbols) -> int:
+    return HEADER.size + SYMBOL_SIZE * len(symbols)
+
+
+class BookRecorder:
+    """
+    Appends every book update to a binary file: a header with the symbol table, then fixed-size records.
+
+    Args:
+    - path (str): Output file; it is overwritten.
+    - symbols (list): Symbols that can be recorded.
+    - depth (int): Levels stored per side.
+    """
+
+    def __init__(self, path: str, symbols, depth: int = 3):
+        self.path = path
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.depth = depth
+        self.record = struct.Struct(f'<dHBB4x{4 * depth}d')
+        self.count = 0
+        self._empty = [0.0] * (2 * depth)
+        self._file = open(path, 'wb', buffering=1024 * 1024)
+        self._file.write(HEADER.pack(RECORD_MAGIC, depth, len(self.symbols)))
+        for symbol in self.symbols:
+            self._file.write(symbol.encode().ljust(SYMBOL_SIZE, b'\0'))
+
+    def _side(self, levels):
+        values = [value for level in list(levels)[:self.depth] for value in level]
+        return values + self._empty[len(values):]
+
+    def write(self, book):
+        """
+        Records the current state of a book (ArrayBook or a dict with 'symbol', 'ts', 'bids' and 'asks').
+        Symbols outside the symbol table are ignored.
+        """
+        index = self.index.get(book['symbol'])
+        if index is None:
+            return
+        bids = self._side(book['bids'])
+        asks = self._side(book['asks'])
+        self._file.write(self.record.pack(book['ts'], index, min(len(book['bids']), self.depth),
+                                          min(len(book['asks']), self.depth), *bids, *asks))
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def open_recording(path: str):
+    """
+    Memory-maps a recording.
+
+    Returns:
+    - tuple: (symbols, records) where records is a read-only NumPy structured array of record_dtype.
+    """
+    with open(path, 'rb') as file:
+        magic, depth, count = HEADER.unpack(file.read(HEADER.size))
+        if magic != RECORD_MAGIC:
+            raise ValueError(f"{path} is not a book recording")
+        symbols = [file.read(SYMBOL_SIZE).rstrip(b'\0').decode() for _ in range(count)]
+    dtype = record_dtype(depth)
+    offset = header_size(symbols)
+    # недописанная последняя запись (бот упал посреди записи) отбрасывается
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count == 0:
+        return symbols, np.empty(0, dtype=dtype)
+    return symbols, np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
@@ -0,0 +1,157 @@
+from array import array
+from datetime import datetime
+
+
+class BookSide:
+    """
+    One side of an order book stored as interleaved (price, size) pairs in a preallocated array('d').
+    Iterating yields (price, size) tuples, best level first, like the lists fetch_ticker_info used to build.
+
+    Args:
+    - depth (int): Maximum number of levels kept.
+    """
+
+    __slots__ = ('levels', 'count', 'depth')
+
+    def __init__(self, depth: int):
+        self.levels = array('d', bytes(16 * depth))
+        self.count = 0
+        self.depth = depth
+
+    def load(self, levels):
+        """
+        Overwrites the side in place. Levels may hold strings as they come from the API.
+        """
+        buf = self.levels
+        i = 0
+        for price, size in levels:
+            if i == self.depth:
+                break
+            buf[2 * i] = float(price)
+            buf[2 * i + 1] = float(size)
+            i += 1
+        self.count = i
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        buf = self.levels
+        for i in range(0, 2 * self.count, 2):
+            yield buf[i], buf[i + 1]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return self.levels[2 * index], self.levels[2 * index + 1]
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class ArrayBook:
+    """
+    Order book for a single symbol whose buffers are allocated once and updated in place on every tick.
+    Supports book['bids'], book['asks'], book['symbol'] and book['ts'] so existing code can read it as a dict.
+
+    Args:
+    - symbol (str): The trading pair symbol (e.g., 'XRPUSDT').
+    - depth (int): Maximum number of levels per side.
+    """
+
+    __slots__ = ('symbol', 'ts', 'bids', 'asks')
+
+    def __init__(self, symbol: str, depth: int = 50):
+        self.symbol = symbol
+        self.ts = 0.0
+        self.bids = BookSide(depth)
+        self.asks = BookSide(depth)
+
+    def update(self, bids, asks, ts: float):
+        self.bids.load(bids)
+        self.asks.load(asks)
+        self.ts = ts
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def as_dict(self) -> dict:
+        return {'symbol': self.symbol, 'bids': list(self.bids), 'asks': list(self.asks), 'ts': self.ts}
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
+class Leg:
+    """
+    One leg of a route: orders for a single symbol and side.
+    """
+
+    __slots__ = ('key', 'symbol', 'side', 'orders')
+
+    def __init__(self, key: str, symbol: str, side: str):
+        self.key = key
+        self.symbol = symbol
+        self.side = side
+        self.orders = []
+
+    def reset(self, symbol: str):
+        self.symbol = symbol
+        self.orders.clear()
+
+
+class Opportunity:
+    """
+    Simulated route and, when it is profitable, an arbitrage opportunity.
+    The evaluator keeps one record per route and overwrites it on every tick, so callers that need to keep
+    an opportunity past the current tick should store as_dict().
+
+    Legs are also readable under the old dict keys (opportunity['buy_orders_usdt'] etc.),
+    and repr() gives the same text as the old dicts, so the opportunities file format does not change.
+    """
+
+    __slots__ = ('date', 'pair1', 'pair2', 'direction', 'legs', 'qty_usdt', 'simulated_usdt', 'final_usdt', 'profit')
+
+    def __init__(self, direction: str, legs):
+        self.date = 0.0
+        self.pair1 = None
+        self.pair2 = None
+        self.direction = direction
+        self.legs = legs
+        self.qty_usdt = 100
+        self.simulated_usdt = 0.0
+        self.final_usdt = 0.0
+        self.profit = 0.0
+
+    def __getitem__(self, key):
+        for leg in self.legs:
+            if leg.key == key:
+                return leg.orders
+        if key not in self.__slots__:
+            raise KeyError(key)
+        if key == 'date':
+            return str(datetime.fromtimestamp(self.date))
+        return getattr(self, key)
+
+    def as_dict(self) -> dict:
+        opportunity = {
+            'date': self['date'],
+            'pair1': self.pair1,
+            'pair2': self.pair2,
+            'direction': self.direction,
+        }
+        for leg in self.legs:
+            opportunity[leg.key] = list(leg.orders)
+        opportunity['qty_usdt'] = self.qty_usdt
+        opportunity['final_usdt'] = self.final_usdt
+        opportunity['profit'] = self.profit
+        return opportunity
+
+    def __repr__(self):
+        return repr(self.as_dict())
@@ -0,0 +1,174 @@
+import argparse
+import json
+import time
+
+from utils import vector_calculator
+from utils.calculator import USDC_TO_USDT, IncrementalEvaluator, ROUTES
+from utils.recorder import open_recording
+from utils.records import ArrayBook
+
+# сколько записей за раз переводить из memmap в объекты Python
+CHUNK_SIZE = 65536
+
+
+def recorded_pairs(symbols) -> list:
+    """
+    (USDT pair, USDC pair) of every coin that has both books in the recording.
+    """
+    present = set(symbols)
+    return [(symbol, symbol[:-4] + 'USDC') for symbol in symbols
+            if symbol.endswith('USDT') and symbol != 'USDCUSDT' and symbol[:-4] + 'USDC' in present]
+
+
+class Replay:
+    """
+    Feeds a recorded session through the detector as fast as possible and measures what it would have found.
+
+    An opportunity is counted once per episode: from the tick its route becomes profitable until the tick it stops
+    being profitable. Theoretical PnL is the profit at detection. With fill_latency set, every detected
+    opportunity is also re-simulated on the books as they were fill_latency seconds later, which models the
+    prices actually hit by orders (liquidity taken by our own fills is not removed from the books).
+
+    Args:
+    - path (str): Recording written by BookRecorder.
+    - pairs (list): Pairs to evaluate; all complete USDT/USDC pairs of the recording if None.
+    - engine (str): 'python' for the incremental evaluator, 'numpy' for the batch engine.
+    - fee (float): Taker fee used when instruments are not given.
+    - max_notional (float): Trade size cap; fixed 100 USDT trades if None.
+    - min_notional (float): Smallest trade size worth placing.
+    - instruments (InstrumentCache): Per-symbol steps, minimums and fees.
+    - fill_latency (float): Seconds between detection and the simulated fill; no fills if None.
+    """
+
+    def __init__(self, path: str, pairs=None, engine: str = 'python', fee: float = 0.001, max_notional=None,
+                 min_notional: float = 0, instruments=None, fill_latency: float = None):
+        self.symbols, self.records = open_recording(path)
+        self.pairs = pairs if pairs is not None else recorded_pairs(self.symbols)
+        self.engine = engine
+        self.fee = fee
+        self.max_notional = max_notional
+        self.min_notional = min_notional
+        self.instruments = instruments
+        self.fill_latency = fill_latency
+        self.evaluator = IncrementalEvaluator(self.pairs, fee, max_notional, min_notional, instruments)
+        self.simulations = dict(ROUTES)
+        depth = self.records.dtype['bids'].shape[0]
+        self.books = {symbol: ArrayBook(symbol, depth) for symbol in self.symbols}
+        self.prices = {}
+
+    def detect(self, symbol: str):
+        if self.engine == 'numpy':
+            return vector_calculator.calculate_arbitrage_opportunities(
+                self.prices, self.pairs, fee=self.fee, max_notional=self.max_notional,
+                min_notional=self.min_notional, instruments=self.instruments)
+        return self.evaluator.update(self.prices, {symbol})
+
+    def fill(self, opportunity: dict) -> float:
+        """
+        Re-simulates the route with its detected size on the current books.
+
+        Returns:
+        - float: Realised profit in USDT, or None if a book is missing.
+        """
+        pair1, pair2 = opportunity['pair1'], opportunity['pair2']
+        if opportunity['direction'] == USDC_TO_USDT:
+            # обратный маршрут отдает пары в обратном порядке
+            pair1, pair2 = pair2, pair1
+        route = self.simulations[opportunity['direction']](pair1, pair2, self.prices, self.fee,
+                                                          qty_usdt=opportunity['qty_usdt'],
+                                                          instruments=self.instruments)
+        if route is None:
+            return None
+        return route.simulated_usdt - opportunity['qty_usdt']
+
+    def run(self) -> dict:
+        """
+        Returns:
+        - dict: Report with opportunity and PnL totals and detector throughput.
+        """
+        active = set()
+        pending = []
+        episodes = detections = fills = missed = 0
+        pnl = realized = 0.0
+        detect_time = 0.0
+        started = time.perf_counter()
+
+        for begin in range(0, len(self.records), CHUNK_SIZE):
+            chunk = self.records[begin:begin + CHUNK_SIZE]
+            for ts, index, bid_count, ask_count, bids, asks in zip(
+                    chunk['ts'].tolist(), chunk['symbol'].tolist(), chunk['bid_count'].tolist(),
+                    chunk['ask_count'].tolist(), chunk['bids'].tolist(), chunk['asks'].tolist()):
+                # исполнения видят стаканы такими, какими они были через fill_latency после обнаружения
+                while pending and pending[0][0] < ts:
+                    profit = self.fill(pending.pop(0)[1])
+                    if profit is None:
+                        missed += 1
+                    else:
+                        fills += 1
+                        realized += profit
+
+                symbol = self.symbols[index]
+                book = self.books[symbol]
+                book.update(bids[:bid_count], asks[:ask_count], ts)
+                self.prices[symbol] = book
+
+                tick_start = time.perf_counter()
+                opportunities = self.detect(symbol)
+                detect_time += time.perf_counter() - tick_start
+
+                current = set()
+                for opportunity in opportunities:
+                    key = (opportunity.pair1, opportunity.pair2, opportunity.direction)
+                    current.add(key)
+                    detections += 1
+                    if key in active:
+                        continue
+                    episodes += 1
+                    pnl += opportunity.profit
+                    if self.fill_latency is not None:
+                        pending.append((ts + self.fill_latency, opportunity.as_dict()))
+                active = current
+
+        for _, opportunity in pending:
+            profit = self.fill(opportunity)
+            if profit is None:
+                missed += 1
+            else:
+                fills += 1
+                realized += profit
+
+        elapsed = time.perf_counter() - started
+        count = len(self.records)
+        duration = float(self.records['ts'][-1] - self.records['ts'][0]) if count else 0.0
+        report = {
+            'records': count,
+            'pairs': len(self.pairs),
+            'engine': self.engine,
+            'session_seconds': duration,
+            'elapsed_seconds': elapsed,
+            'speedup': duration / elapsed if elapsed else 0.0,
+            'records_per_second': count / elapsed if elapsed else 0.0,
+            'detector_ticks_per_second': count / detect_time if detect_time else 0.0,
+            'opportunities': episodes,
+            'detections': detections,
+            'theoretical_pnl': pnl,
+        }
+        if self.fill_latency is not None:
+            report.update({'fill_latency': self.fill_latency, 'fills': fills, 'missed_fills': missed,
+                           'realized_pnl': realized})
+        return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a recorded market session through the detector")
+    parser.add_argument('path', help="recording written by BookRecorder (RECORD_FILE in arbitrage_bot.py)")
+    parser.add_argument('--engine', choices=('python', 'numpy'), default='python')
+    parser.add_argument('--fee', type=float, default=0.001)
+    parser.add_argument('--max-notional', type=float, default=None)
+    parser.add_argument('--min-notional', type=float, default=0)
+    parser.add_argument('--fill-latency', type=float, default=None,
+                        help="simulate fills on the books this many seconds after detection")
+    args = parser.parse_args()
+    replay = Replay(args.path, engine=args.engine, fee=args.fee, max_notional=args.max_notional,
+                    min_notional=args.min_notional, fill_latency=args.fill_latency)
+    print(json.dumps(replay.run(), indent=2))
@@ -0,0 +1,397 @@
+"""
+Sharded detection: one feed process keeps the books of every symbol in shared memory, N worker processes
+each evaluate a subset of the pairs on those books, and the bot process (the coordinator) receives their
+candidates and keeps execution, balances and notifications to itself.
+"""
+import asyncio
+import copy
+import logging
+import multiprocessing
+import queue
+import struct
+import time
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing import shared_memory
+
+from utils.calculator import IncrementalEvaluator
+from utils.instruments import InstrumentCache
+from utils.orderbook import PUBLIC_SPOT_URL, OrderBookEngine
+from utils.records import ArrayBook
+
+BOOKS_MAGIC = b'ARBSHM02'
+SYMBOL_SIZE = 16
+# magic, depth, number of symbols, version (растет при каждой записи любого стакана)
+HEADER = struct.Struct('<8sIIQ')
+VERSION_OFFSET = 16
+# seq (нечетный во время записи), ts, bid_count, ask_count, ready (0 - стакан не синхронизирован с биржей)
+SLOT_HEADER = struct.Struct('<QdBBB5x')
+SEQ = struct.Struct('<Q')
+# воркер без новых стаканов проверяет версию сегмента с таким интервалом
+POLL_INTERVAL = 0.001
+STATS_INTERVAL = 1.0
+# возможности, которые ждали в очереди дольше, уже не соответствуют стаканам
+MAX_CANDIDATE_AGE = 1.0
+# стакан без обновлений дольше этого воркер не использует: процесс стрима мог зависнуть или отстать
+MAX_BOOK_AGE = 10.0
+
+
+class SharedBooks:
+    """
+    Top levels of a fixed set of books in one shared memory segment, written by a single process and read
+    by any number of others. Every slot has its own sequence number, bumped before and after a write
+    (odd while writing) like the status file, so a reader never uses a half-written book; the segment
+    version tells readers that some book changed without scanning the slots. A book that fell out of sync
+    (sequence gap, disconnect) is published as not ready with no levels until its next snapshot.
+
+    Args:
+    - symbols (list): Symbol table of a new segment; it cannot change while the segment exists.
+    - depth (int): Levels stored per side.
+    - name (str): Name of an existing segment to attach to instead of creating one.
+    """
+
+    def __init__(self, symbols=None, depth: int = 3, name: str = None):
+        if name is None:
+            self.symbols = list(symbols)
+            self.depth = depth
+            self.shm = shared_memory.SharedMemory(create=True, size=self._size(len(self.symbols), depth))
+            HEADER.pack_into(self.shm.buf, 0, BOOKS_MAGIC, depth, len(self.symbols), 0)
+            for i, symbol in enumerate(self.symbols):
+                start = HEADER.size + i * SYMBOL_SIZE
+                self.shm.buf[start:start + SYMBOL_SIZE] = symbol.encode().ljust(SYMBOL_SIZE, b'\0')
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            magic, self.depth, count, _ = HEADER.unpack_from(self.shm.buf)
+            if magic != BOOKS_MAGIC:
+                raise ValueError(f"{name} is not a shared books segment")
+            self.symbols = [bytes(self.shm.buf[HEADER.size + i * SYMBOL_SIZE:HEADER.size + (i + 1) * SYMBOL_SIZE])
+                            .rstrip(b'\0').decode() for i in range(count)]
+            self.owner = False
+        self.name = self.shm.name
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.levels = struct.Struct(f'<{4 * self.depth}d')
+        self.offset = HEADER.size + SYMBOL_SIZE * len(self.symbols)
+        self.slot_size = SLOT_HEADER.size + self.levels.size
+        self.version = 0
+        self._seqs = [0] * len(self.symbols)
+        self._empty = [0.0] * (2 * self.depth)
+
+    @staticmethod
+    def _size(count: int, depth: int) -> int:
+        return HEADER.size + SYMBOL_SIZE * count + count * (SLOT_HEADER.size + 32 * depth)
+
+    def _side(self, levels):
+        values = [value for level in list(levels)[:self.depth] for value in level]
+        return values + self._empty[len(values):]
+
+    def write(self, book, ready: bool = True):
+        """
+        Publishes the current state of a book (ArrayBook or a dict with 'symbol', 'ts', 'bids' and 'asks').
+        Symbols outside the symbol table are ignored.
+
+        Args:
+        - ready (bool): False publishes the book as out of sync: readers drop it, ts keeps the last update time.
+        """
+        index = self.index.get(book['symbol'])
+        if index is None:
+            return
+        bids = book['bids'] if ready else ()
+        asks = book['asks'] if ready else ()
+        buf = self.shm.buf
+        offset = self.offset + index * self.slot_size
+        seq = self._seqs[index]
+        SEQ.pack_into(buf, offset, seq + 1)
+        SLOT_HEADER.pack_into(buf, offset, seq + 1, book['ts'], min(len(bids), self.depth), min(len(asks), self.depth),
+                              ready)
+        self.levels.pack_into(buf, offset + SLOT_HEADER.size, *self._side(bids), *self._side(asks))
+        self._seqs[index] = seq + 2
+        SEQ.pack_into(buf, offset, seq + 2)
+        self.version += 1
+        SEQ.pack_into(buf, VERSION_OFFSET, self.version)
+
+    def current_version(self) -> int:
+        return SEQ.unpack_from(self.shm.buf, VERSION_OFFSET)[0]
+
+    def seq(self, symbol: str) -> int:
+        return SEQ.unpack_from(self.shm.buf, self.offset + self.index[symbol] * self.slot_size)[0]
+
+    def read(self, symbol: str, book: ArrayBook, retries: int = 100):
+        """
+        Copies a book from the segment into an ArrayBook.
+
+        Returns:
+        - tuple: (seq, ready) - sequence number of the copied state (0 if the book was never written, None if
+          every attempt overlapped a write) and whether the book is in sync with the exchange.
+        """
+        buf = self.shm.buf
+        offset = self.offset + self.index[symbol] * self.slot_size
+        depth = self.depth
+        for _ in range(retries):
+            seq, ts, bid_count, ask_count, ready = SLOT_HEADER.unpack_from(buf, offset)
+            if seq % 2:
+                continue
+            values = self.levels.unpack_from(buf, offset + SLOT_HEADER.size)
+            # номер изменился - прочитали половину старой записи
+            if SEQ.unpack_from(buf, offset)[0] != seq:
+                continue
+            if seq:
+                book.update(zip(values[0:2 * bid_count:2], values[1:2 * bid_count:2]),
+                            zip(values[2 * depth:2 * (depth + ask_count):2], values[2 * depth + 1:2 * (depth + ask_count):2]),
+                            ts)
+            return seq, bool(ready)
+        return None, False
+
+    def timestamps(self) -> dict:
+        """
+        Time of the last update of every book that was written at least once.
+        """
+        buf = self.shm.buf
+        result = {}
+        for symbol, index in self.index.items():
+            seq, ts, _, _, _ = SLOT_HEADER.unpack_from(buf, self.offset + index * self.slot_size)
+            if seq:
+                result[symbol] = ts
+        return result
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def shard_pairs(pairs, shards: int) -> list:
+    """
+    Splits pairs round-robin into at most shards non-empty lists of similar size.
+    """
+    return [chunk for chunk in (list(pairs)[i::shards] for i in range(shards)) if chunk]
+
+
+def _child_logging(log_queue):
+    # записи дочерних процессов уходят в очередь, файлом лога владеет только координатор
+    logger = logging.getLogger()
+    logger.handlers[:] = [QueueHandler(log_queue)]
+    logger.setLevel(logging.INFO)
+
+
+def run_feed(name: str, url: str, log_queue):
+    """
+    Feed process: keeps every book of the segment in sync from the public stream and publishes each update.
+    """
+    _child_logging(log_queue)
+
+    async def feed():
+        books = SharedBooks(name=name)
+        engine = OrderBookEngine(books.symbols, url, levels=books.depth)
+        engine.listeners.append(lambda book: books.write(book.view()))
+        # после разрыва или обрыва связи воркеры не должны считать по последним уровням
+        engine.reset_listeners.append(lambda book: books.write(book.view(), ready=False))
+        try:
+            await engine.run()
+        finally:
+            books.close()
+
+    try:
+        asyncio.run(feed())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_worker(shard: int, name: str, pairs, results, stop, max_notional, min_notional: float, log_queue,
+               max_book_age: float = MAX_BOOK_AGE):
+    """
+    Worker process: evaluates the routes of its pairs on the shared books and reports candidates and
+    per-cycle calculation times to the coordinator. Books that are out of sync or older than max_book_age
+    seconds take no part in the calculation.
+    """
+    _child_logging(log_queue)
+    books = SharedBooks(name=name)
+    # правила инструментов читаются из файла, который координатор обновил перед запуском воркеров
+    instruments = InstrumentCache(None)
+    instruments.load()
+    evaluator = IncrementalEvaluator(pairs, max_notional=max_notional.value, min_notional=min_notional,
+                                     instruments=instruments)
+    symbols = [symbol for pair in pairs for symbol in pair] + ['USDCUSDT']
+    views = {symbol: ArrayBook(symbol, books.depth) for symbol in symbols}
+    seen = dict.fromkeys(symbols, 0)
+    prices = {}
+    expired = set()
+    version = None
+    timings = []
+    last_stats = time.monotonic()
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            if now - last_stats >= STATS_INTERVAL:
+                results.put(('stats', shard, timings))
+                timings = []
+                last_stats = now
+                if instruments.is_stale():
+                    loaded = instruments.updated_at
+                    instruments.load()
+                    # координатор еще не обновил файл: правила те же, полный пересчет маршрутов не нужен
+                    if instruments.updated_at != loaded:
+                        evaluator.invalidate()
+                # зависший стрим не меняет версию сегмента, поэтому возраст проверяется и без новых записей;
+                # ts - время биржи, граница выбрана с запасом на расхождение часов
+                expired = {symbol for symbol, book in prices.items() if time.time() - book.ts > max_book_age}
+                for symbol in expired:
+                    del prices[symbol]
+
+            current = books.current_version()
+            if current == version and not expired:
+                time.sleep(POLL_INTERVAL)
+                continue
+            version = current
+
+            changed = expired
+            expired = set()
+            for symbol in symbols:
+                if books.seq(symbol) != seen[symbol]:
+                    seq, ready = books.read(symbol, views[symbol])
+                    if seq:
+                        seen[symbol] = seq
+                        if ready:
+                            prices[symbol] = views[symbol]
+                        else:
+                            prices.pop(symbol, None)
+                        changed.add(symbol)
+            if not changed:
+                continue
+
+            if max_notional.value != evaluator.max_notional:
+                evaluator.set_max_notional(max_notional.value)
+            start = time.perf_counter()
+            opportunities = evaluator.update(prices, changed)
+            timings.append(time.perf_counter() - start)
+            if opportunities:
+                # записи маршрутов переиспользуются на следующем тике, а очередь сериализует их в другом потоке
+                results.put(('opportunities', shard, [copy.deepcopy(opportunity) for opportunity in opportunities]))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        books.close()
+
+
+class _ForwardHandler(logging.Handler):
+    """
+    Passes records of the child processes to the coordinator's loggers.
+    """
+
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+
+class ShardedDetector:
+    """
+    Coordinator side of sharded detection: owns the shared books segment and starts the feed and worker processes.
+
+    Args:
+    - pairs (list): (USDT pair, USDC pair) tuples; every worker gets a round-robin share, USDCUSDT is shared by all.
+    - shards (int): Number of worker processes.
+    - url (str): Public stream endpoint for the feed process.
+    - max_notional (float): Trade size cap passed to the workers; change it with set_max_notional().
+    - min_notional (float): Smallest trade size worth placing.
+    - levels (int): Levels per side kept in shared memory.
+    - metrics (Metrics): Receives the calc times and cycle counts reported by the workers.
+    - max_age (float): Candidates that waited in the queue longer than this many seconds are dropped.
+    - max_book_age (float): Workers ignore books not updated for this many seconds.
+    """
+
+    def __init__(self, pairs, shards: int, url: str = PUBLIC_SPOT_URL, max_notional: float = 100,
+                 min_notional: float = 0, levels: int = 3, metrics=None, max_age: float = MAX_CANDIDATE_AGE,
+                 max_book_age: float = MAX_BOOK_AGE):
+        self.pairs = list(pairs)
+        self.shards = shard_pairs(self.pairs, shards)
+        self.url = url
+        self.min_notional = min_notional
+        self.metrics = metrics
+        self.max_age = max_age
+        self.max_book_age = max_book_age
+        self.books = SharedBooks([symbol for pair in self.pairs for symbol in pair] + ['USDCUSDT'], levels)
+        # spawn: дочерние процессы не наследуют цикл событий, сокеты и сессию pybit координатора
+        self.context = multiprocessing.get_context('spawn')
+        self.results = self.context.Queue()
+        self.logs = self.context.Queue()
+        self.stop_event = self.context.Event()
+        self.max_notional = self.context.Value('d', max_notional, lock=False)
+        self.processes = []
+        self._log_listener = None
+
+    def start(self):
+        self._log_listener = QueueListener(self.logs, _ForwardHandler())
+        self._log_listener.start()
+        feed = self.context.Process(target=run_feed, args=(self.books.name, self.url, self.logs),
+                                    name='arbitrage-feed', daemon=True)
+        self.processes.append(feed)
+        for shard, pairs in enumerate(self.shards):
+            self.processes.append(self.context.Process(
+                target=run_worker, name=f'arbitrage-worker-{shard}', daemon=True,
+                args=(shard, self.books.name, pairs, self.results, self.stop_event, self.max_notional,
+                      self.min_notional, self.logs, self.max_book_age)))
+        for process in self.processes:
+            process.start()
+        logging.info(f"Started feed and {len(self.shards)} detection workers for {len(self.pairs)} pairs")
+
+    def set_max_notional(self, value: float):
+        self.max_notional.value = value
+
+    def staleness(self) -> float:
+        """
+        Age in seconds of the oldest book in shared memory.
+        """
+        timestamps = self.books.timestamps()
+        return time.time() - min(timestamps.values()) if timestamps else 0.0
+
+    def _get(self, timeout: float):
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _handle(self, message, opportunities: list):
+        kind, shard, payload = message
+        if kind == 'stats':
+            if self.metrics is not None:
+                self.metrics.increment('cycles', len(payload))
+                for seconds in payload:
+                    self.metrics.observe('calc', seconds)
+            return
+        now = time.time()
+        for opportunity in payload:
+            if now - opportunity.date > self.max_age:
+                logging.info(f"Dropped a stale candidate from shard {shard}: {opportunity.pair1} {opportunity.direction}")
+                continue
+            opportunities.append(opportunity)
+
+    async def next(self, timeout: float = 5):
+        """
+        Waits for the next message of any worker and drains whatever else is already queued.
+
+        Returns:
+        - list: Fresh candidate opportunities (possibly empty after a stats message), or None on timeout.
+        """
+        message = await asyncio.get_event_loop().run_in_executor(None, self._get, timeout)
+        if message is None:
+            return None
+        opportunities = []
+        self._handle(message, opportunities)
+        while True:
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self._handle(message, opportunities)
+        return opportunities
+
+    def stop(self, timeout: float = 5):
+        self.stop_event.set()
+        for process in self.processes[1:]:
+            process.join(timeout)
+        # процесс стрима ждет сеть, его проще завершить сигналом
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout)
+        if self._log_listener is not None:
+            self._log_listener.stop()
+        self.books.close()
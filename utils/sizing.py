@@ -0,0 +1,71 @@
+def usdt_to_usdc_legs(usdt_asks, usdc_bids, usdc_to_usdt_bids, fee=0.001):
+    """
+    Levels of the USDT -> coin -> USDC -> USDT route as (rate, capacity) pairs,
+    where rate converts the leg input into its output and capacity is measured in the leg input.
+    """
+    return [
+        [((1 - fee) / price, price * volume) for price, volume in usdt_asks],
+        [(price, volume) for price, volume in usdc_bids],
+        [(price, volume) for price, volume in usdc_to_usdt_bids],
+    ]
+
+
+def usdc_to_usdt_legs(usdt_to_usdc_asks, usdc_asks, usdt_bids, fee=0.001):
+    """
+    Levels of the USDT -> USDC -> coin -> USDT route as (rate, capacity) pairs.
+    """
+    return [
+        [(1 / price, price * volume) for price, volume in usdt_to_usdc_asks],
+        [(1 / price, price * volume) for price, volume in usdc_asks],
+        [(price * (1 - fee), volume) for price, volume in usdt_bids],
+    ]
+
+
+def solve_trade_size(legs, max_notional: float):
+    """
+    Finds the route input that maximises profit.
+
+    Output of the route is a piecewise-linear function of the input: on every segment between level boundaries
+    the marginal rate is the product of the current level rates of all legs. Rates only get worse deeper in
+    the books, so the profit grows while the marginal rate is above 1. The books are walked once, jumping from
+    one level boundary to the next, instead of re-simulating trial sizes.
+
+    Args:
+    - legs (list): Levels of every leg as returned by usdt_to_usdc_legs / usdc_to_usdt_legs.
+    - max_notional (float): Upper bound for the input (max trade size, wallet balance).
+
+    Returns:
+    - tuple: (notional, profit) - the best input and the profit it gives before order rounding.
+    """
+    if not all(legs):
+        return 0.0, 0.0
+
+    index = [0] * len(legs)
+    left = [leg[0][1] for leg in legs]
+    notional = 0.0
+    profit = 0.0
+
+    while notional < max_notional:
+        # сколько входа нужно, чтобы исчерпать текущий уровень каждой ноги
+        rate = 1.0
+        step = max_notional - notional
+        for k, leg in enumerate(legs):
+            step = min(step, left[k] / rate)
+            rate *= leg[index[k]][0]
+        if rate <= 1:
+            break
+
+        notional += step
+        profit += step * (rate - 1)
+
+        rate = 1.0
+        for k, leg in enumerate(legs):
+            left[k] -= step * rate
+            rate *= leg[index[k]][0]
+            if left[k] <= 1e-9 * leg[index[k]][1]:
+                index[k] += 1
+                if index[k] == len(leg):
+                    return notional, profit
+                left[k] = leg[index[k]][1]
+
+    return notional, profit
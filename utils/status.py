@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+
+STATUS_FILE = "logs/arbitrage_bot.status"
+HEARTBEAT_INTERVAL = 1.0
+# цикл событий не обновлял heartbeat дольше - значит, он заблокирован
+HEARTBEAT_TIMEOUT = 10
+# главный цикл не завершал итерацию дольше (с учетом ожидания исполнения ордеров)
+CYCLE_TIMEOUT = 120
+
+MAGIC = b'ARBS'
+# magic, seq, pid, started_at, heartbeat, last_cycle_at, cycle_latency, book_staleness, error_at,
+# cycles, open_orders, last_error
+STATUS_STRUCT = struct.Struct('<4sIIddddddqq256s')
+SEQ_OFFSET = 4
+FIELDS = ('pid', 'started_at', 'heartbeat', 'last_cycle_at', 'cycle_latency', 'book_staleness', 'error_at',
+          'cycles', 'open_orders', 'last_error')
+
+
+class StatusBoard:
+    """
+    Live status of the bot in a small memory-mapped file that other processes can read in microseconds
+    instead of spawning ps. The writer bumps a sequence number before and after every update (odd while writing),
+    so readers can detect and retry a torn read.
+
+    Args:
+    - path (str): Status file.
+    """
+
+    def __init__(self, path: str = STATUS_FILE):
+        self.path = path
+        self.fields = {
+            'pid': os.getpid(), 'started_at': time.time(), 'heartbeat': time.time(), 'last_cycle_at': 0.0,
+            'cycle_latency': 0.0, 'book_staleness': 0.0, 'error_at': 0.0, 'cycles': 0, 'open_orders': 0,
+            'last_error': '',
+        }
+        self.seq = 0
+        with open(path, 'wb') as file:
+            file.write(bytes(STATUS_STRUCT.size))
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), STATUS_STRUCT.size)
+        self._write()
+
+    def _write(self):
+        fields = self.fields
+        struct.pack_into('<I', self._map, SEQ_OFFSET, self.seq + 1)
+        STATUS_STRUCT.pack_into(
+            self._map, 0, MAGIC, self.seq + 1, fields['pid'], fields['started_at'], fields['heartbeat'],
+            fields['last_cycle_at'], fields['cycle_latency'], fields['book_staleness'], fields['error_at'],
+            fields['cycles'], fields['open_orders'], fields['last_error'].encode())
+        self.seq += 2
+        struct.pack_into('<I', self._map, SEQ_OFFSET, self.seq)
+
+    def update(self, **fields):
+        self.fields.update(fields)
+        self._write()
+
+    def beat(self):
+        self.update(heartbeat=time.time())
+
+    async def run(self, interval: float = HEARTBEAT_INTERVAL):
+        """
+        Beats from the event loop: if the loop gets blocked, the heartbeat stops and readers see the bot as wedged.
+        """
+        while True:
+            self.beat()
+            await asyncio.sleep(interval)
+
+    def cycle(self, latency: float, book_staleness: float, open_orders: int):
+        """
+        Records a finished iteration of the main loop.
+        """
+        self.update(last_cycle_at=time.time(), cycle_latency=latency, book_staleness=book_staleness,
+                    open_orders=open_orders, cycles=self.fields['cycles'] + 1)
+
+    def error(self, message: str):
+        self.update(last_error=message, error_at=time.time())
+
+    def close(self):
+        # pid 0 - бот завершился штатно
+        self.update(pid=0)
+        self._map.close()
+        self._file.close()
+
+
+class StatusErrorHandler(logging.Handler):
+    """
+    Publishes every ERROR record as the last error of the status board.
+    """
+
+    def __init__(self, board: StatusBoard):
+        super().__init__(logging.ERROR)
+        self.board = board
+
+    def emit(self, record):
+        try:
+            self.board.error(record.getMessage())
+        except Exception:
+            self.handleError(record)
+
+
+def read_status(path: str = STATUS_FILE, retries: int = 10):
+    """
+    Reads the status file.
+
+    Returns:
+    - dict: The published fields, or None if there is no status file.
+    """
+    try:
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), STATUS_STRUCT.size, access=mmap.ACCESS_READ) as view:
+            for _ in range(retries):
+                values = STATUS_STRUCT.unpack_from(view)
+                seq = struct.unpack_from('<I', view, SEQ_OFFSET)[0]
+                # нечетный номер - запись в процессе, изменившийся - прочитали половину старой записи
+                if values[1] % 2 == 0 and values[1] == seq:
+                    break
+            else:
+                return None
+    except (FileNotFoundError, ValueError):
+        return None
+    if values[0] != MAGIC:
+        return None
+    status = dict(zip(FIELDS, values[2:]))
+    status['last_error'] = status['last_error'].rstrip(b'\0').decode(errors='replace')
+    return status
+
+
+def pid_alive(pid: int) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def bot_state(status) -> str:
+    """
+    Returns:
+    - str: 'stopped' if there is no live bot process, 'wedged' if it is alive but its event loop or main loop
+      stopped making progress, 'running' otherwise.
+    """
+    if status is None or not pid_alive(status['pid']):
+        return 'stopped'
+    now = time.time()
+    last_progress = status['last_cycle_at'] or status['started_at']
+    if now - status['heartbeat'] > HEARTBEAT_TIMEOUT or now - last_progress > CYCLE_TIMEOUT:
+        return 'wedged'
+    return 'running'
@@ -0,0 +1,96 @@
+import random
+import time
+
+from utils.records import ArrayBook
+
+
+def synthetic_pairs(count: int) -> list:
+    """
+    (USDT pair, USDC pair) for count made-up coins: [('C0USDT', 'C0USDC'), ...].
+    """
+    return [(f"C{i}USDT", f"C{i}USDC") for i in range(count)]
+
+
+def synthetic_levels(mid: float, depth: int, rng, spread: float = 0.0005):
+    """
+    Bids and asks around mid price, best level first, with random sizes.
+    """
+    tick = mid * spread
+    bids = [(mid - tick * (k + 1), rng.uniform(10, 1000)) for k in range(depth)]
+    asks = [(mid + tick * (k + 1), rng.uniform(10, 1000)) for k in range(depth)]
+    return bids, asks
+
+
+class SyntheticMarket:
+    """
+    Random-walk books for a set of pairs plus USDCUSDT. The USDC book of every coin is quoted around the same
+    mid as its USDT book with some noise, so a share of ticks crosses and gives arbitrage opportunities.
+
+    Args:
+    - pairs (list): (USDT pair, USDC pair) tuples.
+    - depth (int): Levels per side.
+    - seed (int): Seed of the random generator, so runs are comparable.
+    - noise (float): Relative noise between the USDT and USDC books of a coin.
+    """
+
+    def __init__(self, pairs, depth: int = 3, seed: int = 0, noise: float = 0.002):
+        self.pairs = list(pairs)
+        self.depth = depth
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.mids = {}
+        self.symbols = []
+        self.books = {}
+        for symbol in [symbol for pair in self.pairs for symbol in pair] + ['USDCUSDT']:
+            self.add(symbol)
+
+    def add(self, symbol: str) -> ArrayBook:
+        """
+        Starts quoting a symbol (e.g., 'XRPUSDT') if it is not quoted yet.
+        """
+        if symbol not in self.books:
+            if symbol != 'USDCUSDT':
+                self.mids.setdefault(symbol[:-4], self.rng.uniform(0.1, 100))
+            self.symbols.append(symbol)
+            self.books[symbol] = ArrayBook(symbol, self.depth)
+            self.tick(symbol)
+        return self.books[symbol]
+
+    def tick(self, symbol: str = None) -> ArrayBook:
+        """
+        Moves one book (a random one if not given) and returns it.
+        """
+        if symbol is None:
+            symbol = self.rng.choice(self.symbols)
+        if symbol == 'USDCUSDT':
+            mid = 1 + self.rng.gauss(0, 0.0001)
+            bids, asks = synthetic_levels(mid, self.depth, self.rng, spread=0.0001)
+        else:
+            coin = symbol[:-4]
+            self.mids[coin] *= 1 + self.rng.gauss(0, 0.0005)
+            mid = self.mids[coin] * (1 + self.rng.gauss(0, self.noise))
+            bids, asks = synthetic_levels(mid, self.depth, self.rng)
+        book = self.books[symbol]
+        book.update(bids, asks, time.time())
+        return book
+
+    def prices(self) -> dict:
+        return dict(self.books)
+
+
+def orderbook_payload(book) -> dict:
+    """
+    Body of a Bybit /v5/market/orderbook response for a book, with prices and sizes as strings like the API sends.
+    """
+    return {
+        'retCode': 0,
+        'retMsg': 'OK',
+        'result': {
+            's': book['symbol'],
+            'b': [[f"{price:.8g}", f"{size:.8g}"] for price, size in book['bids']],
+            'a': [[f"{price:.8g}", f"{size:.8g}"] for price, size in book['asks']],
+            'ts': int(book['ts'] * 1000),
+            'u': 1,
+        },
+        'time': int(time.time() * 1000),
+    }
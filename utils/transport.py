@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from utils.metrics import Metrics
+from utils.rate_limit import RateLimitedAdapter
+
+# соединений в пуле сессии pybit: с запасом на параллельные batch-запросы и опрос ордеров одной сделки
+POOL_SIZE = 10
+# столько соединений открывается заранее, чтобы первая сделка не платила за TCP и TLS handshake
+WARM_CONNECTIONS = 4
+# Bybit закрывает простаивающие keep-alive соединения; пул обновляется раньше, чем это случится
+KEEPALIVE_INTERVAL = 25
+WARM_PATH = '/v5/market/time'
+READ_RETRIES = 3
+RETRY_BASE = 0.05
+RETRY_CAP = 1.0
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# обрыв соединения или таймаут: неизвестно, дошел ли запрос до биржи
+TRANSIENT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+def backoff(attempt: int, base: float = RETRY_BASE, cap: float = RETRY_CAP) -> float:
+    """
+    Exponential backoff with full jitter: a random delay up to base * 2 ** attempt, so retries of many
+    requests broken by the same disconnect do not hit the exchange at the same moment.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def new_order_link_id(prefix: str = 'arb') -> str:
+    """
+    Client order id (at most 36 characters); a retried order keeps it, so the exchange rejects the copy
+    instead of placing a second order.
+    """
+    return f"{prefix}-{uuid.uuid4().hex}"
+
+
+class RetryingAdapter(RateLimitedAdapter):
+    """
+    Rate-limited transport adapter with a keep-alive connection pool that retries idempotent requests after
+    a dropped connection or a timeout. Orders (POST) are never retried here: they are retried by the caller
+    with the same orderLinkId.
+
+    Args:
+    - limiter (RateLimiter): Shared REST budget.
+    - pool_size (int): Keep-alive connections kept per host.
+    - retries (int): Retries of an idempotent request.
+    - metrics (Metrics): Receives the 'retries' count.
+    """
+
+    def __init__(self, limiter, pool_size: int = POOL_SIZE, retries: int = READ_RETRIES, metrics=None):
+        self.retries = retries
+        self.metrics = metrics if metrics is not None else Metrics()
+        super().__init__(limiter, pool_maxsize=pool_size)
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return super().send(request, **kwargs)
+            except TRANSIENT_ERRORS as e:
+                if request.method not in IDEMPOTENT_METHODS or attempt >= self.retries:
+                    raise
+                delay = backoff(attempt)
+                attempt += 1
+                self.metrics.increment('retries')
+                logging.warning(f"{request.method} {request.path_url} failed: {e}, retry {attempt} in {delay:.3f}s")
+                time.sleep(delay)
+
+
+class ConnectionPool:
+    """
+    Keep-alive connections of a pybit HTTP session: installs the RetryingAdapter, opens connections in advance
+    and refreshes them before the exchange closes them as idle.
+
+    Args:
+    - session: pybit HTTP session.
+    - limiter (RateLimiter): Shared REST budget.
+    - pool_size (int): Keep-alive connections kept per host.
+    - warm (int): Connections opened in advance and kept alive.
+    - metrics (Metrics): Receives the 'retries' count.
+    """
+
+    def __init__(self, session, limiter, pool_size: int = POOL_SIZE, warm: int = WARM_CONNECTIONS, metrics=None):
+        self.session = session
+        self.warm_connections = min(warm, pool_size)
+        self.adapter = RetryingAdapter(limiter, pool_size, metrics=metrics)
+        session.client.mount('https://', self.adapter)
+        session.client.mount('http://', self.adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.warm_connections))
+
+    def ping(self):
+        self.session.client.get(f"{self.session.endpoint}{WARM_PATH}", timeout=self.session.timeout)
+
+    def warm(self) -> int:
+        """
+        Sends warm requests at the same time, so each of them opens (or keeps alive) its own connection;
+        the connections go back to the pool afterwards.
+
+        Returns:
+        - int: Number of connections that answered.
+        """
+        futures = [self._executor.submit(self.ping) for _ in range(self.warm_connections)]
+        alive = 0
+        for future in futures:
+            try:
+                future.result()
+                alive += 1
+            except Exception as e:
+                logging.error(f"Failed to warm up a connection: {e}")
+        return alive
+
+    async def run(self, interval: float = KEEPALIVE_INTERVAL):
+        """
+        Refreshes the pooled connections every interval seconds without blocking the event loop.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(interval)
+            await loop.run_in_executor(None, self.warm)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
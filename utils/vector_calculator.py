@@ -0,0 +1,381 @@
+import logging
+import time
+
+import numpy as np
+
+from utils.calculator import (USDC_TO_USDT, USDT_TO_USDC, is_profitable, make_opportunity, new_route, rounding,
+                              rounding_price)
+from utils.instruments import DEFAULT_QTY_DEGREE, steps, taker_fee
+from utils.records import BookSide
+
+# относительный остаток уровня, ниже которого уровень считается исчерпанным, как в sizing.solve_trade_size
+EXHAUSTED = 1e-9
+
+
+def floor_to(values, degree=DEFAULT_QTY_DEGREE):
+    """
+    Same as rounding(), element-wise: the largest whole number of steps not above the value.
+    degree may be an array with one degree per pair.
+    """
+    steps_count = np.floor(values * degree)
+    steps_count += (steps_count + 1) / degree <= values
+    steps_count -= steps_count / degree > values
+    return steps_count / degree
+
+
+def has_step(values, degree=DEFAULT_QTY_DEGREE):
+    # rounding(value, degree) > 0 ровно тогда, когда в значение помещается хотя бы один шаг
+    return values >= 1 / degree
+
+
+def pack_side(books, side, depth=None, pad_price=1.0):
+    """
+    Packs one side of several books into a (len(books), depth, 2) array of (price, volume).
+    Missing levels are padded with zero volume, so they never change the simulation.
+
+    Args:
+    - books (list): Book dicts as returned by fetch_ticker_info.
+    - side (str): 'bids' or 'asks'.
+    - depth (int): Most levels to keep; by default as many as the deepest of the books has.
+    - pad_price (float): Price for padded levels; must be non-zero because asks are divided by price.
+
+    Returns:
+    - tuple: (packed levels, number of real levels per book)
+    """
+    sides = [book[side] for book in books]
+    counts = np.fromiter(map(len, sides), dtype=np.intp, count=len(sides))
+    if depth is not None:
+        np.minimum(counts, depth, out=counts)
+    width = int(counts.max(initial=0))
+    storage = {levels.depth if isinstance(levels, BookSide) else -1 for levels in sides}
+    if len(storage) == 1 and width <= next(iter(storage)):
+        # у всех стаканов ArrayBook одного размера: буферы склеиваются одной копией без разбора на кортежи
+        packed = np.frombuffer(b''.join([levels.levels for levels in sides])).reshape(len(sides), -1, 2)[:, :width]
+        packed = packed.copy()
+        padded = np.arange(width) >= counts[:, None]
+        packed[padded] = (pad_price, 0.0)
+        return packed, counts
+
+    packed = np.zeros((len(books), width, 2))
+    packed[:, :, 0] = pad_price
+    for i, levels in enumerate(sides):
+        if counts[i]:
+            packed[i, :counts[i]] = levels[:counts[i]]
+    return packed, counts
+
+
+def fill_leg(leg, symbol, book, row, mask, trade_volume, instruments=None):
+    qty_degree, price_decimals = steps(instruments, symbol)
+    leg.reset(symbol)
+    levels = np.flatnonzero(mask[row])
+    leg.orders.extend((rounding_price(price, price_decimals), rounding(volume, qty_degree))
+                      for price, volume in zip(book[row, levels, 0].tolist(), trade_volume[row, levels].tolist()))
+
+
+def pair_steps(instruments, symbols):
+    """
+    Returns:
+    - np.ndarray: Quantity degree of every symbol.
+    """
+    return np.array([steps(instruments, symbol)[0] for symbol in symbols], dtype=float)
+
+
+def solve_trade_sizes(legs, counts, max_notional: float):
+    """
+    Vectorised sizing.solve_trade_size for all pairs at once: the same walk over level boundaries with
+    the same float operations, one iteration per boundary for every pair still walking.
+
+    Args:
+    - legs (list): (rates, capacities) arrays of shape (pairs, levels) for every leg of the route.
+    - counts (list): Number of real levels of every leg, per pair.
+    - max_notional (float): Upper bound for the input.
+
+    Returns:
+    - np.ndarray: The best input per pair, before order rounding.
+    """
+    pairs = legs[0][0].shape[0]
+    if any(capacities.shape[1] == 0 for _, capacities in legs):
+        return np.zeros(pairs)
+    rows = np.arange(pairs)
+    index = [np.zeros(pairs, dtype=np.intp) for _ in legs]
+    left = [capacities[:, 0].copy() for _, capacities in legs]
+    notional = np.zeros(pairs)
+    # маршрут с пустой ногой не торгуется
+    walking = np.logical_and.reduce([count > 0 for count in counts])
+
+    while True:
+        walking &= notional < max_notional
+        if not walking.any():
+            break
+        rate = np.ones(pairs)
+        step = max_notional - notional
+        level_rates = []
+        for k, (rates, _) in enumerate(legs):
+            step = np.minimum(step, left[k] / rate)
+            level_rates.append(rates[rows, index[k]])
+            rate = rate * level_rates[k]
+        walking &= rate > 1
+        step = np.where(walking, step, 0.0)
+        notional = notional + step
+
+        rate = np.ones(pairs)
+        for k, (_, capacities) in enumerate(legs):
+            left[k] = left[k] - step * rate
+            rate = rate * level_rates[k]
+            exhausted = walking & (left[k] <= EXHAUSTED * capacities[rows, index[k]])
+            index[k] = index[k] + exhausted
+            # книга этой ноги кончилась - дальше идти некуда
+            walking &= index[k] < counts[k]
+            index[k] = np.minimum(index[k], capacities.shape[1] - 1)
+            left[k] = np.where(exhausted, capacities[rows, index[k]], left[k])
+
+    return notional
+
+
+def trade_sizes(legs, counts, max_notional, min_notional):
+    """
+    calculator.trade_size for all pairs of one direction.
+    """
+    if max_notional is None:
+        return np.full(legs[0][0].shape[0], 100.0)
+    return np.maximum(floor_to(solve_trade_sizes(legs, counts, max_notional)), min_notional)
+
+
+def simulate_usdt_to_usdc_batch(usdt_asks, usdc_bids, usdc_to_usdt_bids, qty_usdt, fee, degrees):
+    """
+    Batched version of calculator.simulate_usdt_to_usdc for all pairs at once. Levels are walked one by one,
+    as in the reference loop, with every pair advanced together; a pair stops where the reference breaks.
+
+    Args:
+    - usdt_asks (np.ndarray): (pairs, levels, 2) asks of the coin/USDT books.
+    - usdc_bids (np.ndarray): (pairs, levels, 2) bids of the coin/USDC books.
+    - usdc_to_usdt_bids (np.ndarray): (levels, 2) bids of the USDCUSDT book.
+    - qty_usdt (np.ndarray): Trade size in USDT per pair.
+    - fee (np.ndarray): Fee of the USDT pair, per pair.
+    - degrees (tuple): Quantity degrees of the USDT pairs and the USDC pairs (arrays per pair) and of USDCUSDT.
+
+    Returns:
+    - tuple: final_usdt per pair and the (taken levels mask, trade volume) arrays needed to rebuild the orders.
+    """
+    pairs = len(qty_usdt)
+    qty1, qty2, qtyc = degrees
+    buy_taken = np.zeros(usdt_asks.shape[:2], dtype=bool)
+    buy_volume = np.zeros(usdt_asks.shape[:2])
+    sell_taken = np.zeros(usdc_bids.shape[:2], dtype=bool)
+    sell_volume = np.zeros(usdc_bids.shape[:2])
+    convert_taken = np.zeros((pairs, len(usdc_to_usdt_bids)), dtype=bool)
+    convert_volume = np.zeros(convert_taken.shape)
+
+    # ШАГ1. Покупка монет за USDT
+    coins_buyed = np.zeros(pairs)
+    walking = np.ones(pairs, dtype=bool)
+    for j in range(usdt_asks.shape[1]):
+        walking &= has_step(qty_usdt)
+        if not walking.any():
+            break
+        prices, volumes = usdt_asks[:, j, 0], usdt_asks[:, j, 1]
+        trade_volume = np.where(walking, np.minimum(qty_usdt / prices, volumes), 0.0)
+        qty_usdt = qty_usdt - trade_volume * prices
+        rounded = floor_to(trade_volume, qty1)
+        coins_buyed = coins_buyed + floor_to(rounded * (1 - fee), qty1)
+        buy_taken[:, j] = rounded > 0
+        buy_volume[:, j] = trade_volume
+
+    # Шаг 2 - продажа монет за USDC
+    qty_usdc = np.zeros(pairs)
+    walking = np.ones(pairs, dtype=bool)
+    for j in range(usdc_bids.shape[1]):
+        walking &= has_step(coins_buyed, qty2)
+        if not walking.any():
+            break
+        prices, volumes = usdc_bids[:, j, 0], usdc_bids[:, j, 1]
+        trade_volume = np.minimum(coins_buyed, volumes)
+        taken = walking & has_step(trade_volume, qty2)
+        coins_buyed = coins_buyed - np.where(taken, floor_to(trade_volume, qty2), 0.0)
+        qty_usdc = qty_usdc + np.where(taken, trade_volume * prices, 0.0)
+        sell_taken[:, j] = taken
+        sell_volume[:, j] = trade_volume
+
+    # Шаг 3 - продажа USDC за USDT
+    final_usdt = np.zeros(pairs)
+    walking = np.ones(pairs, dtype=bool)
+    for j, (price, volume) in enumerate(usdc_to_usdt_bids.tolist()):
+        walking &= has_step(qty_usdc, qtyc)
+        if not walking.any():
+            break
+        trade_volume = np.minimum(qty_usdc, volume)
+        taken = walking & has_step(trade_volume, qtyc)
+        final_usdt = final_usdt + np.where(taken, trade_volume * price, 0.0)
+        qty_usdc = qty_usdc - np.where(taken, trade_volume, 0.0)
+        convert_taken[:, j] = taken
+        convert_volume[:, j] = trade_volume
+
+    return final_usdt, (buy_taken, buy_volume, sell_taken, sell_volume, convert_taken, convert_volume)
+
+
+def simulate_usdc_to_usdt_batch(usdc_asks, usdt_bids, usdt_to_usdc_asks, qty_usdt, fee, degrees):
+    """
+    Batched version of calculator.simulate_usdc_to_usdt for all pairs at once, walked level by level.
+
+    Args:
+    - usdc_asks (np.ndarray): (pairs, levels, 2) asks of the coin/USDC books.
+    - usdt_bids (np.ndarray): (pairs, levels, 2) bids of the coin/USDT books.
+    - usdt_to_usdc_asks (np.ndarray): (levels, 2) asks of the USDCUSDT book.
+    - qty_usdt (np.ndarray): Trade size in USDT per pair.
+    - fee (np.ndarray): Fee of the USDT pair, per pair.
+    - degrees (tuple): Quantity degrees of the USDT pairs and the USDC pairs (arrays per pair) and of USDCUSDT.
+    """
+    pairs = len(qty_usdt)
+    qty1, qty2, qtyc = degrees
+    usdc_taken = np.zeros((pairs, len(usdt_to_usdc_asks)), dtype=bool)
+    usdc_volume = np.zeros(usdc_taken.shape)
+    buy_taken = np.zeros(usdc_asks.shape[:2], dtype=bool)
+    buy_volume = np.zeros(usdc_asks.shape[:2])
+    sell_taken = np.zeros(usdt_bids.shape[:2], dtype=bool)
+    sell_volume = np.zeros(usdt_bids.shape[:2])
+
+    # Шаг 1: Покупка USDC за USDT
+    qty_usdc = np.zeros(pairs)
+    walking = np.ones(pairs, dtype=bool)
+    for j, (price, volume) in enumerate(usdt_to_usdc_asks.tolist()):
+        walking &= has_step(qty_usdt)
+        if not walking.any():
+            break
+        trade_volume = np.where(walking, np.minimum(qty_usdt / price, volume), 0.0)
+        qty_usdt = qty_usdt - trade_volume * price
+        rounded = floor_to(trade_volume, qtyc)
+        qty_usdc = qty_usdc + rounded
+        usdc_taken[:, j] = rounded > 0
+        usdc_volume[:, j] = trade_volume
+
+    # Шаг 2: Покупка монеты за USDC
+    coins_buyed = np.zeros(pairs)
+    walking = np.ones(pairs, dtype=bool)
+    for j in range(usdc_asks.shape[1]):
+        walking &= has_step(qty_usdc, qtyc)
+        if not walking.any():
+            break
+        prices, volumes = usdc_asks[:, j, 0], usdc_asks[:, j, 1]
+        trade_volume = np.where(walking, np.minimum(qty_usdc / prices, volumes), 0.0)
+        qty_usdc = qty_usdc - trade_volume * prices
+        rounded = floor_to(trade_volume, qty2)
+        coins_buyed = coins_buyed + rounded
+        buy_taken[:, j] = rounded > 0
+        buy_volume[:, j] = trade_volume
+
+    # Шаг 3: Продажа монеты за USDT
+    final_usdt = np.zeros(pairs)
+    walking = np.ones(pairs, dtype=bool)
+    for j in range(usdt_bids.shape[1]):
+        walking &= has_step(coins_buyed, qty1)
+        if not walking.any():
+            break
+        prices, volumes = usdt_bids[:, j, 0], usdt_bids[:, j, 1]
+        trade_volume = np.where(walking, np.minimum(coins_buyed, volumes), 0.0)
+        # итог округляется после каждого уровня, как в эталонной реализации
+        final_usdt = np.where(walking, floor_to(final_usdt + trade_volume * prices * (1 - fee)), final_usdt)
+        coins_buyed = coins_buyed - trade_volume
+        sell_taken[:, j] = has_step(trade_volume, qty1)
+        sell_volume[:, j] = trade_volume
+
+    return final_usdt, (usdc_taken, usdc_volume, buy_taken, buy_volume, sell_taken, sell_volume)
+
+
+def calculate_arbitrage_opportunities(prices, pairs, fee=0.001, depth=None, max_notional=None, min_notional=0,
+                                      instruments=None):
+    """
+    NumPy engine with the same results as calculator.calculate_arbitrage_opportunities.
+    Sizes and simulates every route of both directions in one batched pass.
+
+    Args:
+    - prices (dict): Books by symbol.
+    - pairs (list): (USDT pair, USDC pair) tuples, as in PAIRS.
+    - fee (float): Trading fee.
+    - depth (int): Most levels used per side of a book; by default every level.
+    - max_notional (float): Cap for the solved trade size; None keeps the fixed 100 USDT.
+    - min_notional (float): Smallest trade size worth placing.
+    - instruments (InstrumentCache): Per-symbol steps, minimums and fees.
+    """
+    start_time = time.time()
+    logging.debug("started to calc opportunities")
+    opportunities = []
+
+    if 'USDCUSDT' not in prices:
+        return opportunities
+    pairs = [(pair1, pair2) for pair1, pair2 in pairs if pair1 in prices and pair2 in prices]
+    if not pairs:
+        return opportunities
+
+    usdt_books = [prices[pair1] for pair1, _ in pairs]
+    usdc_books = [prices[pair2] for _, pair2 in pairs]
+    usdcusdt = [prices['USDCUSDT']]
+
+    usdt_asks, usdt_asks_count = pack_side(usdt_books, 'asks', depth)
+    usdt_bids, usdt_bids_count = pack_side(usdt_books, 'bids', depth)
+    usdc_asks, usdc_asks_count = pack_side(usdc_books, 'asks', depth)
+    usdc_bids, usdc_bids_count = pack_side(usdc_books, 'bids', depth)
+    # у USDCUSDT только реальные уровни: они общие для всех пар
+    usdcusdt_bids, (usdcusdt_bids_count,) = pack_side(usdcusdt, 'bids', depth)
+    usdcusdt_asks, (usdcusdt_asks_count,) = pack_side(usdcusdt, 'asks', depth)
+    usdcusdt_bids = usdcusdt_bids[0, :usdcusdt_bids_count]
+    usdcusdt_asks = usdcusdt_asks[0, :usdcusdt_asks_count]
+
+    fees = np.array([taker_fee(instruments, pair1, fee) for pair1, _ in pairs])
+    degrees = (pair_steps(instruments, [pair1 for pair1, _ in pairs]),
+               pair_steps(instruments, [pair2 for _, pair2 in pairs]),
+               steps(instruments, 'USDCUSDT')[0])
+    shape = (len(pairs), len(usdcusdt_bids))
+    found = []
+
+    if usdcusdt_bids_count:
+        # ноги маршрута в виде (курс, емкость уровня), как в sizing.usdt_to_usdc_legs
+        legs = [((1 - fees[:, None]) / usdt_asks[:, :, 0], usdt_asks[:, :, 0] * usdt_asks[:, :, 1]),
+                (usdc_bids[:, :, 0], usdc_bids[:, :, 1]),
+                (np.broadcast_to(usdcusdt_bids[:, 0], shape), np.broadcast_to(usdcusdt_bids[:, 1], shape))]
+        counts = [usdt_asks_count, usdc_bids_count, np.full(len(pairs), usdcusdt_bids_count)]
+        qty_usdt = trade_sizes(legs, counts, max_notional, min_notional)
+        final_usdt, taken = simulate_usdt_to_usdc_batch(usdt_asks, usdc_bids, usdcusdt_bids, qty_usdt, fees, degrees)
+        for i in np.flatnonzero((final_usdt > qty_usdt) & (usdt_asks_count > 0) & (usdc_bids_count > 0)):
+            pair1, pair2 = pairs[i]
+            route = new_route(USDT_TO_USDC)
+            buy, sell, convert = route.legs
+            fill_leg(buy, pair1, usdt_asks, i, taken[0], taken[1], instruments)
+            fill_leg(sell, pair2, usdc_bids, i, taken[2], taken[3], instruments)
+            fill_leg(convert, 'USDCUSDT', usdcusdt_bids[None], 0, taken[4][i:i + 1], taken[5][i:i + 1], instruments)
+            route.pair1 = pair1
+            route.pair2 = pair2
+            route.qty_usdt = qty_usdt[i].item()
+            route.simulated_usdt = float(final_usdt[i])
+            if is_profitable(route, instruments):
+                found.append((i, 0, route))
+
+    shape = (len(pairs), len(usdcusdt_asks))
+    if usdcusdt_asks_count:
+        legs = [(np.broadcast_to(1 / usdcusdt_asks[:, 0], shape),
+                 np.broadcast_to(usdcusdt_asks[:, 0] * usdcusdt_asks[:, 1], shape)),
+                (1 / usdc_asks[:, :, 0], usdc_asks[:, :, 0] * usdc_asks[:, :, 1]),
+                (usdt_bids[:, :, 0] * (1 - fees[:, None]), usdt_bids[:, :, 1])]
+        counts = [np.full(len(pairs), usdcusdt_asks_count), usdc_asks_count, usdt_bids_count]
+        qty_usdt = trade_sizes(legs, counts, max_notional, min_notional)
+        final_usdt, taken = simulate_usdc_to_usdt_batch(usdc_asks, usdt_bids, usdcusdt_asks, qty_usdt, fees, degrees)
+        for i in np.flatnonzero((final_usdt > qty_usdt) & (usdc_asks_count > 0) & (usdt_bids_count > 0)):
+            pair1, pair2 = pairs[i]
+            route = new_route(USDC_TO_USDT)
+            convert, buy, sell = route.legs
+            fill_leg(convert, 'USDCUSDT', usdcusdt_asks[None], 0, taken[0][i:i + 1], taken[1][i:i + 1], instruments)
+            fill_leg(buy, pair2, usdc_asks, i, taken[2], taken[3], instruments)
+            fill_leg(sell, pair1, usdt_bids, i, taken[4], taken[5], instruments)
+            route.pair1 = pair2
+            route.pair2 = pair1
+            route.qty_usdt = qty_usdt[i].item()
+            route.simulated_usdt = float(final_usdt[i])
+            if is_profitable(route, instruments):
+                found.append((i, 1, route))
+
+    # тот же порядок, что и у эталонной реализации: по парам, внутри пары USDT -> USDC первым
+    found.sort(key=lambda item: item[:2])
+    opportunities = [make_opportunity(route) for _, _, route in found]
+
+    end_time = time.time()
+    logging.info("Time taken for calculating: %s seconds", end_time - start_time)
+    return opportunities
@@ -1,44 +1,27 @@
-from pybit.unified_trading import WebSocket
-from time import sleep
+import asyncio
 from pprint import pprint
 
+from utils.orderbook import OrderBookEngine
 
-def main():
-<<<<<<< HEAD
-    ws = WebSocket(
-        testnet=False,
-        channel_type='spot',
-    )
-=======
-    try:
-        ws = WebSocket(
-            testnet=False,
-            channel_type='spot',
-            trace_logging=True,
-        )
->>>>>>> 5a9bdf6 (changed calculating logic)
-
-        def handle_message(message):
-            pprint(message, width=200)
-
-<<<<<<< HEAD
-    ws.ticker_stream(
-        symbol='APEXUSDT',
-        callback=handle_message,
-    )
-=======
-        ws.ticker_stream(
-            symbol='BTCUSDT',
-            callback=handle_message,
-        )
->>>>>>> 5a9bdf6 (changed calculating logic)
 
+async def main():
+    engine = OrderBookEngine(['APEXUSDT', 'APEXUSDC', 'USDCUSDT'])
+    feed = asyncio.ensure_future(engine.run())
+    try:
         while True:
-            sleep(1)
-    except KeyboardInterrupt:
-        print("Bot stopped")
+            await engine.wait_for_update()
+            books = engine.snapshot()
+            for symbol in engine.pop_dirty():
+                if symbol in books:
+                    pprint(books[symbol], width=200)
+    finally:
+        await engine.stop()
+        feed.cancel()
 
 
 if __name__ == '__main__':
     print("Bot started")
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Bot stopped")